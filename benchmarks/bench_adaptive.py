@@ -0,0 +1,87 @@
+"""
+Benchmark: adaptive frame sampling vs full-rate extraction
+
+Extracts every bundled video twice, once with the model on every frame and once with adaptive=True, and
+reports how much inference was saved and how far the adaptive landmarks are from the full-rate ones.
+
+    python benchmarks/bench_adaptive.py [--max-error-mm 30]
+
+Error is the 3D distance per key landmark and frame, in mm, over the frames both runs detected a pose on.
+It is reported for all frames and for the interpolated ones alone. Exits 1 if the p95 error of any video
+is above --max-error-mm.
+"""
+
+import argparse
+import contextlib
+import io
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+sys.path.append(str(REPO_DIR / 'src'))
+
+from core.constants import KEY_LANDMARKS, POSE_LANDMARKS
+from core.profiling import profiler
+from pose_extract import extract_landmarks
+from pose_store import inferred_frames, read_pose_store
+
+KEY_IDX = [POSE_LANDMARKS.index(landmark) for landmark in KEY_LANDMARKS]
+
+
+def extract(video, out, adaptive):
+    """Extract one video and return (landmarks, header, seconds spent in inference)"""
+    profiler.enable()
+    with contextlib.redirect_stdout(io.StringIO()):
+        extract_landmarks(str(video), str(out), adaptive=adaptive)
+    inference = profiler.summary()['timings']['inference']['total']
+    profiler.disable()
+    landmarks, header = read_pose_store(out, mmap=False)
+    return landmarks, header, inference
+
+
+def error_mm(full, adaptive, frames):
+    """Per (frame, key landmark) 3D distance in mm on the given frames where both runs saw a pose"""
+    a = full[frames][:, KEY_IDX, :3]
+    b = adaptive[frames][:, KEY_IDX, :3]
+    both = ~(np.isnan(a).any(axis=(1, 2)) | np.isnan(b).any(axis=(1, 2)))
+    return np.linalg.norm(a[both] - b[both], axis=2).ravel() * 1000.0
+
+
+def describe(errors):
+    if len(errors) == 0:
+        return f"{'-':>6} {'-':>6} {'-':>6}"
+    return f"{errors.mean():>6.1f} {np.percentile(errors, 95):>6.1f} {errors.max():>6.1f}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare adaptive sampling with full-rate extraction on videos/")
+    parser.add_argument('--max-error-mm', type=float, default=30.0,
+                        help='Largest acceptable p95 key landmark error in mm (default: 30)')
+    args = parser.parse_args()
+
+    print(f"{'video':<30} {'frames':>6} {'inferred':>8} {'infer x':>7} {'time x':>6}   "
+          f"{'all mean/p95/max mm':>20}   {'interpolated mean/p95/max mm':>28}")
+    failed = False
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for video in sorted((REPO_DIR / 'videos').glob('*.mp4')):
+            full, _, full_s = extract(video, Path(tmp_dir) / 'full.pose.bin', adaptive=False)
+            adaptive, header, adaptive_s = extract(video, Path(tmp_dir) / 'adaptive.pose.bin', adaptive=True)
+
+            inferred = inferred_frames(adaptive, header)
+            n = min(len(full), len(adaptive))
+            all_errors = error_mm(full, adaptive, np.arange(n))
+            interp_errors = error_mm(full, adaptive, np.flatnonzero(~inferred[:n]))
+
+            p95 = np.percentile(all_errors, 95) if len(all_errors) else 0.0
+            failed |= p95 > args.max_error_mm
+            print(f"{video.name:<30} {n:>6} {int(inferred.sum()):>8} {n / max(1, inferred.sum()):>6.2f}x "
+                  f"{full_s / adaptive_s:>5.2f}x   {describe(all_errors):>20}   {describe(interp_errors):>28}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""
+Benchmark: cross-climb queries through the session dataset vs loading every file
+
+Builds a dataset of --sessions climbs (the bundled data/*.pose.wide.csv, repeated under new names) and answers
+one query, "every reaching phase where the left wrist went over --speed m/s", two ways: by loading and
+segmenting every file, and with SessionDataset.query() + load() on the ingested store.
+
+    python benchmarks/bench_dataset.py [--sessions 100] [--speed 0.8]
+
+Reports the one-off ingest time, then for each way the time to the matching frames and how many phases matched.
+Exits 1 if the two disagree on the matching phases.
+"""
+
+import argparse
+import contextlib
+import io
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+sys.path.append(str(REPO_DIR / 'src'))
+
+from analysis.movementphasedetector import MovementPhaseDetector
+from analysis.velocitycalculator import VelocityCalculator
+from core.constants import PHASES
+from dataset import SessionDataset
+
+
+def scan_files(paths, speed):
+    """The query the slow way: every file loaded, segmented and searched"""
+    matches = []
+    for path in paths:
+        calc = VelocityCalculator()
+        pose_data, fps = calc.load_positions(str(path))
+        velocity = calc.calculate_velocities(pose_data, fps)
+        detector = MovementPhaseDetector()
+        labels = detector.label_phases(detector.segment_velocities(velocity), len(calc.frames))
+
+        starts = np.flatnonzero(np.diff(labels, prepend=labels[0] - 1))
+        ends = np.append(starts[1:], len(labels))
+        wrist = velocity['left_wrist']['speed_3d']
+        for start, end in zip(starts, ends):
+            if labels[start] == PHASES.index('Reaching') and np.nanmax(wrist[start:end]) > speed:
+                matches.append((path.name.split('.pose')[0], int(start), wrist[start:end]))
+    return matches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare dataset queries with loading every pose file")
+    parser.add_argument('--sessions', type=int, default=100, help='Climbs in the dataset (default: 100)')
+    parser.add_argument('--speed', type=float, default=0.8, help='Left wrist speed to query for, m/s (default: 0.8)')
+    args = parser.parse_args()
+
+    fixtures = sorted((REPO_DIR / 'data').glob('*.pose.wide.csv'))
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tmp_dir = Path(tmp_dir)
+        (tmp_dir / 'data').mkdir()
+        paths = []
+        for i in range(args.sessions):
+            path = tmp_dir / 'data' / f'climb{i:04d}.pose.wide.csv'
+            path.symlink_to(fixtures[i % len(fixtures)])
+            paths.append(path)
+
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            SessionDataset(tmp_dir / 'dataset').ingest_dir(str(tmp_dir / 'data'))
+        ingest_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        scanned = scan_files(paths, args.speed)
+        scan_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        dataset = SessionDataset(tmp_dir / 'dataset')
+        rows = dataset.query(f'left_wrist_speed_max > {args.speed}', phase='Reaching')
+        loaded = dataset.load(rows, landmarks=['left_wrist'], channels=['speed'])
+        query_s = time.perf_counter() - start
+
+    print(f"{args.sessions} sessions, ingest {ingest_s:.2f} s ({ingest_s / args.sessions * 1e3:.1f} ms per session)")
+    print(f"{'scan every file':<20} {scan_s * 1e3:>9.1f} ms   {len(scanned):>5} phases")
+    print(f"{'dataset query+load':<20} {query_s * 1e3:>9.1f} ms   {len(loaded):>5} phases   {scan_s / query_s:.0f}x faster")
+
+    same = sorted((s, start) for s, start, _ in scanned) == sorted((r['session'], r['start']) for r, _ in loaded)
+    if not same:
+        print("❌ the dataset and the file scan matched different phases")
+    sys.exit(0 if same else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""
+Benchmark: multi-person extraction on a two-climber clip
+
+Builds a side-by-side clip from a bundled video: the original on the left and, on the right, a mirrored copy
+running --offset frames ahead, so the two climbers move differently at any moment. Extracts it with
+multi_person=True, then extracts each half on its own as a single climber and compares the tracks with them.
+
+    python benchmarks/bench_multi_person.py [--video cleantestvid2_17.11.15.mp4] [--max-frames 240] [--offset 60]
+
+Reports the extraction speed both ways, the tracks found and the frames each has a pose on, and per track the
+median distance to the single-climber landmarks (pixels in the image, mm in the world frame). Exits 1 unless
+exactly two tracks are found that each follow their own half.
+"""
+
+import argparse
+import contextlib
+import io
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+sys.path.append(str(REPO_DIR / 'src'))
+
+import cv2
+
+from pose_extract import extract_landmarks
+from pose_store import IMAGE_CHANNELS, STORE_CHANNELS, read_pose_store, store_tracks, track_slices
+
+
+def build_clips(video, out_dir, max_frames, offset):
+    """The side-by-side clip and its two halves as their own clips; returns the three paths"""
+    cap = cv2.VideoCapture(str(video))
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    frames = []
+    while len(frames) < max_frames + offset:
+        ok, frame = cap.read()
+        if not ok:
+            break
+        frames.append(frame)
+    cap.release()
+
+    n = len(frames) - offset
+    height, width = frames[0].shape[:2]
+    paths = [out_dir / name for name in ('both.mp4', 'left.mp4', 'right.mp4')]
+    writers = [cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*'mp4v'), fps, (w, height))
+               for path, w in zip(paths, (2 * width, width, width))]
+    for i in range(n):
+        left, right = frames[i], cv2.flip(frames[i + offset], 1)
+        writers[0].write(np.hstack([left, right]))
+        writers[1].write(left)
+        writers[2].write(right)
+    for writer in writers:
+        writer.release()
+    return paths, n
+
+
+def timed_extract(video, out_path, **kwargs):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        extract_landmarks(str(video), str(out_path), image_coords=True, **kwargs)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check multi-person extraction against single-climber runs')
+    parser.add_argument('--video', default='cleantestvid2_17.11.15.mp4', help='Video in videos/ to build from')
+    parser.add_argument('--max-frames', type=int, default=240, help='Frames in the clip (default: 240)')
+    parser.add_argument('--offset', type=int, default=60, help='Frames the right climber runs ahead (default: 60)')
+    parser.add_argument('--max-error-px', type=float, default=5.0,
+                        help='Largest acceptable median image distance to the single run (default: 5)')
+    args = parser.parse_args()
+
+    world = [STORE_CHANNELS.index(c) for c in ('x_world', 'y_world', 'z_world')]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tmp_dir = Path(tmp_dir)
+        (both, left, right), n = build_clips(REPO_DIR / 'videos' / args.video, tmp_dir, args.max_frames, args.offset)
+
+        multi_s = timed_extract(both, tmp_dir / 'both.pose.bin', multi_person=True)
+        single_s = timed_extract(left, tmp_dir / 'left.pose.bin') + timed_extract(right, tmp_dir / 'right.pose.bin')
+        landmarks, header = read_pose_store(tmp_dir / 'both.pose.bin')
+        halves = [read_pose_store(tmp_dir / f'{half}.pose.bin') for half in ('left', 'right')]
+
+        channels = header['channels']
+        image = [channels.index(c) for c in IMAGE_CHANNELS]
+        width = header['width']
+        tracks = store_tracks(header)
+        print(f"{n} frames of {width}x{header['height']}: multi-person {n / multi_s:.1f} fps, "
+              f"two single-climber runs {n / single_s:.1f} fps")
+        print(f"{'track':>5} {'frames':>7} {'side':>6} {'median px':>10} {'median mm':>10}")
+
+        ok = len(tracks) == 2
+        sides = set()
+        for track, columns in zip(tracks, track_slices(header)):
+            block = np.asarray(landmarks[:, columns], dtype=np.float64)
+            xy = block[..., image] * [width, header['height']]
+            side = 'left' if np.nanmedian(xy[..., 0]) < width / 2 else 'right'
+            single, _ = halves[side == 'right']
+            single = np.asarray(single, dtype=np.float64)
+            single_xy = single[..., image] * [width / 2, header['height']]
+            if side == 'right':
+                single_xy[..., 0] += width / 2
+            px = np.nanmedian(np.linalg.norm(xy - single_xy, axis=2))
+            mm = np.nanmedian(np.linalg.norm(block[..., world] - single[..., world], axis=2)) * 1000
+            posed = int((~np.isnan(block[..., 0]).all(axis=1)).sum())
+            print(f"{track:>5} {posed:>7} {side:>6} {px:>10.1f} {mm:>10.1f}")
+            ok &= px <= args.max_error_px
+            sides.add(side)
+        ok &= sides == {'left', 'right'}
+
+    if not ok:
+        print("❌ the tracks don't follow the two climbers")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
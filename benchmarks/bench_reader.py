@@ -0,0 +1,90 @@
+"""
+Benchmark: extraction with the background frame reader vs decoding on the inference thread
+
+Runs pose over every bundled video twice: as _process_frames does, decoding and colour-converting on a
+_FrameReader thread, and through a plain loop that reads, converts and infers one frame after another on
+one thread (how extraction worked before the reader).
+
+    python benchmarks/bench_reader.py [--max-frames 300] [--buffers 8] [--videos cleantest.mp4 ...]
+
+Per video: frames per second both ways, the speedup, how long inference sat waiting on decode, how long the
+reader sat waiting on inference, and the mean / max frames queued. Overlap needs a second core: on one core
+both ways come out the same. Exits 1 if the landmarks differ.
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+sys.path.append(str(REPO_DIR / 'src'))
+
+import cv2
+
+from pose_extract import READER_BUFFERS, _FrameReader, _frame_landmarks, _infer, _pose_model
+
+POSE_SETTINGS = {"model_complexity": 1, "min_detection_confidence": 0.5, "min_tracking_confidence": 0.5}
+
+
+def run_inline(video, max_frames):
+    """Decode, convert and infer on one thread: the baseline"""
+    cap = cv2.VideoCapture(str(video))
+    frames = []
+    start = time.perf_counter()
+    with _pose_model(POSE_SETTINGS) as pose:
+        while len(frames) < max_frames:
+            ok, frame_bgr = cap.read()
+            if not ok:
+                break
+            frames.append(_frame_landmarks(pose.process(cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2RGB))))
+    elapsed = time.perf_counter() - start
+    cap.release()
+    return np.stack(frames), len(frames) / elapsed
+
+
+def run_reader(video, max_frames, buffers):
+    """The same loop as _process_frames: the reader thread decodes and converts, this one infers"""
+    cap = cv2.VideoCapture(str(video))
+    frames = []
+    start = time.perf_counter()
+    with _pose_model(POSE_SETTINGS) as pose:
+        reader = _FrameReader(cap, 0, max_frames, buffers=buffers)
+        for _, frame_bgr, frame_rgb in reader:
+            frames.append(_frame_landmarks(_infer(pose, frame_bgr, None, frame_rgb)))
+    elapsed = time.perf_counter() - start
+    cap.release()
+    return np.stack(frames), len(frames) / elapsed, reader.stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare extraction with and without the frame reader thread')
+    parser.add_argument('--max-frames', type=int, default=300, help='Frames per video (default: 300)')
+    parser.add_argument('--buffers', type=int, default=READER_BUFFERS,
+                        help=f'Frames the reader may decode ahead (default: {READER_BUFFERS})')
+    parser.add_argument('--videos', nargs='+', help='Videos in videos/ (default: all)')
+    args = parser.parse_args()
+
+    videos = [REPO_DIR / 'videos' / name for name in args.videos] if args.videos else \
+        sorted((REPO_DIR / 'videos').glob('*.mp4'))
+
+    same = True
+    print(f"{'video':<28} {'inline fps':>10} {'reader fps':>10} {'speedup':>8} {'infer wait s':>12} "
+          f"{'reader wait s':>13} {'depth':>9}")
+    for video in videos:
+        inline, inline_fps = run_inline(video, args.max_frames)
+        piped, piped_fps, stats = run_reader(video, args.max_frames, args.buffers)
+        same &= np.array_equal(inline, piped, equal_nan=True)
+        print(f"{video.name:<28} {inline_fps:>10.1f} {piped_fps:>10.1f} {piped_fps / inline_fps:>7.2f}x "
+              f"{stats['consumer_stall_s']:>12.2f} {stats['reader_stall_s']:>13.2f} "
+              f"{stats['mean_depth']:>5.1f}/{stats['max_depth']:<3}")
+
+    if not same:
+        print("❌ the reader changed the landmarks")
+    sys.exit(0 if same else 1)
+
+
+if __name__ == '__main__':
+    main()
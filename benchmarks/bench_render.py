@@ -0,0 +1,84 @@
+"""
+Benchmark: pipelined annotated-video rendering vs drawing and writing each frame in turn
+
+Extracts poses (with image coordinates) from every bundled video once, then renders the annotated video
+two ways: render_video() (decoder and encoder threads around the drawing, a ring of reused buffers) and a
+plain loop that reads, copies, draws and writes one frame at a time, as the --preview path does.
+
+    python benchmarks/bench_render.py [--videos cleantest.mp4 ...] [--buffers 8]
+
+Per video: frames per second both ways and how many times real time that is. Exits 1 if the pipelined
+renderer can't keep up with real time.
+"""
+
+import argparse
+import contextlib
+import io
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+sys.path.append(str(REPO_DIR / 'src'))
+
+import cv2
+
+from pose_extract import extract_landmarks
+from pose_store import read_pose_store
+from reporting.visualizations import _image_points, _timeline_strip, draw_frame, phase_timeline, render_video
+
+
+def render_sequential(video, pose_path, output_path):
+    """Read, copy, draw and write each frame on this thread: the baseline"""
+    landmarks, header = read_pose_store(pose_path)
+    points, drawn = _image_points(landmarks, header, 0.5)
+    cap = cv2.VideoCapture(str(video))
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    width, height = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    phases = phase_timeline(pose_path, None, None, len(landmarks))
+    timeline = _timeline_strip(phases, width)
+    writer = cv2.VideoWriter(str(output_path), cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+
+    start = time.perf_counter()
+    frame_idx = 0
+    while True:
+        ok, frame = cap.read()
+        if not ok:
+            break
+        image = frame.copy()
+        draw_frame(image, frame_idx, fps, phases[frame_idx], timeline, len(phases), points[frame_idx], drawn[frame_idx])
+        writer.write(image)
+        frame_idx += 1
+    elapsed = time.perf_counter() - start
+    cap.release()
+    writer.release()
+    return frame_idx / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare pipelined and sequential annotated-video rendering')
+    parser.add_argument('--videos', nargs='+', help='Videos in videos/ (default: all)')
+    parser.add_argument('--buffers', type=int, default=8, help='Frames in flight for render_video (default: 8)')
+    args = parser.parse_args()
+
+    videos = [REPO_DIR / 'videos' / name for name in args.videos] if args.videos else \
+        sorted((REPO_DIR / 'videos').glob('*.mp4'))
+
+    realtime = True
+    print(f"{'video':<32} {'sequential fps':>14} {'pipelined fps':>14} {'x real time':>12}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for video in videos:
+            pose_path = Path(tmp_dir) / f'{video.stem}.pose.bin'
+            with contextlib.redirect_stdout(io.StringIO()):
+                extract_landmarks(str(video), str(pose_path), image_coords=True)
+                sequential = render_sequential(video, pose_path, Path(tmp_dir) / 'sequential.mp4')
+                stats = render_video(video, pose_path, Path(tmp_dir) / 'pipelined.mp4', buffers=args.buffers)
+            fps = cv2.VideoCapture(str(video)).get(cv2.CAP_PROP_FPS)
+            realtime &= stats['fps'] >= fps
+            print(f"{video.name:<32} {sequential:>14.1f} {stats['fps']:>14.1f} {stats['fps'] / fps:>11.1f}x")
+    sys.exit(0 if realtime else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+"""
+Benchmark: climber-ROI cropping vs whole-frame inference
+
+Runs pose over every bundled video with and without the ROI tracker at each model_complexity and compares
+them with the whole-frame, model_complexity=1 run (what extraction does by default).
+
+    python benchmarks/bench_roi.py [--complexities 0 1] [--max-frames 300] [--videos wide_shot.mp4 ...]
+
+Per run: ms per frame spent on crop + colour conversion + inference (decoding is the same for every run
+and left out), frames with a pose, how often the crop was moved, and the key landmark error against the reference over the frames both
+found a pose on: image position in pixels of the full frame, world position in mm.
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+import numpy as np
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+sys.path.append(str(REPO_DIR / 'src'))
+
+import cv2
+
+from core.constants import KEY_LANDMARKS, POSE_LANDMARKS
+from core.profiling import profiler
+from pose_extract import _RoiTracker, _frame_landmarks, _pose_model, _process_frames
+
+KEY_IDX = [POSE_LANDMARKS.index(landmark) for landmark in KEY_LANDMARKS]
+
+
+def run(video, roi, model_complexity, max_frames):
+    """(frames, landmarks, 6) world + visibility + image coords, and ms per frame for crop/convert/infer"""
+    pose_settings = {"model_complexity": model_complexity, "min_detection_confidence": 0.5,
+                     "min_tracking_confidence": 0.5}
+    cap = cv2.VideoCapture(str(video))
+    size = (cap.get(cv2.CAP_PROP_FRAME_WIDTH), cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+
+    profiler.enable()
+    frames = []
+    with _pose_model(pose_settings) as pose:
+        for _, _, result in _process_frames(cap, pose, 0, max_frames, 0, _RoiTracker() if roi else None):
+            frames.append(_frame_landmarks(result, image_coords=True))
+    timings = profiler.summary()['timings']
+    profiler.disable()
+    cap.release()
+
+    seconds = sum(timings[name]['total'] for name in ('roi', 'cvtColor', 'inference') if name in timings)
+    counters = profiler.counters
+    return np.stack(frames), size, seconds / len(frames) * 1e3, counters.get('roi_moves', 0)
+
+
+def errors(reference, landmarks, size):
+    """Key landmark image error (px) and world error (mm) on frames both runs found a pose on"""
+    n = min(len(reference), len(landmarks))
+    a, b = reference[:n, KEY_IDX], landmarks[:n, KEY_IDX]
+    both = ~(np.isnan(a[:, :, 0]).all(axis=1) | np.isnan(b[:, :, 0]).all(axis=1))
+    image_px = np.linalg.norm((a[both, :, 4:6] - b[both, :, 4:6]) * np.array(size), axis=2).ravel()
+    world_mm = np.linalg.norm(a[both, :, :3] - b[both, :, :3], axis=2).ravel() * 1000.0
+    return image_px, world_mm
+
+
+def describe(errors):
+    if len(errors) == 0:
+        return f"{'-':>8} {'-':>8}"
+    return f"{errors.mean():>8.1f} {np.percentile(errors, 95):>8.1f}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare ROI-cropped with whole-frame pose inference on videos/")
+    parser.add_argument('--complexities', type=int, nargs='+', default=[0, 1],
+                        help='model_complexity values to try (default: 0 1)')
+    parser.add_argument('--max-frames', type=int, default=None, help='Frames per video (default: all)')
+    parser.add_argument('--videos', nargs='+', default=None, help='Videos to use instead of the bundled ones')
+    args = parser.parse_args()
+    videos = [Path(v) for v in args.videos] if args.videos else sorted((REPO_DIR / 'videos').glob('*.mp4'))
+
+    print(f"{'video':<30} {'run':<12} {'ms/frame':>8} {'posed':>6} {'crops':>6}   {'image px mean/p95':>17}   "
+          f"{'world mm mean/p95':>17}")
+    for video in videos:
+        reference, size, reference_ms, _ = run(video, roi=False, model_complexity=1, max_frames=args.max_frames)
+        for complexity in args.complexities:
+            for roi in (False, True):
+                if complexity == 1 and not roi:
+                    landmarks, ms, moves = reference, reference_ms, 0
+                else:
+                    landmarks, _, ms, moves = run(video, roi, complexity, args.max_frames)
+                image_px, world_mm = errors(reference, landmarks, size)
+                posed = int((~np.isnan(landmarks[:, 0, 0])).sum())
+                name = f"{'roi' if roi else 'full'} c{complexity}"
+                print(f"{video.name:<30} {name:<12} {ms:>8.1f} {posed:>6} {moves:>6}   "
+                      f"{describe(image_px)}   {describe(world_mm)}")
+
+
+if __name__ == '__main__':
+    main()
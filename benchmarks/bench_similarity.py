@@ -0,0 +1,108 @@
+"""
+Benchmark: similarity search (embedding shortlist + pruned banded DTW) vs DTW against every interval
+
+Builds a dataset of --sessions climbs: the bundled data/*.pose.wide.csv repeated under new names, each copy's
+trajectories jittered with its own noise so no two are the same. Then, for --queries reaching phases, finds
+the k most similar intervals with SimilarityIndex.search() and with plain banded DTW against every interval.
+
+    python benchmarks/bench_similarity.py [--sessions 200] [--queries 5] [-k 5]
+
+Reports the index build time, the time per query both ways and the recall of the exhaustive top k.
+Exits 1 if the recall is below --min-recall.
+"""
+
+import argparse
+import contextlib
+import io
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+sys.path.append(str(REPO_DIR / 'src'))
+
+from core.constants import SIMILARITY
+from dataset import SessionDataset
+from pose_store import read_pose_store, write_pose_store
+from similarity import SimilarityIndex, dtw, resample
+
+
+def jitter_partitions(dataset, sigma, seed=0):
+    """Add per-session gaussian noise to the positions of every partition, rewritten in place"""
+    rng = np.random.default_rng(seed)
+    for session in dataset.sessions:
+        path = dataset.partition_path(session)
+        block, header = read_pose_store(path)
+        block = np.array(block)
+        block[..., :3] += rng.normal(0, sigma, block[..., :3].shape)
+        extra = {key: header[key] for key in ('session', 'first_frame')}
+        write_pose_store(path, block, header['fps'], header['width'], header['height'],
+                         channels=header['channels'], names=header['landmarks'], **extra)
+
+
+def exhaustive(index, session, start, k, band):
+    """The k best banded DTW distances against every other interval, no shortlist and no pruning"""
+    intervals = index.intervals
+    own = (intervals['session'] == session) & (intervals['start'] == start)
+    query = index.trajectories(intervals[own])[0]
+    n = len(query)
+    radius = max(1, int(np.ceil(band * n)))
+    distances = np.array([
+        dtw(query.reshape(n, -1), resample(t, n).reshape(n, -1), radius) for t in index.trajectories(intervals[~own])
+    ])
+    order = np.argsort(distances)[:k]
+    return set(zip(intervals[~own].iloc[order]['session'], intervals[~own].iloc[order]['start']))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the similarity index with exhaustive DTW')
+    parser.add_argument('--sessions', type=int, default=200, help='Climbs in the dataset (default: 200)')
+    parser.add_argument('--queries', type=int, default=5, help='Query intervals (default: 5)')
+    parser.add_argument('-k', type=int, default=5, help='Matches per query (default: 5)')
+    parser.add_argument('--sigma', type=float, default=0.02, help='Jitter per copy, m (default: 0.02)')
+    parser.add_argument('--min-recall', type=float, default=0.8, help='Lowest acceptable recall (default: 0.8)')
+    args = parser.parse_args()
+
+    fixtures = sorted((REPO_DIR / 'data').glob('*.pose.wide.csv'))
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        tmp_dir = Path(tmp_dir)
+        (tmp_dir / 'data').mkdir()
+        for i in range(args.sessions):
+            (tmp_dir / 'data' / f'climb{i:04d}.pose.wide.csv').symlink_to(fixtures[i % len(fixtures)])
+        dataset = SessionDataset(tmp_dir / 'dataset')
+        with contextlib.redirect_stdout(io.StringIO()):
+            dataset.ingest_dir(str(tmp_dir / 'data'))
+        jitter_partitions(dataset, args.sigma)
+
+        start = time.perf_counter()
+        index = SimilarityIndex(dataset)
+        build_s = time.perf_counter() - start
+
+        reaching = index.intervals[index.intervals['phase'] == 'Reaching']
+        queries = reaching.sample(min(args.queries, len(reaching)), random_state=0)
+
+        search_s = exhaustive_s = 0.0
+        found = 0
+        for query in queries.itertuples():
+            start = time.perf_counter()
+            matches = index.search(query.session, query.start, k=args.k)
+            search_s += time.perf_counter() - start
+
+            start = time.perf_counter()
+            truth = exhaustive(index, query.session, query.start, args.k, SIMILARITY['band'])
+            exhaustive_s += time.perf_counter() - start
+            found += len(truth & set(zip(matches['session'], matches['start'])))
+
+    recall = found / (len(queries) * args.k)
+    print(f"{len(index.intervals)} intervals from {args.sessions} sessions, index built in {build_s:.2f} s")
+    print(f"{'exhaustive DTW':<16} {exhaustive_s / len(queries) * 1e3:>9.1f} ms per query")
+    print(f"{'similarity index':<16} {search_s / len(queries) * 1e3:>9.1f} ms per query   "
+          f"{exhaustive_s / search_s:.0f}x faster, recall@{args.k} {recall:.2f}")
+    sys.exit(0 if recall >= args.min_recall else 1)
+
+
+if __name__ == '__main__':
+    main()
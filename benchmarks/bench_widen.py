@@ -0,0 +1,69 @@
+"""
+Benchmark: widen_pose's direct array widening vs the old pivot_table path
+
+Runs both on every long-form pose csv in data/ and checks they give the same table.
+
+    python benchmarks/bench_widen.py [--repeat 5]
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+sys.path.append(str(REPO_DIR / 'src'))
+
+from core.constants import POSE_LANDMARKS
+from widen_data import long_to_block, wide_from_block
+
+
+def widen_pivot(df):
+    """The pivot_table widening widen_pose used before, kept here as the baseline"""
+    df_wide = df.pivot_table(
+        index=["frame", "t_sec"],
+        columns="landmark",
+        values=["x_world", "y_world", "z_world", "visibility"]
+    )
+    df_wide.columns = [f"{c1}_{c2}" for c1, c2 in df_wide.columns]
+    return df_wide.reset_index()
+
+
+def widen_array(df):
+    frames, t_sec, block, channels = long_to_block(df)
+    return wide_from_block(frames, t_sec, block, POSE_LANDMARKS, channels)
+
+
+def best_time(fn, df, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(df)
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time pivot_table vs array widening on data/*.pose.csv")
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per file, best time is reported (default: 5)')
+    args = parser.parse_args()
+
+    print(f"{'file':<42} {'rows':>7} {'pivot ms':>9} {'array ms':>9} {'speedup':>8}  same")
+    for csv_path in sorted((REPO_DIR / 'data').glob('*.pose.csv')):
+        df = pd.read_csv(csv_path)
+
+        pivot_s, expected = best_time(widen_pivot, df, args.repeat)
+        array_s, actual = best_time(widen_array, df, args.repeat)
+
+        same = list(expected.columns) == list(actual.columns) and np.allclose(
+            expected.to_numpy(dtype=float), actual.to_numpy(dtype=float), equal_nan=True)
+
+        print(f"{csv_path.name:<42} {len(df):>7} {pivot_s * 1e3:>9.1f} {array_s * 1e3:>9.1f} "
+              f"{pivot_s / array_s:>7.1f}x  {'yes' if same else 'NO'}")
+
+
+if __name__ == '__main__':
+    main()
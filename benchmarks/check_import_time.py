@@ -0,0 +1,74 @@
+"""
+Startup check: the CLI entry points must not pay for dependencies they don't use
+
+Each case runs in a fresh interpreter. It is timed (best of --repeat) against a budget and also checked for
+heavy modules it must never import. Exits 1 if any case fails, so it can gate CI next to run_benchmarks.py.
+
+    python benchmarks/check_import_time.py
+    python benchmarks/check_import_time.py --budget 0.3
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+SRC_DIR = REPO_DIR / 'src'
+
+HEAVY_MODULES = ['mediapipe', 'cv2', 'pandas', 'scipy', 'matplotlib']
+
+#(name, code run in the fresh interpreter, modules it must not load, budget scale)
+CASES = [
+    ('main --help', "import sys; sys.argv = ['main.py', '--help']\n"
+                    "try:\n    import runpy; runpy.run_path('main.py', run_name='__main__')\n"
+                    "except SystemExit:\n    pass",
+     HEAVY_MODULES, 1),
+    ('import core.engine', 'import core.engine', HEAVY_MODULES, 1),
+    ('import core.batch', 'import core.batch', HEAVY_MODULES, 1),
+    #the analysis really needs scipy (and pandas for csv input), so it gets a larger allowance
+    ('analyze-only imports', 'import core.engine, analysis.movementphasedetector', ['mediapipe', 'cv2', 'matplotlib'], 3),
+]
+
+_PROBE = """
+import io, json, sys, time, contextlib
+start = time.perf_counter()
+with contextlib.redirect_stdout(io.StringIO()):
+{code}
+seconds = time.perf_counter() - start
+print(json.dumps({{'seconds': seconds, 'modules': sorted(m for m in {heavy!r} if m in sys.modules)}}))
+"""
+
+
+def probe(code, repeat):
+    """Best import time and the heavy modules loaded, each run in a new interpreter"""
+    script = _PROBE.format(code='\n'.join('    ' + line for line in code.splitlines()), heavy=HEAVY_MODULES)
+    runs = []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, '-c', script], cwd=SRC_DIR, capture_output=True, text=True, check=True)
+        runs.append(json.loads(out.stdout.strip().splitlines()[-1]))
+    return min(run['seconds'] for run in runs), runs[0]['modules']
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the CLI import time and that heavy dependencies stay lazy")
+    parser.add_argument('--budget', type=float, default=0.5, help='Seconds the CLI startup cases may take (default: 0.5)')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per case, best is kept (default: 3)')
+    args = parser.parse_args()
+
+    failed = 0
+    for name, code, forbidden, scale in CASES:
+        budget = args.budget * scale
+        seconds, modules = probe(code, args.repeat)
+        leaked = [m for m in modules if m in forbidden]
+        ok = seconds <= budget and not leaked
+        failed += not ok
+        note = f"  loaded {', '.join(leaked)}" if leaked else ''
+        print(f"{'✅' if ok else '❌'} {name:<24} {seconds * 1e3:7.1f} ms (budget {budget * 1e3:.0f} ms){note}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,381 @@
+"""
+Benchmark suite: time every pipeline stage on the bundled videos/ and data/ fixtures
+
+Each (stage, input) pair runs in a fresh process so peak RSS belongs to that stage alone. A stage is timed
+--repeat times (best run kept) and then run once more under tracemalloc for allocation numbers.
+
+    python benchmarks/run_benchmarks.py --out bench.json
+    python benchmarks/run_benchmarks.py --out new.json --compare bench.json --threshold 0.10
+
+Metrics per stage and input:
+    seconds         best wall-clock time
+    frames_per_sec  frames handled per second of that time
+    peak_rss_mb     process peak RSS after the stage (ru_maxrss)
+    rss_growth_mb   how much the stage pushed the peak up from after setup
+    alloc_peak_mb   peak Python heap traced while the stage ran
+    alloc_blocks    Python memory blocks allocated by the stage and still alive after it (net count)
+
+With the velocity stage selected, every wide csv (testclimbvid1's low-visibility wrists included) is also
+checked for gaps spreading through smoothing: a speed may only be NaN where cleaning left its landmark
+missing. Each is also run again with the poses of its first 30 frames removed, which must shift no movement
+window off its video frame numbers. The run exits 1 if either check fails.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from pathlib import Path
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+SRC_DIR = REPO_DIR / 'src'
+sys.path.append(str(SRC_DIR))
+
+VIDEO_STAGES = ['decode', 'inference', 'row_building', 'csv_write', 'store_write']
+LONG_STAGES = ['widen_pose']
+WIDE_STAGES = ['clean_landmarks', 'velocity', 'segment_motions', 'criteria']
+STAGES = VIDEO_STAGES + LONG_STAGES + WIDE_STAGES
+
+
+def fixtures(max_frames):
+    """(stage, input path) pairs over the bundled clips and pose csvs"""
+    videos = sorted((REPO_DIR / 'videos').glob('*.mp4'))
+    long_csvs = sorted(p for p in (REPO_DIR / 'data').glob('*.pose.csv'))
+    wide_csvs = sorted((REPO_DIR / 'data').glob('*.pose.wide.csv'))
+
+    pairs = [(stage, video) for stage in VIDEO_STAGES for video in videos]
+    pairs += [(stage, csv) for stage in LONG_STAGES for csv in long_csvs]
+    pairs += [(stage, csv) for stage in WIDE_STAGES for csv in wide_csvs]
+    return pairs
+
+
+# ---- stage setup: everything a stage needs, built before the clock starts -----------------------------
+
+def _decoded_frames(video_path, max_frames, rgb=True):
+    import cv2
+    cap = cv2.VideoCapture(str(video_path))
+    frames = []
+    while len(frames) < max_frames:
+        ok, frame = cap.read()
+        if not ok:
+            break
+        frames.append(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB) if rgb else frame)
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    size = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+    cap.release()
+    return frames, fps, size
+
+
+def _pose_results(frames):
+    import mediapipe as mp
+    with mp.solutions.pose.Pose(static_image_mode=False, model_complexity=1) as pose:
+        return [pose.process(frame) for frame in frames]
+
+
+def _landmark_block(video_path, max_frames):
+    import numpy as np
+    from pose_extract import _frame_landmarks
+    frames, fps, size = _decoded_frames(video_path, max_frames)
+    return np.stack([_frame_landmarks(result) for result in _pose_results(frames)]), fps, size
+
+
+def setup_stage(stage, input_path, max_frames, tmp_dir):
+    """Returns (callable running the stage once, number of frames it handles)"""
+    if stage == 'decode':
+        import cv2
+
+        def run():
+            cap = cv2.VideoCapture(str(input_path))
+            n = 0
+            while n < max_frames and cap.read()[0]:
+                n += 1
+            cap.release()
+        return run, _decoded_frames(input_path, max_frames, rgb=False)[0].__len__()
+
+    if stage == 'inference':
+        import mediapipe as mp
+        frames, _, _ = _decoded_frames(input_path, max_frames)
+        pose = mp.solutions.pose.Pose(static_image_mode=False, model_complexity=1)
+        pose.process(frames[0])  # model load is not inference
+
+        def run():
+            pose.reset()
+            for frame in frames:
+                pose.process(frame)
+        return run, len(frames)
+
+    if stage == 'row_building':
+        import numpy as np
+        from pose_extract import _frame_landmarks
+        frames, _, _ = _decoded_frames(input_path, max_frames)
+        results = _pose_results(frames)
+
+        def run():
+            np.stack([_frame_landmarks(result) for result in results])
+        return run, len(results)
+
+    if stage == 'csv_write':
+        from pose_extract import _long_form
+        block, fps, (width, height) = _landmark_block(input_path, max_frames)
+        out = Path(tmp_dir) / 'bench.pose.csv'
+
+        def run():
+            _long_form(block, fps, width, height).to_csv(out, index=False)
+        return run, len(block)
+
+    if stage == 'store_write':
+        from pose_store import write_pose_store
+        block, fps, (width, height) = _landmark_block(input_path, max_frames)
+        out = Path(tmp_dir) / 'bench.pose.bin'
+
+        def run():
+            write_pose_store(out, block, fps, width, height)
+        return run, len(block)
+
+    if stage == 'widen_pose':
+        import pandas as pd
+        from widen_data import widen_pose
+        # widen_pose writes to <parent of parent>/data/, keep that inside the temp dir
+        out = Path(tmp_dir) / 'wide' / 'bench.pose.wide.csv'
+        n_frames = pd.read_csv(input_path, usecols=['frame'])['frame'].nunique()
+
+        def run():
+            widen_pose(str(input_path), str(out))
+        return run, n_frames
+
+    if stage == 'clean_landmarks':
+        import numpy as np
+        import pandas as pd
+        from analysis.cleaning import clean_landmarks
+        from analysis.criteriaevaluator import positions_from_wide
+        df = pd.read_csv(input_path)
+        positions, visibility = positions_from_wide(df)
+        frames = df['frame'].to_numpy()
+
+        def run():
+            clean_landmarks(positions, visibility, frames)
+        return run, len(frames)
+
+    if stage == 'velocity':
+        import pandas as pd
+        from analysis.velocitycalculator import VelocityCalculator
+        n_frames = len(pd.read_csv(input_path, usecols=['frame']))
+
+        def run():
+            VelocityCalculator().calculate_from_csv(str(input_path))
+        return run, n_frames
+
+    if stage == 'segment_motions':
+        import pandas as pd
+        from analysis.movementphasedetector import MovementPhaseDetector
+        n_frames = len(pd.read_csv(input_path, usecols=['frame']))
+
+        def run():
+            MovementPhaseDetector().segment_motions(str(input_path))
+        return run, n_frames
+
+    if stage == 'criteria':
+        from analysis.criteriaevaluator import CriteriaEvaluator, load_session
+        from analysis.movementphasedetector import MovementPhaseDetector
+        positions, visibility, fps, _ = load_session(str(input_path))
+        windows = MovementPhaseDetector().segment_motions(str(input_path))
+        labels = MovementPhaseDetector().label_phases(windows, len(positions))
+        evaluator = CriteriaEvaluator(fps=fps)
+
+        def run():
+            evaluator.evaluate(evaluator.features(positions, visibility), labels)
+        return run, len(positions)
+
+    raise ValueError(f'unknown stage {stage}')
+
+
+def check_gap_spread():
+    """Per wide csv, the samples cleaning left missing and the NaN speeds; ok when they are the same frames"""
+    import numpy as np
+    from analysis.velocitycalculator import VelocityCalculator
+
+    checks = []
+    for csv in sorted((REPO_DIR / 'data').glob('*.pose.wide.csv')):
+        calc = VelocityCalculator()
+        with contextlib.redirect_stdout(io.StringIO()):
+            positions, fps = calc.load_positions(str(csv))
+            velocities = calc.calculate_velocities(positions, fps)
+        missing = nan_speeds = 0
+        for landmark, velocity in velocities.items():
+            missing += int(np.isnan(positions[landmark]['x']).sum())
+            nan_speeds += int(np.isnan(velocity['speed_3d']).sum())
+        checks.append({'input': csv.name, 'missing': missing, 'nan_speeds': nan_speeds, 'ok': nan_speeds == missing})
+        print(f"{'gap_spread':<16} {csv.name:<42} {missing:>6} missing {nan_speeds:>6} NaN speeds "
+              f"{'✅' if nan_speeds == missing else '❌'}")
+    return checks
+
+
+def check_frame_numbers(lead=30):
+    """
+    Per wide csv, the movement windows once its first `lead` frames have no pose (the clip moved `lead`
+    frames later); ok when they are the full clip's windows on the same video frame numbers
+    """
+    import pandas as pd
+    from analysis.movementphasedetector import MovementPhaseDetector
+    from analysis.velocitycalculator import VelocityCalculator
+
+    def windows(csv):
+        calc = VelocityCalculator()
+        with contextlib.redirect_stdout(io.StringIO()):
+            positions, fps = calc.load_positions(str(csv))
+            return MovementPhaseDetector().segment_velocities(calc.calculate_velocities(positions, fps)), fps
+
+    checks = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for csv in sorted((REPO_DIR / 'data').glob('*.pose.wide.csv')):
+            full, fps = windows(csv)
+            df = pd.read_csv(csv)
+            df['frame'] += lead
+            df['t_sec'] += lead / fps
+            late_csv = Path(tmp_dir) / csv.name
+            df.to_csv(late_csv, index=False)
+            late, _ = windows(late_csv)
+
+            expected = {landmark: [[start + lead, end + lead] for start, end in w] for landmark, w in full.items()}
+            moved = sum(late.get(landmark) != w for landmark, w in expected.items())
+            checks.append({'input': csv.name, 'lead': lead, 'moved': moved, 'ok': moved == 0})
+            print(f"{'frame_numbers':<16} {csv.name:<42} {moved:>6} landmarks' windows moved "
+                  f"{'✅' if moved == 0 else '❌'}")
+    return checks
+
+
+def _rss_mb():
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    scale = 1024**2 if sys.platform == 'darwin' else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+
+def measure(job):
+    """Runs in a fresh process: set up one stage, time it, then profile its allocations"""
+    stage, input_path, repeat, max_frames = job
+    with tempfile.TemporaryDirectory() as tmp_dir, contextlib.redirect_stdout(io.StringIO()):
+        run, n_frames = setup_stage(stage, Path(input_path), max_frames, tmp_dir)
+        rss_before = _rss_mb()
+
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            run()
+            times.append(time.perf_counter() - start)
+        rss_after = _rss_mb()
+
+        blocks_before = sys.getallocatedblocks()
+        tracemalloc.start()
+        run()
+        _, alloc_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        alloc_blocks = sys.getallocatedblocks() - blocks_before
+
+    best = min(times)
+    return {
+        'stage': stage,
+        'input': Path(input_path).name,
+        'frames': n_frames,
+        'seconds': best,
+        'frames_per_sec': n_frames / best if best > 0 else None,
+        'peak_rss_mb': rss_after,
+        'rss_growth_mb': rss_after - rss_before,
+        'alloc_peak_mb': alloc_peak / 1024**2,
+        'alloc_blocks': alloc_blocks,
+    }
+
+
+def run_suite(stages, repeat, max_frames):
+    jobs = [(stage, str(path), repeat, max_frames) for stage, path in fixtures(max_frames) if stage in stages]
+    results = []
+
+    # one task per process, so every stage starts from a clean heap and RSS
+    with ProcessPoolExecutor(max_workers=1, mp_context=get_context('spawn'), max_tasks_per_child=1) as pool:
+        for result in pool.map(measure, jobs):
+            results.append(result)
+            print(f"{result['stage']:<16} {result['input']:<42} {result['seconds'] * 1e3:>9.1f} ms "
+                  f"{result['frames_per_sec'] or 0:>9.1f} fps {result['peak_rss_mb']:>8.1f} MB rss "
+                  f"{result['alloc_peak_mb']:>8.2f} MB heap")
+    return results
+
+
+def compare(results, baseline_path, threshold):
+    """Print the time change per stage and input against a saved run; returns the regressions"""
+    with open(baseline_path) as f:
+        baseline = {(r['stage'], r['input']): r for r in json.load(f)['results']}
+
+    regressions = []
+    print(f"\nCompared with {baseline_path} (regression = more than {threshold:.0%} slower):")
+    for result in results:
+        old = baseline.get((result['stage'], result['input']))
+        if old is None:
+            continue
+        change = result['seconds'] / old['seconds'] - 1.0
+        flag = ''
+        if change > threshold:
+            flag = '  ⚠️  REGRESSION'
+            regressions.append({**result, 'baseline_seconds': old['seconds'], 'change': change})
+        print(f"  {result['stage']:<16} {result['input']:<42} {change:>+8.1%}{flag}")
+    return regressions
+
+
+def _git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=REPO_DIR, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time each ClimbLab pipeline stage on the bundled fixtures")
+    parser.add_argument('--stages', nargs='+', choices=STAGES, default=STAGES, help='Stages to run (default: all)')
+    parser.add_argument('--repeat', type=int, default=3, help='Timed runs per stage, best is kept (default: 3)')
+    parser.add_argument('--max-frames', type=int, default=150,
+                        help='Frames per video for the video stages (default: 150)')
+    parser.add_argument('--out', type=str, default=None, help='Write results to this JSON file')
+    parser.add_argument('--compare', type=str, default=None, help='Earlier results JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='Slowdown counted as a regression, as a fraction (default: 0.10)')
+    args = parser.parse_args()
+
+    results = run_suite(args.stages, args.repeat, args.max_frames)
+    checks = check_gap_spread() + check_frame_numbers() if 'velocity' in args.stages else []
+    report = {
+        'meta': {
+            'timestamp': time.time(),
+            'commit': _git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'repeat': args.repeat,
+            'max_frames': args.max_frames,
+        },
+        'results': results,
+        'checks': checks,
+    }
+
+    regressions = []
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        report['regressions'] = regressions
+
+    if args.out:
+        with open(args.out, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nSaved results to {args.out}")
+
+    sys.exit(1 if regressions or not all(check['ok'] for check in checks) else 0)
+
+
+if __name__ == '__main__':
+    main()
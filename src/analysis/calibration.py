@@ -0,0 +1,239 @@
+"""
+Per-session wall calibration from an ArUco board, and 2D -> wall-frame reconstruction of the landmarks
+
+A session starts with a short clip of the wall with the board in view. calibrate_session() solves the
+camera intrinsics and the board's pose once; WallCalibration then turns the image landmarks of every frame
+into wall coordinates in a handful of array operations (see README: Calibration & Wall Plane Estimation).
+"""
+
+import json
+import warnings
+import numpy as np
+
+from core.constants import ARUCO_BOARD, CONTACT_LANDMARKS, MAX_REPROJECTION_ERROR, POSE_LANDMARKS
+from pose_store import IMAGE_CHANNELS
+
+#cv2.aruco lays boards out x right, y down the wall, z into it; the wall frame is X right, Y up, Z out of the wall
+_BOARD_TO_WALL = np.diag([1.0, -1.0, -1.0])
+
+_HIPS = [POSE_LANDMARKS.index('LEFT_HIP'), POSE_LANDMARKS.index('RIGHT_HIP')]
+
+
+class WallCalibration:
+    '''
+    Camera intrinsics and the wall plane of one session.
+
+    The wall frame has its origin at the board's top-left corner, X to the right along the board, Y up
+    the wall and Z out of the wall towards the camera, in meters (the board's marker length sets the
+    scale). `rotation` and `translation` take wall coordinates to camera coordinates: P_cam = R P_wall + t.
+    '''
+    def __init__(self, K, dist, rotation, translation, image_size, reprojection_error=None, board=None):
+        self.K = np.asarray(K, dtype=np.float64)
+        self.dist = np.asarray(dist, dtype=np.float64).ravel()
+        self.rotation = np.asarray(rotation, dtype=np.float64)
+        self.translation = np.asarray(translation, dtype=np.float64).ravel()
+        self.image_size = tuple(int(v) for v in image_size)
+        self.reprojection_error = reprojection_error
+        self.board = board or ARUCO_BOARD
+
+    @property
+    def accurate(self):
+        """False when the solve's RMS reprojection error is above MAX_REPROJECTION_ERROR (unknown counts as fine)"""
+        return self.reprojection_error is None or self.reprojection_error <= MAX_REPROJECTION_ERROR
+
+    def warn_if_inaccurate(self, source):
+        if not self.accurate:
+            print(f"⚠️  Wall calibration from {source} has a reprojection error of {self.reprojection_error:.2f} px, "
+                  f"above {MAX_REPROJECTION_ERROR} px: wall coordinates will be off, re-shoot the wall clip")
+
+    @property
+    def normal(self):
+        """The wall's Z axis (out of the wall) in camera coordinates"""
+        return self.rotation[:, 2]
+
+    def to_dict(self):
+        return {
+            'K': self.K.tolist(),
+            'dist': self.dist.tolist(),
+            'rotation': self.rotation.tolist(),
+            'translation': self.translation.tolist(),
+            'image_size': list(self.image_size),
+            'reprojection_error': self.reprojection_error,
+            'board': self.board,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['K'], data['dist'], data['rotation'], data['translation'], data['image_size'],
+                   data.get('reprojection_error'), data.get('board'))
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+    def rays(self, pixels):
+        """
+        Ray directions in camera coordinates for an (..., 2) array of pixel positions.
+        Without lens distortion this is one matrix multiply of every homogeneous pixel by K^-1.
+        """
+        pixels = np.asarray(pixels, dtype=np.float64)
+        flat = pixels.reshape(-1, 2)
+
+        if np.any(self.dist):
+            import cv2
+            #undistortPoints hands back normalised coordinates, i.e. with K^-1 already applied
+            normalised = cv2.undistortPoints(flat.reshape(-1, 1, 2), self.K, self.dist).reshape(-1, 2)
+            rays = np.column_stack([normalised, np.ones(len(flat))])
+        else:
+            rays = np.column_stack([flat, np.ones(len(flat))]) @ np.linalg.inv(self.K).T
+
+        return rays.reshape(pixels.shape[:-1] + (3,))
+
+    def intersect(self, pixels, valid=None):
+        """
+        Where the ray through each pixel meets the wall, for any (..., 2) array of pixels at once.
+
+        With camera centre C = 0 and the ray r(t) = t d, the wall (P - t_wall) . n = 0 gives
+        t = (t_wall . n) / (d . n). Rays parallel to the wall, hitting it behind the camera (t <= 0) or
+        masked out by `valid` come out as NaN.
+
+        Returns:
+            np.ndarray: (..., 3) points in the wall frame (Z is 0 up to rounding)
+        """
+        d = self.rays(pixels)
+        denom = d @ self.normal
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t = (self.translation @ self.normal) / denom
+
+        ok = np.isfinite(t) & (t > 0)
+        if valid is not None:
+            ok &= valid
+        points_cam = d * np.where(ok, t, np.nan)[..., None]
+
+        #R^T (P - t) for row vectors
+        return (points_cam - self.translation) @ self.rotation
+
+    def reconstruct(self, landmarks, header, visibility_threshold=0.5, contacts=CONTACT_LANDMARKS):
+        """
+        Every landmark of every frame in the wall frame.
+
+        An image ray only says where a landmark is if it lies on the wall, so only the contact landmarks
+        (hands and feet on holds) are intersected with it. MediaPipe's world skeleton, which is metric and
+        camera-aligned but hip-centred, is rotated into the wall frame and shifted in each frame by the
+        median offset between the intersected contacts and its own contact positions. That puts the hips
+        and the rest of the body at their real distance from the wall.
+
+        Args:
+            landmarks (np.ndarray): (frames, landmarks, channels) pose store array with x_img/y_img
+            header (dict): the pose store header
+            visibility_threshold (float, optional): contacts less visible than this are not used. Defaults to 0.5.
+            contacts (list, optional): landmarks assumed to touch the wall. Defaults to CONTACT_LANDMARKS.
+
+        Returns:
+            np.ndarray: (frames, landmarks, 3) wall-frame positions, NaN for frames with no usable contact
+        """
+        channels = header['channels']
+        if not set(IMAGE_CHANNELS) <= set(channels):
+            raise ValueError('Wall reconstruction needs image coordinates: extract with image_coords=True')
+
+        names = header['landmarks']
+        world = np.asarray(landmarks[..., [channels.index(c) for c in ('x_world', 'y_world', 'z_world')]], dtype=np.float64)
+        image = np.asarray(landmarks[..., [channels.index(c) for c in IMAGE_CHANNELS]], dtype=np.float64)
+        visibility = np.asarray(landmarks[..., channels.index('visibility')])
+
+        contact_idx = [names.index(name) for name in contacts]
+        pixels = image[:, contact_idx] * (header['width'], header['height'])
+        on_wall = self.intersect(pixels, visibility[:, contact_idx] >= visibility_threshold)
+
+        #MediaPipe's world axes are the camera's (x right, y down, z away), so only the rotation applies
+        world_wall = world @ self.rotation
+
+        with warnings.catch_warnings():
+            #frames where no contact was usable are all-NaN, and stay NaN
+            warnings.simplefilter('ignore', RuntimeWarning)
+            anchor = np.nanmedian(on_wall - world_wall[:, contact_idx], axis=1)
+
+        return world_wall + anchor[:, None, :]
+
+
+def hip_to_wall(positions):
+    """Distance of the hip centre from the wall (m) per frame, from reconstruct()'s output"""
+    return positions[:, _HIPS, 2].mean(axis=1)
+
+
+def board_from_settings(board=ARUCO_BOARD):
+    import cv2
+    dictionary = cv2.aruco.getPredefinedDictionary(getattr(cv2.aruco, board['dictionary']))
+    return cv2.aruco.GridBoard((board['markers_x'], board['markers_y']), board['marker_length'],
+                               board['marker_separation'], dictionary)
+
+
+def calibrate_session(video_path, board=ARUCO_BOARD, step=5, max_frames=600):
+    """
+    Find the board in a session's wall clip and solve for the camera and the wall.
+
+    Markers are detected on every `step`th frame. A session clip is usually one fixed view of one flat
+    board, which only pins down the focal length, so the principal point is held at the image centre,
+    pixels are square and distortion is zero. The wall pose comes from the frame with the most markers.
+    A solve with an RMS reprojection error above MAX_REPROJECTION_ERROR is kept, with a warning.
+
+    Args:
+        video_path (str): the session's wall clip with the board in view
+        board (dict, optional): board layout, see ARUCO_BOARD. Defaults to ARUCO_BOARD.
+        step (int, optional): detect on every step-th frame. Defaults to 5.
+        max_frames (int, optional): frames of the clip to look at. Defaults to 600.
+
+    Returns:
+        WallCalibration
+    """
+    import cv2
+
+    grid = board_from_settings(board)
+    detector = cv2.aruco.ArucoDetector(grid.getDictionary(), cv2.aruco.DetectorParameters())
+
+    cap = cv2.VideoCapture(str(video_path))
+    if not cap.isOpened():
+        raise FileNotFoundError(f'Could not open video: {video_path}')
+    image_size = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+
+    views = []
+    for frame_idx in range(max_frames):
+        ok, frame = cap.read()
+        if not ok:
+            break
+        if frame_idx % step:
+            continue
+        corners, ids, _ = detector.detectMarkers(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY))
+        if ids is None or len(ids) < 2:
+            continue
+        obj, img = grid.matchImagePoints(corners, ids)
+        #markers of the board's dictionary that aren't on the board (a stray tag) match nothing
+        if obj is None or len(obj) < 4:
+            continue
+        views.append((obj.astype(np.float32), img.astype(np.float32)))
+    cap.release()
+
+    if not views:
+        raise ValueError(f'No ArUco board ({board["dictionary"]}) found in {video_path}')
+
+    width, height = image_size
+    K = np.array([[max(width, height), 0, width / 2], [0, max(width, height), height / 2], [0, 0, 1]], dtype=np.float64)
+    flags = (cv2.CALIB_USE_INTRINSIC_GUESS | cv2.CALIB_FIX_PRINCIPAL_POINT | cv2.CALIB_FIX_ASPECT_RATIO
+             | cv2.CALIB_ZERO_TANGENT_DIST | cv2.CALIB_FIX_K1 | cv2.CALIB_FIX_K2 | cv2.CALIB_FIX_K3)
+    rms, K, dist, _, _ = cv2.calibrateCamera([obj for obj, _ in views], [img for _, img in views], image_size,
+                                             K, np.zeros(5), flags=flags)
+
+    obj, img = max(views, key=lambda view: len(view[0]))
+    ok, rvec, tvec = cv2.solvePnP(obj, img, K, dist)
+    if not ok:
+        raise ValueError(f'Could not solve the wall pose from {video_path}')
+    rotation = cv2.Rodrigues(rvec)[0] @ _BOARD_TO_WALL
+
+    wall = WallCalibration(K, dist, rotation, tvec, image_size, reprojection_error=float(rms), board=board)
+    wall.warn_if_inaccurate(video_path)
+    return wall
@@ -0,0 +1,143 @@
+"""
+Landmark cleaning before smoothing: put the undetected frames back, drop unreliable samples, fill short gaps
+
+Extraction leaves out frames with no pose, so consecutive rows of the landmark arrays are not always
+consecutive frames, and smoothing or differencing them as if they were turns every dropped frame into a speed
+spike. clean_landmarks() lays the landmarks out on their real frame numbers and repairs them in a few
+whole-array operations, so it runs on every clip by default. The timeline starts at the video's frame 0, so
+row i of the cleaned landmarks (and every movement window and criteria phase built on them) is frame i.
+"""
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from core.constants import CLEANING
+from core.profiling import profiler
+
+_REPORT_KEYS = ['frames', 'reinserted', 'low_visibility', 'outliers', 'filled', 'missing']
+
+
+def clean_landmarks(positions, visibility, frames, settings=CLEANING, first_frame=0):
+    """
+    Clean (samples, landmarks, 3) positions taken on the given frame numbers.
+
+    1. Every frame from first_frame to the last is given a row; frames that weren't detected are NaN, and
+       the ones before the first detection stay NaN.
+    2. Samples less visible than visibility_threshold are masked.
+    3. Samples further than jump_threshold from the NaN-skipping rolling median of their landmark
+       (median_window frames, centred) are rejected as jumps.
+    4. Runs of at most max_gap masked frames whose end samples are at least visibility_threshold visible
+       are filled by linear interpolation, or held at the nearest sample at the start and end of the clip.
+       Longer gaps stay NaN.
+
+    Args:
+        positions (np.ndarray): (samples, landmarks, 3)
+        visibility (np.ndarray): (samples, landmarks), or None to skip the visibility mask
+        frames (np.ndarray): (samples,) increasing frame numbers of the rows
+        settings (dict, optional): see CLEANING. Defaults to CLEANING.
+        first_frame (int, optional): frame number of the first row. Defaults to 0, the start of the video.
+
+    Returns:
+        positions (frames, landmarks, 3), frames (every frame number from first_frame to the last), and a
+        report with the number of frames reinserted and samples masked, rejected, filled and still missing
+    """
+    if len(frames) == 0:
+        return np.asarray(positions, dtype=np.float64), np.asarray(frames), dict.fromkeys(_REPORT_KEYS, 0)
+
+    with profiler.stage('clean_landmarks'):
+        positions, all_frames = reinsert_frames(np.asarray(positions, dtype=np.float64), frames, first_frame)
+        missing = np.isnan(positions).any(axis=2)
+        reinserted = len(all_frames) - len(frames)
+
+        low_visibility = np.zeros_like(missing)
+        if visibility is not None:
+            visibility, _ = reinsert_frames(np.asarray(visibility, dtype=np.float64), frames, first_frame)
+            low_visibility = ~missing & (visibility < settings['visibility_threshold'])
+            positions[low_visibility] = np.nan
+
+        median = rolling_nanmedian(positions, settings['median_window'])
+        jumps = np.linalg.norm(positions - median, axis=2) > settings['jump_threshold']
+        positions[jumps] = np.nan
+
+        #the frames before the first detection are not a gap in the clip, so they stay NaN
+        lead = frames[0] - all_frames[0]
+        before = np.isnan(positions).any(axis=2)
+        positions[lead:] = fill_gaps(positions[lead:], settings['max_gap'],
+                                     None if visibility is None else visibility[lead:],
+                                     settings['visibility_threshold'])
+        after = np.isnan(positions).any(axis=2)
+
+    report = {
+        'frames': len(all_frames),
+        'reinserted': reinserted,
+        'low_visibility': int(low_visibility.sum()),
+        'outliers': int(jumps.sum()),
+        'filled': int((before & ~after).sum()),
+        'missing': int(after.sum()),
+    }
+    profiler.count('clean_reinserted_frames', report['reinserted'])
+    profiler.count('clean_outliers', report['outliers'])
+    profiler.count('clean_filled', report['filled'])
+    return positions, all_frames, report
+
+
+def reinsert_frames(values, frames, first_frame=None):
+    """Rows of values put on every frame from first_frame (default frames[0]) to frames[-1], NaN where not given"""
+    frames = np.asarray(frames)
+    if not len(frames):
+        return np.full((0,) + values.shape[1:], np.nan), frames
+    first = frames[0] if first_frame is None else min(first_frame, frames[0])
+    all_frames = np.arange(first, frames[-1] + 1)
+    out = np.full((len(all_frames),) + values.shape[1:], np.nan)
+    out[frames - first] = values
+    return out, all_frames
+
+
+def rolling_nanmedian(values, window):
+    """
+    Centred rolling median along axis 0 that skips NaNs, NaN where a window has no sample.
+    Every window is sorted at once (NaNs sort last) and the median picked from the valid count.
+    """
+    half = window // 2
+    padded = np.pad(values, [(half, half)] + [(0, 0)] * (values.ndim - 1), constant_values=np.nan)
+    windows = np.sort(sliding_window_view(padded, window, axis=0), axis=-1)
+    counts = np.count_nonzero(~np.isnan(windows), axis=-1)
+
+    lower = np.take_along_axis(windows, (np.maximum(counts - 1, 0) // 2)[..., None], axis=-1)[..., 0]
+    upper = np.take_along_axis(windows, (counts // 2)[..., None], axis=-1)[..., 0]
+    return np.where(counts > 0, (lower + upper) / 2, np.nan)
+
+
+def fill_gaps(values, max_gap, visibility=None, min_visibility=0.0):
+    """
+    Linearly interpolate (frames, landmarks, axes) values over runs of at most max_gap missing frames of a
+    landmark, all landmarks and axes at once. A run at the start or end is held at the nearest sample.
+    With a (frames, landmarks) visibility, a run is only filled when the samples at its ends are at least
+    min_visibility.
+    """
+    missing = np.isnan(values).any(axis=2)
+    n_frames, n_landmarks = missing.shape
+    idx = np.arange(n_frames)[:, None]
+
+    #previous and next present frame of every frame, -1 / n_frames where there is none
+    prev = np.maximum.accumulate(np.where(missing, -1, idx), axis=0)
+    next_ = np.minimum.accumulate(np.where(missing, n_frames, idx)[::-1], axis=0)[::-1]
+    has_prev, has_next = prev >= 0, next_ < n_frames
+
+    prev_at, next_at = np.clip(prev, 0, n_frames - 1), np.clip(next_, 0, n_frames - 1)
+    cols = np.arange(n_landmarks)[None, :]
+
+    gap = np.where(has_prev, np.where(has_next, next_ - prev - 1, n_frames - 1 - prev), next_)
+    fill = missing & (has_prev | has_next) & (gap <= max_gap)
+    if visibility is not None:
+        seen = visibility >= min_visibility
+        fill &= (~has_prev | seen[prev_at, cols]) & (~has_next | seen[next_at, cols])
+
+    a = values[prev_at, cols]
+    b = values[next_at, cols]
+    a = np.where(has_prev[..., None], a, b)
+    b = np.where(has_next[..., None], b, a)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        weight = np.where(has_prev & has_next, (idx - prev) / (next_ - prev), 0.0)
+
+    return np.where(fill[..., None], a + (b - a) * weight[..., None], values)
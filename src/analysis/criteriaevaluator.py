@@ -0,0 +1,305 @@
+"""
+Vectorized evaluation of the six technique criteria (README: Criteria Thresholds, Algorithmic Checks Spec)
+
+Every per-frame signal the criteria look at (joint angles, hand and foot contacts, contact times, distances)
+is computed for the whole session as array operations, then reduced per phase with ufunc.reduceat over the
+phase runs from MovementPhaseDetector.label_phases. features() does the part that doesn't depend on any
+threshold, once per session; evaluate() only compares and reduces, so sweeping thresholds is a loop over
+evaluate() calls that take well under a millisecond each.
+
+Each criterion is judged in the phase the spec gives it. Decoupling, both feet set and hip to wall fail on a
+run of bad frames (arm bent, a foot off, hip out from the wall) longer than their time limit, not on a phase
+average. The holding hand is taken to be the hand on a hold, rather than the spec's higher and slower one:
+a bent arm only counts against decoupling when every hand that is on a hold is bent.
+"""
+
+import numpy as np
+
+from analysis.cleaning import clean_landmarks
+from analysis.kinematics import KinematicsEngine
+from core.constants import CRITERIA_THRESHOLDS, PHASES, POSE_LANDMARKS
+from pose_store import detected_frames, is_pose_store, read_pose_store, store_tracks, track_slices
+
+#the phase each criterion is judged in
+CRITERIA_PHASES = {
+    'decoupling': 'Preparation',
+    'hand_support': 'Reaching',
+    'weight_shift': 'Reaching',
+    'both_feet_set': 'Reaching',
+    'shoulder_relaxing': 'Stabilization',
+    'hip_to_wall': 'Reaching',
+}
+
+
+def _sides(part):
+    return np.array([POSE_LANDMARKS.index(f'{side}_{part}') for side in ('LEFT', 'RIGHT')])
+
+_SHOULDER, _ELBOW, _WRIST = _sides('SHOULDER'), _sides('ELBOW'), _sides('WRIST')
+_HIP, _KNEE, _TOE = _sides('HIP'), _sides('KNEE'), _sides('FOOT_INDEX')
+
+
+class CriteriaEvaluator:
+    '''
+    Judges every phase of a session against the six criteria.
+
+    Positions are (frames, landmarks, 3) in POSE_LANDMARKS order and in meters, either MediaPipe's world
+    coordinates or the wall frame; only angles, speeds and horizontal (x) distances are used, so both work.
+    A hand or foot counts as on a hold while it is slower than contact_speed. hip_to_wall needs a wall
+    calibration and is left out of the results without one.
+    '''
+    def __init__(self, fps=30.0, thresholds=None, visibility_threshold=0.5, smoothing_window=9):
+        self.fps = fps
+        self.thresholds = {**CRITERIA_THRESHOLDS, **(thresholds or {})}
+        self.visibility_threshold = visibility_threshold
+        self.smoothing_window = smoothing_window
+
+    def features(self, positions, visibility=None, hip_to_wall=None):
+        """
+        The threshold-independent per-frame signals of a session.
+
+        Args:
+            positions (np.ndarray): (frames, landmarks, 3) positions in meters
+            visibility (np.ndarray, optional): (frames, landmarks); angles and distances that involve a joint
+                less visible than visibility_threshold are NaN. Defaults to None.
+            hip_to_wall (np.ndarray, optional): (frames,) hip distance from the wall in meters. Defaults to None.
+
+        Returns:
+            dict of arrays, one row per frame and a left/right column where it applies: 'elbow' and
+            'shoulder' angles (degrees), 'hand_speed' and 'foot_speed' (m/s), 'over_foot' (m, how far hip
+            and knee are from above each foot) and 'hip_to_wall' (or None)
+        """
+        positions = np.asarray(positions, dtype=np.float64)
+        masked = positions
+        if visibility is not None:
+            masked = np.where((np.asarray(visibility) >= self.visibility_threshold)[..., None], positions, np.nan)
+
+        #speeds come from the unmasked positions: MediaPipe still places an occluded foot, and a foot
+        #behind a hold is usually a foot on it
+        window = self.smoothing_window if len(positions) >= self.smoothing_window else None
+        limbs = np.concatenate([_WRIST, _TOE])
+        speed = KinematicsEngine(fps=self.fps, window=window).compute(positions[:, limbs])['speed']
+
+        hip_x = masked[:, _HIP, 0].mean(axis=1, keepdims=True)
+        toe_x = masked[:, _TOE, 0]
+        over_foot = np.maximum(np.abs(hip_x - toe_x), np.abs(masked[:, _KNEE, 0] - toe_x))
+
+        return {
+            'elbow': joint_angles(masked[:, _SHOULDER], masked[:, _ELBOW], masked[:, _WRIST]),
+            'shoulder': joint_angles(masked[:, _HIP], masked[:, _SHOULDER], masked[:, _ELBOW]),
+            'hand_speed': speed[:, :2],
+            'foot_speed': speed[:, 2:],
+            'over_foot': over_foot,
+            'hip_to_wall': None if hip_to_wall is None else np.asarray(hip_to_wall, dtype=np.float64),
+        }
+
+    def evaluate(self, features, labels, thresholds=None):
+        """
+        Judge every phase against the criteria.
+
+        Per frame: how long the holding arm (every hand on a hold) has had both elbow and shoulder under
+        arm_straight_angle, how long each hand has held, how far hip and knee are from above the standing
+        foot, how long the feet have not both been set, whether the arms are open, and how long the hip has
+        been further than target + hip_to_wall_margin from the wall. Runs are counted from the phase start.
+        Per phase these are reduced to:
+
+            decoupling          longest holding-arm bend in Preparation, passes < arm_bent_time
+            hand_support        longest hand hold in Reaching, passes >= hand_support_time
+            weight_shift        closest hip/knee-over-foot in Reaching, passes <= weight_shift_distance
+            both_feet_set       longest time without both feet set in Reaching, passes <= feet_off_time
+            shoulder_relaxing   time until the arms reopen in Stabilization (inf if never), passes <= relax_time
+            hip_to_wall         longest time with the hip too far in Reaching, passes < hip_far_time
+
+        Args:
+            features (dict): from features()
+            labels (np.ndarray): (frames,) phase index per frame, from MovementPhaseDetector.label_phases
+            thresholds (dict, optional): overrides of this evaluator's thresholds. Defaults to None.
+
+        Returns:
+            dict: criterion -> {'start', 'end', 'value', 'passed'} arrays with one entry per judged phase
+            (end is exclusive). A value is NaN where the phase had no usable frame, which never passes.
+        """
+        t = {**self.thresholds, **(thresholds or {})}
+        labels = np.asarray(labels)
+        n_frames = len(labels)
+        if n_frames == 0:
+            return {}
+
+        starts = np.flatnonzero(np.diff(labels, prepend=labels[0] - 1))
+        ends = np.append(starts[1:], n_frames)
+        phases = labels[starts]
+        frame_idx = np.arange(n_frames)
+        phase_start = np.repeat(starts, ends - starts)
+
+        #a run that started before the phase only counts from the phase start
+        def phase_run_time(active):
+            return np.minimum(run_time(active, self.fps), (frame_idx - phase_start + 1) / self.fps)
+
+        def where_judged(value, signal):
+            #NaN for a phase without a single finite frame of the signal
+            return np.where(np.add.reduceat(np.isfinite(signal), starts) > 0, value, np.nan)
+
+        arms = np.minimum(features['elbow'], features['shoulder'])
+        widest_arm = np.fmax.reduce(arms, axis=1)
+        hand_on = features['hand_speed'] < t['contact_speed']
+        foot_on = features['foot_speed'] < t['contact_speed']
+
+        #NaN angles never count as bent
+        bent = (features['elbow'] < t['arm_straight_angle']) & (features['shoulder'] < t['arm_straight_angle'])
+        holding_bent = (bent | ~hand_on).all(axis=1) & hand_on.any(axis=1)
+        arm_bent = where_judged(np.fmax.reduceat(phase_run_time(holding_bent), starts), widest_arm)
+        hand_hold = run_time(hand_on, self.fps).max(axis=1)
+        standing = np.fmin.reduce(np.where(foot_on, features['over_foot'], np.nan), axis=1)
+        feet_off = phase_run_time(~foot_on.all(axis=1))
+        arms_open = widest_arm >= t['arm_straight_angle']
+
+        first_open = np.minimum.reduceat(np.where(arms_open, frame_idx, n_frames), starts)
+        relax = np.where(first_open < ends, (first_open - starts) / self.fps, np.inf)
+
+        #fmax/fmin.reduceat skip NaNs and give NaN only for a phase with no usable frame
+        values = {
+            'decoupling': (arm_bent, np.less, t['arm_bent_time']),
+            'hand_support': (np.fmax.reduceat(hand_hold, starts), np.greater_equal, t['hand_support_time']),
+            'weight_shift': (np.fmin.reduceat(standing, starts), np.less_equal, t['weight_shift_distance']),
+            'both_feet_set': (np.fmax.reduceat(feet_off, starts), np.less_equal, t['feet_off_time']),
+            'shoulder_relaxing': (where_judged(relax, widest_arm), np.less_equal, t['relax_time']),
+        }
+        if features['hip_to_wall'] is not None:
+            hip = features['hip_to_wall']
+            target = t['hip_to_wall_target']
+            if target is None:
+                target = np.nanpercentile(hip, 10) if np.isfinite(hip).any() else np.nan
+            hip_far = np.fmax.reduceat(phase_run_time(hip > target + t['hip_to_wall_margin']), starts)
+            values['hip_to_wall'] = (where_judged(hip_far, hip), np.less, t['hip_far_time'])
+
+        results = {}
+        for criterion, (value, compare, threshold) in values.items():
+            judged = phases == PHASES.index(CRITERIA_PHASES[criterion])
+            results[criterion] = {
+                'start': starts[judged],
+                'end': ends[judged],
+                'value': value[judged],
+                'passed': compare(value[judged], threshold),
+            }
+        return results
+
+
+def joint_angles(a, b, c):
+    """Angle at b (degrees) between b->a and b->c, for (..., 3) arrays of points"""
+    ba, bc = a - b, c - b
+    cos = np.einsum('...k,...k->...', ba, bc) / (np.linalg.norm(ba, axis=-1) * np.linalg.norm(bc, axis=-1))
+    return np.degrees(np.arccos(np.clip(cos, -1.0, 1.0)))
+
+
+def run_time(active, fps):
+    """Seconds each frame has been in its current run of True along axis 0, counting itself; 0 where False"""
+    idx = np.arange(len(active)).reshape((-1,) + (1,) * (active.ndim - 1))
+    last_off = np.maximum.accumulate(np.where(active, -1, idx), axis=0)
+    return np.where(active, idx - last_off, 0) / fps
+
+
+def segment_mean(values, starts):
+    """NaN-ignoring mean of each segment beginning at starts"""
+    finite = np.isfinite(values)
+    sums = np.add.reduceat(np.where(finite, values, 0.0), starts)
+    counts = np.add.reduceat(finite, starts)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.where(counts > 0, sums / counts, np.nan)
+
+
+def summarize(results):
+    """
+    criterion -> its phase, counts of judged/evaluated/passed phases and every judged phase as a plain dict,
+    ready for json (values that aren't finite, like a shoulder that never relaxed, become None)
+    """
+    summary = {}
+    for criterion, result in results.items():
+        finite = np.isfinite(result['value'])
+        summary[criterion] = {
+            'phase': CRITERIA_PHASES[criterion],
+            'phases': int(len(result['value'])),
+            'evaluated': int((~np.isnan(result['value'])).sum()),
+            'passed': int(result['passed'].sum()),
+            'results': [
+                {'start': int(start), 'end': int(end), 'value': float(value) if ok else None, 'passed': bool(passed)}
+                for start, end, value, ok, passed in zip(result['start'], result['end'], result['value'], finite,
+                                                        result['passed'])
+            ],
+        }
+    return summary
+
+
+def positions_from_wide(df):
+    """(frames, landmarks, 3) world positions and (frames, landmarks) visibility out of the wide table"""
+    positions = np.stack([
+        df[[f'{axis}_world_{landmark}' for axis in ('x', 'y', 'z')]].to_numpy(dtype=np.float64)
+        for landmark in POSE_LANDMARKS
+    ], axis=1)
+    visibility = df[[f'visibility_{landmark}' for landmark in POSE_LANDMARKS]].to_numpy(dtype=np.float64)
+    return positions, visibility
+
+
+def load_session(pose_path, calibration=None, clean=True, track=None):
+    """
+    Everything features() needs from a pose store or wide csv, on the same frames VelocityCalculator uses
+    (so MovementPhaseDetector's windows index them). Cleaned like VelocityCalculator's by default, which
+    puts every frame from frame 0 to the last detected one back; the visibility returned is then None,
+    since the low-visibility samples have already been masked and filled. Without cleaning these are the
+    detected frames and, with a calibration, only the ones that could be placed on the wall.
+
+    In a multi-person pose `track` picks the climber (default: the first, main track). The frames are still
+    the ones any track was seen on, as in VelocityCalculator, with this track NaN where it wasn't.
+
+    Returns:
+        positions, visibility, fps, hip_to_wall (None without a calibration)
+    """
+    if not is_pose_store(pose_path):
+        import pandas as pd
+        if calibration is not None:
+            raise ValueError('Wall coordinates need the image landmarks of a pose store, not a csv')
+        df = pd.read_csv(pose_path)
+        frames, t_sec = df['frame'].to_numpy(), df['t_sec'].to_numpy()
+        order = np.argsort(frames, kind='stable')
+        frames, t_sec = frames[order], t_sec[order]
+        fps = (frames[-1] - frames[0]) / (t_sec[-1] - t_sec[0]) if len(df) > 1 and t_sec[-1] > t_sec[0] else 30.0
+        positions, visibility = positions_from_wide(df)
+        if 'track' in df.columns:
+            rows = df['track'].to_numpy() == (df['track'].iloc[0] if track is None else track)
+            frames = np.unique(frames)
+            at = np.searchsorted(frames, df['frame'].to_numpy()[rows])
+            positions = _scatter(positions[rows], at, len(frames))
+            visibility = _scatter(visibility[rows], at, len(frames))
+        else:
+            positions, visibility = positions[order], visibility[order]
+    else:
+        landmarks, header = read_pose_store(pose_path)
+        frames = detected_frames(landmarks)
+        landmarks = np.asarray(landmarks[frames], dtype=np.float64)
+        slices = track_slices(header)
+        own = slices[store_tracks(header).index(track)] if track is not None else slices[0]
+        visibility = landmarks[:, own, header['channels'].index('visibility')]
+        fps = header['fps']
+        if calibration is None:
+            positions = landmarks[:, own][..., [header['channels'].index(f'{axis}_world') for axis in ('x', 'y', 'z')]]
+        else:
+            #every track is placed, as VelocityCalculator needs them all to decide which frames to keep
+            placed_tracks = [calibration.reconstruct(landmarks[:, columns], header) for columns in slices]
+            positions = placed_tracks[slices.index(own)]
+
+    if clean:
+        positions, _, _ = clean_landmarks(positions, visibility, frames)
+        visibility = None
+    elif calibration is not None:
+        placed = np.any([~np.isnan(placed_track).any(axis=(1, 2)) for placed_track in placed_tracks], axis=0)
+        positions, visibility = positions[placed], visibility[placed]
+
+    if calibration is None:
+        return positions, visibility, fps, None
+    from analysis.calibration import hip_to_wall
+    return positions, visibility, fps, hip_to_wall(positions)
+
+
+def _scatter(rows, at, n_frames):
+    """Rows put on their positions `at` of an n_frames long array, NaN in between"""
+    out = np.full((n_frames,) + rows.shape[1:], np.nan)
+    out[at] = rows
+    return out
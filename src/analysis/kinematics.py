@@ -0,0 +1,127 @@
+import numpy as np
+from math import factorial
+from functools import lru_cache
+from scipy.ndimage import correlate1d
+
+
+class KinematicsEngine:
+    '''
+    Smooths and differentiates a whole (frames x landmarks x 3) position block along the time axis at once.
+
+    Position, velocity and acceleration all come from Savitzky-Golay filters. Their coefficients are worked
+    out once per (window, polyorder, fps) and applied to every landmark and axis in one correlation, with
+    the first and last half-window fitted the same way scipy's savgol_filter(mode='interp') does it.
+
+    Positions may have NaN gaps (ones cleaning left unfilled). A landmark with gaps is smoothed one finite run
+    at a time, with the run's own edges fitted like the clip's, so a gap only costs its own frames rather than
+    a window's worth on either side. Runs shorter than the window get the longest odd window that fits them,
+    and runs too short for any fit keep their raw positions and finite differences.
+    '''
+    def __init__(self, fps=30.0, window=21, polyorder=2):
+        if window is not None and (window % 2 == 0 or window < 3 or window <= polyorder):
+            raise ValueError(f'window must be odd, at least 3 and larger than polyorder, got window={window}, '
+                             f'polyorder={polyorder}')
+        self.fps = fps
+        self.window = window
+        self.polyorder = polyorder
+
+    def compute(self, positions, landmarks=None):
+        """
+        Args:
+            positions (np.ndarray): (frames, landmarks, 3) positions in meters
+            landmarks (list, optional): names for the landmark axis, passed through to the result
+
+        Returns:
+            dict with contiguous arrays 'position', 'velocity', 'acceleration' (frames, landmarks, 3),
+            'speed' (frames, landmarks), 'timestamps' (frames,) and 'landmarks', the landmark index.
+        """
+        positions = np.ascontiguousarray(positions, dtype=np.float64)
+        dt = 1.0 / self.fps
+
+        if self.window is None:
+            # no smoothing, plain finite differences
+            position = positions
+            velocity = np.gradient(positions, dt, axis=0)
+            acceleration = np.gradient(velocity, dt, axis=0)
+        else:
+            if len(positions) < self.window:
+                raise ValueError(f'need at least {self.window} frames to smooth, got {len(positions)}')
+            position = self._smooth(positions, 0)
+            velocity = self._smooth(positions, 1)
+            acceleration = self._smooth(positions, 2) if self.polyorder >= 2 else np.gradient(velocity, dt, axis=0)
+
+        return {
+            'landmarks': list(landmarks) if landmarks is not None else list(range(positions.shape[1])),
+            'position': position,
+            'velocity': velocity,
+            'acceleration': acceleration,
+            'speed': np.sqrt(np.einsum('flc,flc->fl', velocity, velocity)),
+            'timestamps': np.arange(len(positions)) * dt,
+        }
+
+    def _smooth(self, positions, deriv):
+        """_apply() over the whole block, then redone run by run for the landmarks with gaps"""
+        out = self._apply(positions, deriv, self.window)
+        finite = ~np.isnan(positions).any(axis=2)
+        for landmark in np.flatnonzero(~finite.all(axis=0)):
+            out[:, landmark] = np.nan
+            for start, stop in finite_runs(finite[:, landmark]):
+                out[start:stop, landmark] = self._apply_run(positions[start:stop, landmark], deriv)
+        return out
+
+    def _apply_run(self, run, deriv):
+        """Smooth one gap-free (samples, 3) run, with a shorter window if it is shorter than the window"""
+        window = min(self.window, len(run) if len(run) % 2 else len(run) - 1)
+        if window >= 3 and window > self.polyorder:
+            return self._apply(run[:, None], deriv, window)[:, 0]
+        if deriv == 0:
+            return run
+        if len(run) <= deriv:
+            return np.full_like(run, np.nan)
+        out = run
+        for _ in range(deriv):
+            out = np.gradient(out, 1.0 / self.fps, axis=0)
+        return out
+
+    def _apply(self, positions, deriv, window):
+        fit = savgol_matrix(window, self.polyorder, deriv, 1.0 / self.fps)
+        half = window // 2
+
+        # interior: every frame is the centre of its window
+        out = correlate1d(positions, fit[half], axis=0, mode='constant')
+
+        # edges: evaluate the polynomial fitted to the first/last full window
+        out[:half] = np.tensordot(fit[:half], positions[:window], axes=1)
+        out[-half:] = np.tensordot(fit[half + 1:], positions[-window:], axes=1)
+        return out
+
+
+def finite_runs(mask):
+    """[start, stop) of every run of True in a 1-D boolean mask"""
+    edges = np.diff(np.concatenate([[0], mask.astype(np.int8), [0]]))
+    return zip(np.flatnonzero(edges == 1), np.flatnonzero(edges == -1))
+
+
+@lru_cache(maxsize=None)
+def savgol_matrix(window, polyorder, deriv, delta):
+    """
+    (window x window) matrix whose row i, dotted with a window of samples, gives the `deriv`-th derivative
+    of their least-squares polynomial at position i of the window. The centre row is the usual
+    Savitzky-Golay filter, the others are used for the edges.
+    """
+    half = window // 2
+    t = np.arange(-half, half + 1, dtype=np.float64)
+
+    # least squares: polynomial coefficients = pinv(A) @ samples
+    A = np.vander(t, polyorder + 1, increasing=True)
+    coeffs = np.linalg.pinv(A)
+
+    # derivative of each power term evaluated at each position
+    powers = np.arange(polyorder + 1)
+    scale = np.array([factorial(k) / factorial(k - deriv) if k >= deriv else 0.0 for k in powers])
+    exps = np.clip(powers - deriv, 0, None)
+    evaluate = scale * t[:, None] ** exps
+
+    matrix = evaluate @ coeffs / delta**deriv
+    matrix.setflags(write=False)
+    return matrix
@@ -0,0 +1,144 @@
+import time
+import numpy as np
+
+from analysis.kinematics import savgol_matrix
+from core.constants import KEY_LANDMARKS, PHASES
+
+
+class LivePhaseDetector:
+    '''
+    Frame-at-a-time phase detection for live feeds.
+
+    The offline MovementPhaseDetector needs the whole clip (global mean/std, 0.5 x max threshold). This one
+    only looks backwards: positions go into a ring buffer, velocity comes from a causal Savitzky-Golay fit
+    evaluated at the newest frame, and speeds are standardised against running (Welford) statistics. A
+    landmark changes between still and moving once the new state has held for `min_duration` frames, so a
+    phase transition is reported at most `min_duration - 1` frames after the frame it happened on.
+    '''
+    def __init__(self, fps=30.0, landmarks=KEY_LANDMARKS, window=9, polyorder=2, z_threshold=1.0,
+                 min_duration=4, warmup_frames=None):
+        self.fps = fps
+        self.landmarks = [landmark.lower() for landmark in landmarks]
+        self.window = window
+        self.z_threshold = z_threshold
+        self.min_duration = min_duration
+        self.warmup_frames = warmup_frames if warmup_frames is not None else int(fps)
+
+        # newest row of the fit matrix = derivative of the fitted polynomial at the latest sample
+        self._velocity_weights = savgol_matrix(window, polyorder, 1, 1.0 / fps)[-1]
+
+        n = len(self.landmarks)
+        self._ring = np.zeros((window, n, 3))
+        self._filled = 0
+        self._head = 0
+
+        # running mean / variance of speed per landmark
+        self._count = 0
+        self._mean = np.zeros(n)
+        self._m2 = np.zeros(n)
+
+        self._moving = np.zeros(n, dtype=bool)
+        self._streak = np.zeros(n, dtype=np.int32)
+
+        self._wrists = np.array([landmark.endswith('_wrist') for landmark in self.landmarks])
+        self._ankles = np.array([landmark.endswith('_ankle') for landmark in self.landmarks])
+
+        self.phase = PHASES.index('Stabilization')
+        self.latency = LatencyHistogram(budget_ms=1000.0 / fps)
+
+    @property
+    def latency_frames(self):
+        """Worst-case delay, in frames, between a transition and the update that reports it"""
+        return self.min_duration - 1
+
+    def update(self, frame_idx, positions):
+        """
+        Feed one frame.
+
+        Args:
+            frame_idx (int): frame number, used to date the transition
+            positions (np.ndarray | None): (landmarks, 3) world positions in the detector's landmark
+                order, or None when no pose was found (the frame is skipped, state is held)
+
+        Returns:
+            None, or (frame_idx the transition happened on, old phase name, new phase name)
+        """
+        start = time.perf_counter()
+        transition = self._step(frame_idx, positions)
+        self.latency.record(time.perf_counter() - start)
+        return transition
+
+    def _step(self, frame_idx, positions):
+        if positions is None or np.isnan(positions).any():
+            return None
+
+        self._ring[self._head] = positions
+        self._head = (self._head + 1) % self.window
+        self._filled = min(self._filled + 1, self.window)
+        if self._filled < self.window:
+            return None
+
+        # ring in time order: oldest sample sits at the head
+        order = (self._head + np.arange(self.window)) % self.window
+        velocity = np.tensordot(self._velocity_weights, self._ring[order], axes=1)
+        speed = np.sqrt((velocity ** 2).sum(axis=1))
+
+        self._count += 1
+        delta = speed - self._mean
+        self._mean += delta / self._count
+        self._m2 += delta * (speed - self._mean)
+        if self._count < self.warmup_frames:
+            return None
+
+        std = np.sqrt(self._m2 / self._count)
+        z = (speed - self._mean) / np.where(std > 0, std, np.inf)
+
+        # debounce: a landmark only flips after its new state has held for min_duration frames
+        wants = z > self.z_threshold
+        self._streak = np.where(wants != self._moving, self._streak + 1, 0)
+        flip = self._streak >= self.min_duration
+        self._moving[flip] = wants[flip]
+        self._streak[flip] = 0
+
+        if self._moving[self._wrists].any():
+            phase = PHASES.index('Reaching')
+        elif self._moving[self._ankles].any():
+            phase = PHASES.index('Preparation')
+        else:
+            phase = PHASES.index('Stabilization')
+
+        if phase == self.phase:
+            return None
+        old, self.phase = self.phase, phase
+        return frame_idx - self.latency_frames, PHASES[old], PHASES[phase]
+
+
+class LatencyHistogram:
+    '''
+    Fixed 1 ms buckets of per-frame processing time, so recording is O(1) however long the session runs.
+    '''
+    def __init__(self, budget_ms=33.3, max_ms=250):
+        self.budget_ms = budget_ms
+        self.counts = np.zeros(max_ms + 1, dtype=np.int64)  # last bucket collects everything above max_ms
+
+    def record(self, seconds):
+        self.counts[min(int(seconds * 1000.0), len(self.counts) - 1)] += 1
+
+    def percentile(self, q):
+        total = self.counts.sum()
+        if total == 0:
+            return 0.0
+        return float(np.searchsorted(np.cumsum(self.counts), q / 100.0 * total) + 1)
+
+    def summary(self):
+        total = int(self.counts.sum())
+        over = int(self.counts[int(self.budget_ms):].sum())
+        return {
+            'frames': total,
+            'budget_ms': self.budget_ms,
+            'p50_ms': self.percentile(50),
+            'p95_ms': self.percentile(95),
+            'p99_ms': self.percentile(99),
+            'over_budget': over,
+            'histogram_ms': {f'{i}-{i + 1}': int(c) for i, c in enumerate(self.counts) if c},
+        }
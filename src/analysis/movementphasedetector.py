@@ -1,73 +1,155 @@
+import warnings
 import numpy as np
-import pandas as pd
-import math as m
-import matplotlib.pyplot as plt
 from analysis.velocitycalculator import VelocityCalculator
+from core.constants import PHASES, SEGMENTATION
+from core.profiling import profiler
+from pose_store import split_tracks
 
 class MovementPhaseDetector:
-    def __init__(self):
-        pass
+    def __init__(self, smoothing_method='savgol', smoothing_strength='aggressive', verbose=False, calibration=None,
+                 threshold_ratio=SEGMENTATION['threshold_ratio'], min_duration=SEGMENTATION['min_duration'], clean=True):
+        self.smoothing_method = smoothing_method
+        self.smoothing_strength = smoothing_strength
+        self.verbose = verbose
+        self.calibration = calibration
+        self.threshold_ratio = threshold_ratio
+        self.min_duration = min_duration
+        self.clean = clean
 
     def segment_motions(self, csv_path):
-        calc = VelocityCalculator(fps=30, smoothing_method='savgol', smoothing_strength='aggressive')
+        calc = VelocityCalculator(fps=30, smoothing_method=self.smoothing_method, smoothing_strength=self.smoothing_strength,
+                                  verbose=self.verbose, calibration=self.calibration, clean=self.clean)
         vel_data =calc.calculate_from_csv(csv_path)
+        windows = self.segment_velocities(vel_data)
+
+        if self.verbose:
+            print(windows)
+
+        return windows
+
+    def segment_velocities(self, vel_data):
+        """Movement windows of every landmark in VelocityCalculator output, as [start, end] frame pairs"""
+        # every landmark is segmented together as one (frames, landmarks) array
+        landmarks = list(vel_data.keys())
+        speeds = np.column_stack([vel_data[landmark]['speed_3d'] for landmark in landmarks])
+
+        with profiler.stage('segment.intervals'):
+            z_scores = self.z_scores(speeds)
+            columns, starts, ends = self.find_intervals(z_scores)
+        profiler.count('movement_intervals', len(starts))
+
+        windows = {
+            landmark: np.column_stack([starts[columns == i], ends[columns == i]]).tolist()
+            for i, landmark in enumerate(landmarks)
+        }
+        return windows
+
+    def z_scores(self, speeds):
+        """Standardise each column (landmark) of a (frames, landmarks) speed array, skipping NaN (unfilled gap) frames"""
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            return (speeds - np.nanmean(speeds, axis=0)) / np.nanstd(speeds, axis=0)
+
+    def find_intervals(self, z_scores, threshold_ratio=None, min_duration=None):
+        """
+        Find movement intervals in every column of a (frames, landmarks) z-score array at once.
+
+        A column is moving where it is above threshold_ratio * its max (the detector's own threshold_ratio
+        and min_duration unless given). An interval starts on an upward
+        crossing and ends on the next downward crossing (end is the first frame back at or below the
+        threshold), and is kept if it lasts at least min_duration frames. Runs already above the threshold
+        at frame 0, or still above it at the last frame, have no crossing on that side and are dropped, as
+        are runs next to a NaN frame (no pose yet, or a gap cleaning left open).
+
+        Returns:
+            (columns, starts, ends): one entry per interval, ordered by column then start
+        """
+        threshold_ratio = self.threshold_ratio if threshold_ratio is None else threshold_ratio
+        min_duration = self.min_duration if min_duration is None else min_duration
+        z_scores = np.asarray(z_scores)
+        if z_scores.ndim == 1:
+            z_scores = z_scores[:, None]
+        n_frames, n_cols = z_scores.shape
+
+        with warnings.catch_warnings():
+            #a column with no frame at all stays NaN and never moves
+            warnings.simplefilter('ignore', RuntimeWarning)
+            moving = z_scores > threshold_ratio * np.nanmax(z_scores, axis=0)
+
+        # pad with stationary frames so every run has a rising and a falling edge, then pair them up
+        padded = np.zeros((n_cols, n_frames + 2), dtype=np.int8)
+        padded[:, 1:-1] = moving.T
+        edges = np.diff(padded, axis=1)
+        columns, starts = np.nonzero(edges == 1)
+        _, ends = np.nonzero(edges == -1)
+
+        #a NaN frame next to a run hides its crossing just like the clip edge
+        seen = np.zeros((n_cols, n_frames + 2), dtype=bool)
+        seen[:, 1:-1] = ~np.isnan(z_scores).T
+        keep = seen[columns, starts] & seen[columns, ends + 1] & (ends - starts >= min_duration)
+        return columns[keep], starts[keep], ends[keep]
 
-        # self.find_z_score_at_joint('left_knee', vel_data)
-
-        z_scores = {}
-
-        for landmark in vel_data.keys():  # Use .keys() instead of .items()
-            z_scores[landmark] = self.find_z_score_at_joint(landmark, vel_data)
-
-        windows = {}
-
-        for landmark in z_scores.keys():
-            windows[landmark] = self.find_movement_intervals(z_scores[landmark])
-
-        print(windows)
-
-        # self._identify_prep_phases(windows, vel_data)
-
-
-        
     def find_movement_intervals(self, z_score_array):
-        threshold = 0.5 * max(z_score_array)
-        intervals = []
-        start = None
-        
-        for i in range(1, len(z_score_array)):
-            # Check for crossing above threshold
-            if (z_score_array[i-1] <= threshold) and (z_score_array[i] > threshold):
-                start = i
-            
-            # Check for crossing below threshold
-            if (z_score_array[i-1] > threshold) and (z_score_array[i] <= threshold) and (start is not None):
-                duration = i - start
-                if duration >= 7:
-                    intervals.append([start, i])
-                    start = None  # Only reset after checking
-        
-        return intervals
+        _, starts, ends = self.find_intervals(z_score_array)
+        return np.column_stack([starts, ends]).tolist()
+
+    def label_phases(self, windows, n_frames):
+        """
+        Label every frame with a phase index into PHASES in one pass over the intervals.
+
+        A frame is Reaching while either wrist is moving, Preparation while only the feet are 
+        moving, and Stabilization otherwise.
+        """
+        landmarks = list(windows.keys())
+        intervals = [(i, start, end) for i, landmark in enumerate(landmarks) for start, end in windows[landmark]]
+
+        # +1 where an interval opens, -1 where it closes; the running sum is >0 while the landmark moves
+        marks = np.zeros((n_frames + 1, len(landmarks)), dtype=np.int32)
+        if intervals:
+            cols, starts, ends = np.array(intervals).T
+            np.add.at(marks, (starts, cols), 1)
+            np.add.at(marks, (ends, cols), -1)
+        moving = np.cumsum(marks[:-1], axis=0) > 0
+
+        wrists = [i for i, landmark in enumerate(landmarks) if landmark.upper().endswith('_WRIST')]
+        ankles = [i for i, landmark in enumerate(landmarks) if landmark.upper().endswith('_ANKLE')]
+        reaching = moving[:, wrists].any(axis=1)
+        preparing = moving[:, ankles].any(axis=1) & ~reaching
+
+        labels = np.full(n_frames, PHASES.index('Stabilization'), dtype=np.int8)
+        labels[preparing] = PHASES.index('Preparation')
+        labels[reaching] = PHASES.index('Reaching')
+        return labels
+
+    def label_track_phases(self, windows, n_frames):
+        """
+        label_phases() of every climber in multi-person windows (keys track<id>/<landmark>), as
+        {track: labels}. Single-person windows come back as {None: labels}.
+        """
+        return {track: self.label_phases(track_windows, n_frames)
+                for track, track_windows in split_tracks(windows).items()}
 
     def find_z_score_at_joint(self, landmark_name, velocity_data):
         speeds = velocity_data[landmark_name]['speed_3d']
 
         # Debug: Check the actual velocity values
-        print(f"\n🔍 DEBUG for {landmark_name}:")
-        print(f"   Speed range: {np.min(speeds):.6f} to {np.max(speeds):.6f} m/s")
-        print(f"   Speed mean: {np.mean(speeds):.6f} m/s")
-        print(f"   Speed std: {np.std(speeds):.6f} m/s")
-        print(f"   First 5 speeds: {speeds[:5]}")
+        if self.verbose:
+            print(f"\n🔍 DEBUG for {landmark_name}:")
+            print(f"   Speed range: {np.min(speeds):.6f} to {np.max(speeds):.6f} m/s")
+            print(f"   Speed mean: {np.mean(speeds):.6f} m/s")
+            print(f"   Speed std: {np.std(speeds):.6f} m/s")
+            print(f"   First 5 speeds: {speeds[:5]}")
         
 
         mean = np.mean(speeds)
         standard_dev = np.std(speeds)
 
-        z_scores = [(speed - mean) / standard_dev for speed in speeds]
+        z_scores = (speeds - mean) / standard_dev
 
-        print(f"   Z-score range: {np.min(z_scores):.3f} to {np.max(z_scores):.3f}")
-        print(f"   Z-scores > 2: {np.sum(np.array(z_scores) > 2)}")
-        print(f"   Z-scores > 5: {np.sum(np.array(z_scores) > 5)}")
+        if self.verbose:
+            print(f"   Z-score range: {np.min(z_scores):.3f} to {np.max(z_scores):.3f}")
+            print(f"   Z-scores > 2: {np.sum(z_scores > 2)}")
+            print(f"   Z-scores > 5: {np.sum(z_scores > 5)}")
 
         # timestamps = velocity_data[landmark_name]['timestamps'][1:]  # Remove first timestamp
         
@@ -79,12 +161,3 @@ class MovementPhaseDetector:
         # plt.show()
 
         return z_scores
-
-    def _identify_prep_phases(self, windows, vel_data):
-        total_frames = range(len(vel_data[list(vel_data.keys())[0]]['speed_3d']))
-        for frame_i in total_frames:
-            right_ankle_moving = np.where(frame_i in windows['RIGHT_ANKLE'], True, False)
-            left_ankle_moving = np.where(frame_i in windows['LEFT_ANKLE'], True, False)
-            print(right_ankle_moving)
-            print(left_ankle_moving)
-
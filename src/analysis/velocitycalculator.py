@@ -1,4 +1,3 @@
-import pandas as pd
 import numpy as np
 import sys
 import os
@@ -6,104 +5,243 @@ import os
 # Add parent src directory to path for imports
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from core.constants import KEY_LANDMARKS
+from core.constants import KEY_LANDMARKS, SMOOTHING_POLYORDER, SMOOTHING_WINDOWS
+from core.profiling import profiler
+from analysis.cleaning import clean_landmarks
+from analysis.kinematics import KinematicsEngine
+from pose_store import detected_frames, is_pose_store, read_pose_store, track_columns, track_label, track_slices
 
 class VelocityCalculator:
     '''
     This calculator takes the input of all of the points in a video of someone moving. 
 
     The output of this calculator gives all the speed values for each important point at each frame. 
+
+    Positions are MediaPipe's hip-centred world coordinates, or wall coordinates (X right, Y up, Z out of 
+    the wall) when a WallCalibration is given. In the wall frame hip_to_wall is filled in as well; it is the 
+    hips' Z, so it comes out of the same reconstruction at no extra cost.
+
+    Unless clean=False the landmarks go through clean_landmarks() first, so they sit on their real frame
+    numbers from frame 0 (self.frames, so windows are video frame numbers) with undetected frames, low-visibility samples and jumps filled in or left NaN.
+
+    Multi-person poses (a store with tracks, or a wide csv with a track column) are analyzed in the same
+    pass: every track's landmarks are keyed track<id>/<landmark>, on the frames any track was seen on, and
+    NaN where that track wasn't. In the wall frame hip_to_wall is the first (main) track's.
     '''
-    def __init__(self, fps=None, smoothing_method='savgol', smoothing_strength='aggressive'):
+    def __init__(self, fps=None, smoothing_method='savgol', smoothing_strength='aggressive', verbose=False,
+                 calibration=None, polyorder=SMOOTHING_POLYORDER, clean=True):
         self.smoothing_method = smoothing_method
         self.smoothing_strength = smoothing_strength
+        self.polyorder = polyorder
+        self.clean = clean
+        self.frames = None
+        self.cleaning = None
+        self.verbose = verbose
+        self.calibration = calibration
+        self.hip_to_wall = None
 
     def calculate_from_csv(self, csv_path):
-        pose_data = self._convert_csv(csv_path)
-
-        # Get actual FPS from the CSV data
-        fps = self._get_fps_from_data()
+        with profiler.stage('velocity.load'):
+            pose_data, fps = self.load_positions(csv_path)
 
 
         # print("Detected fps: ", fps)
-        velocity_data = self.calculate_velocities(pose_data, fps)
+        with profiler.stage('velocity.kinematics'):
+            velocity_data = self.calculate_velocities(pose_data, fps)
         
         # Validate the results
-        validated_data = self.validate_velocities(velocity_data)
+        with profiler.stage('velocity.validate'):
+            validated_data = self.validate_velocities(velocity_data)
 
         # print("Velocity range:", np.min(validated_data), "to", np.max(validated_data))
         # self.test_with_known_movement(validated_data)
         
         return validated_data
     
+    def load_positions(self, csv_path):
+        """
+        Key landmark positions of a pose store or wide csv and the clip's fps, before any smoothing.
+        Callers that smooth the same session several ways (see core.sweep) load it once with this.
+        """
+        pose_data = self._convert_csv(csv_path)
+
+        # Get actual FPS from the CSV data
+        return pose_data, self._get_fps_from_data()
+
     def _get_fps_from_data(self):
         """Extract actual FPS from the CSV timestamps"""
-        if hasattr(self, 'df') and 't_sec' in self.df.columns:
+        if getattr(self, 'store_fps', None):
+            return self.store_fps
+        elif hasattr(self, 'df') and {'frame', 't_sec'} <= set(self.df.columns) and len(self.df) > 1:
+            #by frame number, so frames missing from the csv don't stretch the frame time
+            fps = (self.df['frame'].iloc[-1] - self.df['frame'].iloc[0]) / (self.df['t_sec'].iloc[-1] - self.df['t_sec'].iloc[0])
+            if self.verbose:
+                print(f"📊 Detected FPS: {fps:.2f}")
+            return fps
+        elif hasattr(self, 'df') and 't_sec' in self.df.columns:
             time_diffs = np.diff(self.df['t_sec'].values)
             avg_frame_time = np.mean(time_diffs[time_diffs > 0])  # Remove zeros
             fps = 1.0 / avg_frame_time
-            print(f"📊 Detected FPS: {fps:.2f}")
+            if self.verbose:
+                print(f"📊 Detected FPS: {fps:.2f}")
             return fps
         else:
-            print("⚠️  Using default FPS: 30.0")
+            if self.verbose:
+                print("⚠️  Using default FPS: 30.0")
             return 30.0
     
     def _convert_csv(self, csv_path):
+        if is_pose_store(csv_path):
+            return self._convert_store(csv_path)
+
+        import pandas as pd  # only the csv path needs it, the pose store is read with numpy
+
+        if self.calibration is not None:
+            raise ValueError('Wall coordinates need the image landmarks of a pose store, not a csv')
+
+        self.store_fps = None
         self.df = pd.read_csv(csv_path)
 
-        pose_data = {
-            landmark.lower(): {
-                coord: self.df[f'{coord}_world_{landmark}'].values 
-                for coord in ['x', 'y', 'z']
-                if f'{coord}_world_{landmark}' in self.df.columns
-            }
-            for landmark in KEY_LANDMARKS
-            if f'x_world_{landmark}' in self.df.columns
-        }
+        names = [
+            landmark for landmark in KEY_LANDMARKS
+            if all(f'{coord}_world_{landmark}' in self.df.columns for coord in ['x', 'y', 'z'])
+        ]
+        positions = np.stack([
+            self.df[[f'{coord}_world_{landmark}' for coord in ['x', 'y', 'z']]].to_numpy(dtype=np.float64)
+            for landmark in names
+        ], axis=1)
+        visibility = None
+        if all(f'visibility_{landmark}' in self.df.columns for landmark in names):
+            visibility = self.df[[f'visibility_{landmark}' for landmark in names]].to_numpy(dtype=np.float64)
+        frames = self.df['frame'].to_numpy() if 'frame' in self.df.columns else np.arange(len(self.df))
+
+        if 'track' in self.df.columns:
+            positions, visibility, frames, names = self._tracks_side_by_side(
+                self.df['track'].to_numpy(), positions, visibility, frames, names)
+            #fps from the first and last frame of the clip rather than of the csv's last and first tracks
+            order = np.argsort(self.df['frame'].to_numpy(), kind='stable')
+            self.df = self.df.iloc[order]
+
+        positions, _ = self._clean(positions, visibility, frames)
+        return self._pose_dict(positions, names)
+
+    def _tracks_side_by_side(self, track_of_row, positions, visibility, frames, names):
+        """
+        Rows of (track, frame) laid out as one row per frame with every track's landmarks next to each
+        other, NaN where a track wasn't seen
+        """
+        tracks = list(dict.fromkeys(track_of_row))
+        all_frames = np.unique(frames)
+        n = len(names)
+        wide_positions = np.full((len(all_frames), len(tracks) * n, 3), np.nan)
+        wide_visibility = None if visibility is None else np.full((len(all_frames), len(tracks) * n), np.nan)
+        for k, track in enumerate(tracks):
+            rows = track_of_row == track
+            at = np.searchsorted(all_frames, frames[rows])
+            wide_positions[at, k * n:(k + 1) * n] = positions[rows]
+            if visibility is not None:
+                wide_visibility[at, k * n:(k + 1) * n] = visibility[rows]
+        labels = [track_label(track, name) for track in tracks for name in names]
+        return wide_positions, wide_visibility, all_frames, labels
 
-        return pose_data
+    def _convert_store(self, store_path):
+        """Read the key landmarks straight out of a memory-mapped pose store, no csv parse."""
+        landmarks, header = read_pose_store(store_path)
+        self.store_fps = header['fps']
+
+        frames = detected_frames(landmarks)
+        channels = header['channels']
+        if self.calibration is not None:
+            return self._convert_wall(landmarks[frames], header, frames)
+
+        names = [landmark for landmark in KEY_LANDMARKS if landmark in header['landmarks']]
+        columns, labels = track_columns(header, names)
+        block = np.asarray(landmarks[np.ix_(frames, columns)], dtype=np.float64)
+        positions = block[..., [channels.index(f'{coord}_world') for coord in ['x', 'y', 'z']]]
+
+        positions, _ = self._clean(positions, block[..., channels.index('visibility')], frames)
+        return self._pose_dict(positions, labels)
     
-    def _smooth_position_data(self, position_array):
+    def _convert_wall(self, landmarks, header, frames):
+        """Key landmarks in the wall frame, every landmark of every frame back-projected in one go."""
+        from analysis.calibration import hip_to_wall
+
+        #frames where no hand or foot could be put on the wall are all NaN: cleaning fills the short runs of
+        #them like undetected frames. Each track is back-projected as its own skeleton.
+        slices = track_slices(header)
+        positions = np.concatenate([
+            self.calibration.reconstruct(landmarks[:, columns], header) for columns in slices
+        ], axis=1)
+        positions, frames = self._clean(positions, landmarks[..., header['channels'].index('visibility')], frames)
+        if not self.clean:
+            placed = np.any([~np.isnan(positions[:, columns]).any(axis=(1, 2)) for columns in slices], axis=0)
+            positions, self.frames = positions[placed], frames[placed]
+        self.hip_to_wall = hip_to_wall(positions)
+
+        names = [landmark for landmark in KEY_LANDMARKS if landmark in header['landmarks']]
+        columns, labels = track_columns(header, names)
+        return self._pose_dict(positions[:, columns], labels)
+
+    def _clean(self, positions, visibility, frames):
+        """clean_landmarks() unless cleaning is off; sets self.frames (and the report in self.cleaning)"""
+        if self.clean:
+            positions, frames, self.cleaning = clean_landmarks(positions, visibility, frames)
+            if self.verbose:
+                print(f"🧹 Cleaning: {self.cleaning}")
+        self.frames = np.asarray(frames)
+        return positions, self.frames
+
+    def _pose_dict(self, positions, names):
+        return {
+            name.lower(): {coord: positions[:, i, axis] for axis, coord in enumerate(['x', 'y', 'z'])}
+            for i, name in enumerate(names)
+        }
+
+    def _kinematics_engine(self, fps):
         if self.smoothing_method == 'none':
-            return position_array
-        
-        if self.smoothing_method == 'savgol':
-            from scipy.signal import savgol_filter
-            window_size = 21
-            polyorder = 2
-            return savgol_filter(position_array, window_size, polyorder)
+            return KinematicsEngine(fps=fps, window=None)
+        return KinematicsEngine(fps=fps, window=smoothing_window(self.smoothing_strength), polyorder=self.polyorder)
+
+    def calculate_kinematics(self, positions, fps=30.0, landmarks=None):
+        """
+        Smooth and differentiate a (frames x landmarks x 3) position block in one vectorized pass.
+        See KinematicsEngine.compute for the returned arrays.
+        """
+        return self._kinematics_engine(fps).compute(positions, landmarks)
 
     def calculate_velocities(self, pose_data, fps=30.0):
         """
         Calculate 3D velocities for all landmarks using vectorized NumPy operations.
+        All landmarks go through the kinematics engine together; the per-landmark dicts are views into its arrays.
         """
+        names = [
+            landmark for landmark, coords in pose_data.items()
+            if all(coord in coords for coord in ['x', 'y', 'z'])
+        ]
+        if not names:
+            return {}
+
+        # (frames, landmarks, 3)
+        positions = np.stack([
+            np.column_stack([pose_data[landmark][coord] for coord in ['x', 'y', 'z']])
+            for landmark in names
+        ], axis=1)
+
+        kinematics = self.calculate_kinematics(positions, fps, names)
+
         velocity_data = {}
-        
-        for landmark, coords in pose_data.items():
-            if all(coord in coords for coord in ['x', 'y', 'z']):
-                # Get NumPy arrays sepperated into their own variables
-                x = self._smooth_position_data(coords['x'])
-                z = self._smooth_position_data(coords['z'])
-                y = self._smooth_position_data(coords['y']) 
-                
-                #use numpy to calculate the differences while time progresses. These are the arrays with dx (change in time of x)
-                dx = np.diff(x) * fps  # meters/second
-                dy = np.diff(y) * fps
-                dz = np.diff(z) * fps
-                
-                # 3D speed magnitude
-                speed_3d = np.sqrt(dx**2 + dy**2 + dz**2)
-                
-                velocity_data[landmark] = {
-                    'x': x,
-                    'y': y,
-                    'z': z,
-                    'velocity_x': dx,
-                    'velocity_y': dy,
-                    'velocity_z': dz,
-                    'speed_3d': speed_3d,
-                    'timestamps': np.arange(len(x)) / fps
-                }
+        for i, landmark in enumerate(names):
+            velocity_data[landmark] = {
+                'x': kinematics['position'][:, i, 0],
+                'y': kinematics['position'][:, i, 1],
+                'z': kinematics['position'][:, i, 2],
+                'velocity_x': kinematics['velocity'][:, i, 0],  # meters/second
+                'velocity_y': kinematics['velocity'][:, i, 1],
+                'velocity_z': kinematics['velocity'][:, i, 2],
+                'acceleration': kinematics['acceleration'][:, i],
+                'speed_3d': kinematics['speed'][:, i],
+                'timestamps': kinematics['timestamps']
+            }
 
         return velocity_data
 
@@ -111,35 +249,45 @@ class VelocityCalculator:
     def validate_velocities(self, velocity_data):
         """
         Validate that calculated velocities are reasonable for human movement.
+        Suspicious landmarks are counted in the profiler; the full report is only printed when verbose.
         """
-        print("🔍 VELOCITY VALIDATION REPORT")
-        print("=" * 50)
+        if self.verbose:
+            print("🔍 VELOCITY VALIDATION REPORT")
+            print("=" * 50)
         
         for landmark, data in velocity_data.items():
             speeds = data['speed_3d']
+            if np.isnan(speeds).all():
+                continue
             
-            max_speed = np.max(speeds)
-            avg_speed = np.mean(speeds)
-            p95_speed = np.percentile(speeds, 95)
+            # frames in gaps too long to fill are NaN
+            max_speed = np.nanmax(speeds)
+
+            # Sanity checks
+            if max_speed > 10.0:  # 36 km/h is very fast for climbing
+                profiler.count('landmarks_speed_warning')
+            elif max_speed > 5.0:  # 18 km/h is fast but possible
+                profiler.count('landmarks_speed_caution')
+
+            if not self.verbose:
+                continue
+
+            avg_speed = np.nanmean(speeds)
+            p95_speed = np.nanpercentile(speeds, 95)
             
             print(f"\n{landmark.upper()}:")
             print(f"  Max speed: {max_speed:.3f} m/s ({max_speed*3.6:.1f} km/h)")
             print(f"  Avg speed: {avg_speed:.3f} m/s")
             print(f"  95th percentile: {p95_speed:.3f} m/s")
             
-            # Sanity checks
-            if max_speed > 10.0:  # 36 km/h is very fast for climbing
+            if max_speed > 10.0:
                 print(f"  ⚠️  WARNING: Suspiciously high speed!")
-            elif max_speed > 5.0:  # 18 km/h is fast but possible
+            elif max_speed > 5.0:
                 print(f"  🟡 CAUTION: High speed - check if realistic")
-                return velocity_data
-
             else:
                 print(f"  ✅ Speed range looks reasonable")
-                return velocity_data
 
-
-        
+        return velocity_data
                 
         
     # def test_with_known_movement(self, velocity_data):
@@ -184,4 +332,17 @@ class VelocityCalculator:
             
     #         print(f"\n{landmark}: {still_percentage:.1f}% static frames")
             
-    #     return velocity_data
\ No newline at end of file
+    #     return velocity_data
+
+
+def smoothing_window(strength):
+    """Savitzky-Golay window for a smoothing strength: a name from SMOOTHING_WINDOWS, or the window length itself"""
+    if isinstance(strength, str) and not strength.isdigit():
+        if strength not in SMOOTHING_WINDOWS:
+            raise ValueError(f"Unknown smoothing strength '{strength}': expected one of "
+                             f"{', '.join(SMOOTHING_WINDOWS)} or an odd window length")
+        return SMOOTHING_WINDOWS[strength]
+    window = int(strength)
+    if window < 3 or window % 2 == 0:
+        raise ValueError(f"Smoothing window must be an odd length of at least 3, got {window}")
+    return window
@@ -0,0 +1,160 @@
+"""
+Batch mode: run the analysis pipeline over many videos with a pool of long-lived workers
+"""
+
+import glob
+import json
+import os
+import time
+import traceback
+import multiprocessing
+from contextlib import redirect_stdout, redirect_stderr
+from pathlib import Path
+
+from core.profiling import profiler
+
+VIDEO_EXTENSIONS = {'.mp4', '.mov', '.avi', '.mkv', '.m4v'}
+
+
+def collect_videos(pattern):
+    """Videos in a directory, or matching a glob pattern, in sorted order"""
+    path = Path(pattern)
+    if path.is_dir():
+        candidates = path.iterdir()
+    else:
+        candidates = (Path(p) for p in glob.glob(pattern, recursive=True))
+    return sorted(p for p in candidates if p.is_file() and p.suffix.lower() in VIDEO_EXTENSIONS)
+
+
+def run_batch(videos, output_dir, workers=2, cache_dir=None, cache_max_bytes=None, pose_settings=None,
+              smoothing_method='savgol', smoothing_strength='aggressive', adaptive=False,
+              roi=False, calibration=None, threshold_ratio=None, min_duration=None, render=False,
+              multi_person=False):
+    """
+    Analyze every video in a process pool and write a summary manifest.
+
+    Each worker imports the pipeline and loads its Pose model once, then keeps both for every video it is
+    given. A video's console output goes to <output_dir>/<stem>/pipeline.log, and a failure is recorded in
+    the manifest without stopping the other videos. A calibration clip is solved once up front and every 
+    video is analyzed in that session's wall frame. With render every video also gets its annotated copy,
+    with multi_person every climber in a video is tracked and analyzed separately.
+
+    Returns:
+        dict: the manifest, also saved as <output_dir>/batch_manifest.json
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    pose_settings = pose_settings or {}
+
+    if calibration and Path(calibration).suffix != '.json':
+        from core.engine import load_calibration
+        cache = None
+        if cache_dir:
+            from core.cache import PipelineCache, DEFAULT_MAX_BYTES
+            cache = PipelineCache(cache_dir, max_bytes=cache_max_bytes or DEFAULT_MAX_BYTES)
+        load_calibration(calibration, output_dir, cache)
+        calibration = output_dir / f"{Path(calibration).stem}.calibration.json"
+
+    settings = {
+        'pose_settings': pose_settings,
+        'smoothing_method': smoothing_method,
+        'smoothing_strength': smoothing_strength,
+        'threshold_ratio': threshold_ratio,
+        'min_duration': min_duration,
+        'adaptive': adaptive,
+        'roi': roi,
+        'calibration': str(calibration) if calibration else None,
+        'render': render,
+        'multi_person': multi_person,
+        'profile': profiler.enabled,
+        'cache_dir': str(cache_dir) if cache_dir else None,
+        'cache_max_bytes': cache_max_bytes,
+    }
+    jobs = [(str(video), str(output_dir / video.stem), settings) for video in videos]
+
+    print(f"📦 Batch: {len(jobs)} videos, {workers} workers -> {output_dir}")
+    started = time.time()
+    results = []
+
+    # spawn so every worker builds its own mediapipe graph
+    ctx = multiprocessing.get_context('spawn')
+    with ctx.Pool(processes=max(1, min(workers, len(jobs) or 1)), initializer=_init_worker,
+                  initargs=(pose_settings,)) as pool:
+        for done, result in enumerate(pool.imap_unordered(_run_one, jobs), start=1):
+            profiler.merge(result.pop('profile'), result.pop('pid'))
+            results.append(result)
+            if result['status'] == 'ok':
+                print(f"  [{done}/{len(jobs)}] ✅ {Path(result['video']).name} ({result['seconds']:.1f}s)")
+            else:
+                print(f"  [{done}/{len(jobs)}] ❌ {Path(result['video']).name}: {result['error']}")
+
+    results.sort(key=lambda r: r['video'])
+    failed = sum(r['status'] != 'ok' for r in results)
+    manifest = {
+        'started': started,
+        'seconds': time.time() - started,
+        'settings': settings,
+        'succeeded': len(results) - failed,
+        'failed': failed,
+        'videos': results,
+    }
+
+    manifest_path = output_dir / 'batch_manifest.json'
+    with open(manifest_path, 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    print(f"🎉 Batch done: {manifest['succeeded']} ok, {failed} failed in {manifest['seconds']:.1f}s. "
+          f"Manifest: {manifest_path}")
+    return manifest
+
+
+def _init_worker(pose_settings):
+    """Pay the import and model-load cost once per worker rather than once per video"""
+    from pose_extract import keep_pose_models
+    import core.engine  # noqa: F401  pulls in widen_data, analysis, scipy
+    keep_pose_models(pose_settings)
+
+
+def _run_one(job):
+    from core.engine import run_pipeline
+    from core.cache import PipelineCache, DEFAULT_MAX_BYTES
+
+    video, video_dir, settings = job
+    if settings['profile']:
+        #a fresh summary per video, the worker's last one went back with its result
+        profiler.enable()
+    video_dir = Path(video_dir)
+    video_dir.mkdir(parents=True, exist_ok=True)
+
+    result = {'video': video, 'output_dir': str(video_dir), 'status': 'ok', 'outputs': {}, 'error': None}
+    start = time.perf_counter()
+    with open(video_dir / 'pipeline.log', 'w') as log, redirect_stdout(log), redirect_stderr(log):
+        try:
+            cache = None
+            if settings['cache_dir']:
+                cache = PipelineCache(settings['cache_dir'], max_bytes=settings['cache_max_bytes'] or DEFAULT_MAX_BYTES)
+
+            outputs = run_pipeline(
+                video, video_dir, cache=cache,
+                pose_settings=settings['pose_settings'],
+                smoothing_method=settings['smoothing_method'],
+                smoothing_strength=settings['smoothing_strength'],
+                threshold_ratio=settings['threshold_ratio'],
+                min_duration=settings['min_duration'],
+                adaptive=settings['adaptive'],
+                roi=settings['roi'],
+                calibration=settings['calibration'],
+                render=settings['render'],
+                multi_person=settings['multi_person'],
+            )
+            result['outputs'] = {name: str(path) for name, path in outputs.items() if name not in ('windows', 'criteria')}
+            result['windows'] = outputs['windows']
+        except Exception as e:
+            traceback.print_exc()
+            result['status'] = 'failed'
+            result['error'] = f'{type(e).__name__}: {e}'
+
+    result['seconds'] = time.perf_counter() - start
+    result['profile'] = profiler.summary() if settings['profile'] else None
+    result['pid'] = os.getpid()
+    return result
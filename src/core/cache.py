@@ -0,0 +1,170 @@
+"""
+Content-addressed cache for pipeline stage outputs
+"""
+
+import os
+import json
+import time
+import shutil
+import hashlib
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+DEFAULT_CACHE_DIR = '.climblab_cache'
+DEFAULT_MAX_BYTES = 5 * 1024**3
+
+
+class PipelineCache:
+    '''
+    Keeps the outputs of each pipeline stage keyed by what went into them.
+
+    A stage key hashes the stage name, its parameters and the key of the stage it reads from, with the
+    video's content hash at the root. Changing a parameter therefore changes that stage's key and every
+    key downstream of it, while the stages before it still hit. Entries are files under <root>/<key>/
+    and the least recently used ones are evicted once the cache grows past max_bytes.
+
+    Several processes (batch workers) can share one cache: every change to index.json is made under a
+    file lock on a fresh read of it, so one process's entries are never written over by another's.
+    '''
+    def __init__(self, root=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.index_path = self.root / 'index.json'
+        self.index = self._load_index()
+
+    def video_hash(self, video_path):
+        """sha256 of the video file, remembered per (path, size, mtime) so unchanged videos are hashed once"""
+        video_path = Path(video_path).resolve()
+        stat = video_path.stat()
+        stamp = f'{video_path}:{stat.st_size}:{stat.st_mtime_ns}'
+
+        known = self.index['videos'].get(stamp)
+        if known:
+            return known
+
+        digest = hashlib.sha256()
+        with open(video_path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+
+        with self._locked_index() as index:
+            index['videos'][stamp] = digest.hexdigest()
+        return digest.hexdigest()
+
+    def stage_key(self, stage, parent_key, params=None):
+        """Key for one stage's output given the key of its input and its own parameters"""
+        payload = json.dumps({'stage': stage, 'parent': parent_key, 'params': params or {}}, sort_keys=True)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def fetch(self, key, dest_paths):
+        """
+        Copy a cached entry's files out to dest_paths (matched by file name order).
+        Returns False on a miss, in which case the stage has to run.
+        """
+        # another process may have stored it since we last read the index (os.replace keeps reads whole)
+        self.index = self._load_index()
+        entry = self.index['entries'].get(key)
+        if entry is None:
+            return False
+
+        entry_dir = self.root / key
+        cached = [entry_dir / name for name in entry['files']]
+        if not all(path.exists() for path in cached):
+            # someone deleted files behind our back, treat it as a miss
+            with self._locked_index():
+                self._remove(key)
+            return False
+
+        for src, dest in zip(cached, dest_paths):
+            shutil.copy2(src, dest)
+
+        with self._locked_index() as index:
+            if key in index['entries']:
+                index['entries'][key]['last_used'] = time.time()
+        return True
+
+    def store(self, key, stage, paths):
+        """Add a finished stage's output files to the cache, then evict down to the size cap"""
+        entry_dir = self.root / key
+        entry_dir.mkdir(exist_ok=True)
+
+        files = []
+        size = 0
+        for path in paths:
+            path = Path(path)
+            shutil.copy2(path, entry_dir / path.name)
+            files.append(path.name)
+            size += path.stat().st_size
+
+        now = time.time()
+        with self._locked_index() as index:
+            index['entries'][key] = {'stage': stage, 'files': files, 'bytes': size, 'created': now, 'last_used': now}
+            self._evict()
+
+    def info(self):
+        """Entries sorted most recently used first, plus the total size"""
+        entries = sorted(self.index['entries'].items(), key=lambda kv: kv[1]['last_used'], reverse=True)
+        total = sum(entry['bytes'] for _, entry in entries)
+        return entries, total
+
+    def clear(self):
+        with self._locked_index() as index:
+            for key in list(index['entries']):
+                self._remove(key)
+            index['videos'] = {}
+
+    def _evict(self):
+        entries, total = self.info()
+        # oldest last, pop from the end until we fit
+        while entries and total > self.max_bytes:
+            key, entry = entries.pop()
+            total -= entry['bytes']
+            self._remove(key)
+
+    def _remove(self, key):
+        shutil.rmtree(self.root / key, ignore_errors=True)
+        self.index['entries'].pop(key, None)
+
+    @contextmanager
+    def _locked_index(self):
+        """
+        Hold the index lock, re-read index.json into self.index and save it back on the way out, so changes
+        made by other processes since we last read it are kept
+        """
+        with open(self.root / 'index.lock', 'a+b') as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            else:
+                lock.seek(0)
+                msvcrt.locking(lock.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                self.index = self._load_index()
+                yield self.index
+                self._save_index()
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+                else:
+                    lock.seek(0)
+                    msvcrt.locking(lock.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def _load_index(self):
+        if self.index_path.exists():
+            with open(self.index_path) as f:
+                return json.load(f)
+        return {'entries': {}, 'videos': {}}
+
+    def _save_index(self):
+        # only called under _locked_index(); the temp file keeps readers from ever seeing half an index
+        tmp_path = self.index_path.with_suffix(f'.{os.getpid()}.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(self.index, f, indent=1)
+        os.replace(tmp_path, self.index_path)
+
@@ -14,4 +14,88 @@ KEY_LANDMARKS = [
     'RIGHT_ANKLE', 
     # 'LEFT_HIP', 'LEFT_KNEE', 
     'LEFT_ANKLE'
-]
\ No newline at end of file
+]
+# All 33 MediaPipe Pose landmarks, in the index order the model outputs them
+POSE_LANDMARKS = [
+    'NOSE',
+    'LEFT_EYE_INNER', 'LEFT_EYE', 'LEFT_EYE_OUTER',
+    'RIGHT_EYE_INNER', 'RIGHT_EYE', 'RIGHT_EYE_OUTER',
+    'LEFT_EAR', 'RIGHT_EAR',
+    'MOUTH_LEFT', 'MOUTH_RIGHT',
+    'LEFT_SHOULDER', 'RIGHT_SHOULDER',
+    'LEFT_ELBOW', 'RIGHT_ELBOW',
+    'LEFT_WRIST', 'RIGHT_WRIST',
+    'LEFT_PINKY', 'RIGHT_PINKY',
+    'LEFT_INDEX', 'RIGHT_INDEX',
+    'LEFT_THUMB', 'RIGHT_THUMB',
+    'LEFT_HIP', 'RIGHT_HIP',
+    'LEFT_KNEE', 'RIGHT_KNEE',
+    'LEFT_ANKLE', 'RIGHT_ANKLE',
+    'LEFT_HEEL', 'RIGHT_HEEL',
+    'LEFT_FOOT_INDEX', 'RIGHT_FOOT_INDEX'
+]
+
+# Skeleton bones between POSE_LANDMARKS, the same pairs as mediapipe's POSE_CONNECTIONS (for drawing without it)
+POSE_CONNECTIONS = [
+    ('NOSE', 'LEFT_EYE_INNER'), ('NOSE', 'RIGHT_EYE_INNER'), ('LEFT_EYE_INNER', 'LEFT_EYE'),
+    ('LEFT_EYE', 'LEFT_EYE_OUTER'), ('LEFT_EYE_OUTER', 'LEFT_EAR'), ('RIGHT_EYE_INNER', 'RIGHT_EYE'),
+    ('RIGHT_EYE', 'RIGHT_EYE_OUTER'), ('RIGHT_EYE_OUTER', 'RIGHT_EAR'), ('MOUTH_LEFT', 'MOUTH_RIGHT'),
+    ('LEFT_SHOULDER', 'RIGHT_SHOULDER'), ('LEFT_SHOULDER', 'LEFT_ELBOW'), ('RIGHT_SHOULDER', 'RIGHT_ELBOW'),
+    ('LEFT_ELBOW', 'LEFT_WRIST'), ('RIGHT_ELBOW', 'RIGHT_WRIST'), ('LEFT_WRIST', 'LEFT_PINKY'),
+    ('LEFT_WRIST', 'LEFT_INDEX'), ('LEFT_WRIST', 'LEFT_THUMB'), ('RIGHT_WRIST', 'RIGHT_PINKY'),
+    ('RIGHT_WRIST', 'RIGHT_INDEX'), ('RIGHT_WRIST', 'RIGHT_THUMB'), ('LEFT_PINKY', 'LEFT_INDEX'),
+    ('RIGHT_PINKY', 'RIGHT_INDEX'),
+    ('LEFT_SHOULDER', 'LEFT_HIP'), ('RIGHT_SHOULDER', 'RIGHT_HIP'), ('LEFT_HIP', 'RIGHT_HIP'),
+    ('LEFT_HIP', 'LEFT_KNEE'), ('RIGHT_HIP', 'RIGHT_KNEE'), ('LEFT_KNEE', 'LEFT_ANKLE'),
+    ('RIGHT_KNEE', 'RIGHT_ANKLE'), ('LEFT_ANKLE', 'LEFT_HEEL'), ('LEFT_ANKLE', 'LEFT_FOOT_INDEX'),
+    ('RIGHT_ANKLE', 'RIGHT_HEEL'), ('RIGHT_ANKLE', 'RIGHT_FOOT_INDEX'), ('LEFT_HEEL', 'LEFT_FOOT_INDEX'),
+    ('RIGHT_HEEL', 'RIGHT_FOOT_INDEX'),
+]
+
+# Savitzky-Golay window (frames) for each --smoothing-strength; a number is taken as the window itself
+SMOOTHING_WINDOWS = {'light': 9, 'medium': 15, 'aggressive': 21}
+SMOOTHING_POLYORDER = 2
+
+# Movement intervals: a landmark moves while its speed z-score is above threshold_ratio * its max z-score,
+# and an interval counts if it lasts at least min_duration frames
+SEGMENTATION = {'threshold_ratio': 0.5, 'min_duration': 7}
+
+# Landmark cleaning before smoothing (analysis/cleaning.py): samples less visible than visibility_threshold
+# and ones further than jump_threshold (m) from the rolling median of median_window frames are dropped, then
+# gaps of at most max_gap frames with visibility_threshold at both ends are interpolated (README test plan: gaps
+# of at most 5 frames, visibility of at least 0.6 at the endpoints)
+CLEANING = {'visibility_threshold': 0.6, 'median_window': 7, 'jump_threshold': 0.25, 'max_gap': 5}
+
+# Movement similarity search (similarity.py): intervals are embedded as embedding_length resampled frames, the
+# shortlist nearest embeddings are re-ranked with DTW restricted to band * query length frames off the diagonal
+SIMILARITY = {'embedding_length': 16, 'shortlist': 50, 'band': 0.1}
+
+# Climbing phases, in the order of the integer labels MovementPhaseDetector.label_phases returns
+PHASES = ['Preparation', 'Reaching', 'Stabilization']
+# Landmarks taken to be on the wall (hands and feet on holds); wall calibration anchors the skeleton to them
+CONTACT_LANDMARKS = ['LEFT_INDEX', 'RIGHT_INDEX', 'LEFT_FOOT_INDEX', 'RIGHT_FOOT_INDEX']
+
+# ArUco grid board fixed to the wall for the per-session calibration, lengths in meters
+ARUCO_BOARD = {
+    'dictionary': 'DICT_4X4_50',
+    'markers_x': 4,
+    'markers_y': 3,
+    'marker_length': 0.10,
+    'marker_separation': 0.02,
+}
+# Largest acceptable RMS reprojection error of a wall calibration, in pixels (README: re-shoot above 0.8 px)
+MAX_REPROJECTION_ERROR = 0.8
+
+# Initial thresholds of the six technique criteria (README: Criteria Thresholds); degrees, seconds, meters
+CRITERIA_THRESHOLDS = {
+    'arm_straight_angle': 150.0,     #decoupling and shoulder relaxing: elbow and shoulder at least this open
+    'arm_bent_time': 0.2,            #decoupling: longest time the holding arm may stay bent during foot setup
+    'hand_support_time': 1.0,        #supporting hand held at least this long during a reach
+    'weight_shift_distance': 0.10,   #hip and knee within this horizontal distance of the standing foot
+    'feet_off_time': 0.2,            #longest time a foot may be off the wall during a reach
+    'relax_time': 0.7,               #time after the grip for the arms to reopen
+    'hip_to_wall_margin': 0.05,      #hip within this of the target distance from the wall
+    'hip_far_time': 0.3,             #longest time the hip may stay further than that during a reach
+    'hip_to_wall_target': None,      #None takes the session's own 10th percentile as the target
+    'contact_speed': 0.25,           #a hand or foot slower than this (m/s) is taken to be on a hold
+}
@@ -5,6 +5,7 @@ Simple pipeline for testing climbing video analysis
 """
 
 import argparse
+import json
 import sys
 import os
 from pathlib import Path
@@ -13,12 +14,20 @@ from pathlib import Path
 src_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(src_dir)
 
-from pose_extract import extract_landmarks
-from widen_data import widen_pose
-# from analysis.velocitycalculator import VelocityCalculator  # We'll add this later
+# only light modules at the top: mediapipe/cv2 (pose_extract), pandas (widen_data) and scipy (analysis) are
+# imported by the step that needs them, so --help, --cache and --analyze-only start without them
+from core.cache import PipelineCache, DEFAULT_CACHE_DIR, DEFAULT_MAX_BYTES
+from core.constants import CLEANING, SEGMENTATION, SMOOTHING_WINDOWS
+from core.profiling import profiler
 
-from analysis.velocitycalculator import VelocityCalculator
-from analysis.movementphasedetector import MovementPhaseDetector
+def smoothing_strength(value):
+    """argparse type for --smoothing-strength: a SMOOTHING_WINDOWS name or an odd window of at least 3"""
+    if value in SMOOTHING_WINDOWS:
+        return value
+    if not value.isdigit() or int(value) < 3 or int(value) % 2 == 0:
+        raise argparse.ArgumentTypeError(f"expected one of {', '.join(SMOOTHING_WINDOWS)} or an odd window "
+                                         f"length of at least 3, got '{value}'")
+    return value
 
 def create_parser():
     """Create command-line argument parser"""
@@ -30,6 +39,15 @@ Examples:
   python main.py video.mp4                    # Full analysis
   python main.py video.mp4 --preview          # Preview pose detection only
   python main.py video.mp4 --output results/  # Custom output directory
+  python main.py video.mp4 --workers 4        # Extract poses on 4 CPU cores
+  python main.py video.mp4 --render           # Also save the video with skeleton and phases drawn on
+  python main.py video.mp4 --multi-person     # Follow and analyze every climber in frame separately
+  python main.py videos/ --batch --workers 4  # Analyze every video in a directory (or glob)
+  python main.py data/video.pose.wide.csv --analyze-only  # Re-run the analysis on extracted poses
+  python main.py data/video.pose.bin --sweep --workers 4  # Table of segmentation results per setting
+  python main.py video.mp4 --profile prof.json --profile-format chrome  # Per-stage timing trace
+  python main.py --cache info                 # List cached stage results
+  python main.py --cache clear                # Empty the result cache
         """
     )
     
@@ -37,6 +55,7 @@ Examples:
     parser.add_argument(
         'video_path',
         type=str,
+        nargs='?',
         help='Path to the climbing video file to analyze'
     )
     
@@ -54,6 +73,172 @@ Examples:
         help='Output directory for analysis results (default: data)'
     )
     
+    parser.add_argument(
+        '--analyze-only',
+        action='store_true',
+        help='Treat video_path as an existing .pose.bin or .pose.wide.csv and only run the movement analysis '
+             '(never loads MediaPipe or OpenCV)'
+    )
+    
+    parser.add_argument(
+        '--sweep',
+        action='store_true',
+        help='Treat video_path as an existing .pose.bin or .pose.wide.csv and segment it at every point of the '
+             '--sweep-* grid, writing <output>/<name>.sweep.csv'
+    )
+    
+    parser.add_argument('--sweep-windows', type=int, nargs='+', default=[9, 15, 21], metavar='N',
+                        help='Savitzky-Golay windows to sweep (default: 9 15 21)')
+    parser.add_argument('--sweep-polyorders', type=int, nargs='+', default=[2, 3], metavar='N',
+                        help='Savitzky-Golay polynomial orders to sweep (default: 2 3)')
+    parser.add_argument('--sweep-thresholds', type=float, nargs='+', default=[0.3, 0.4, 0.5, 0.6, 0.7],
+                        metavar='RATIO', help='Threshold ratios to sweep (default: 0.3 0.4 0.5 0.6 0.7)')
+    parser.add_argument('--sweep-min-durations', type=int, nargs='+', default=[3, 5, 7, 10], metavar='FRAMES',
+                        help='Minimum interval durations to sweep (default: 3 5 7 10)')
+    
+    parser.add_argument(
+        '--batch',
+        action='store_true',
+        help='Treat video_path as a directory or glob and analyze every video in it'
+    )
+    
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=1,
+        help='Number of processes to split pose extraction across, or videos analyzed at once with --batch (default: 1)'
+    )
+    
+    parser.add_argument(
+        '--resume',
+        action='store_true',
+        help='Continue an interrupted pose extraction from its last checkpoint'
+    )
+    
+    parser.add_argument(
+        '--adaptive',
+        action='store_true',
+        help='Run pose inference less often while the climber is still and interpolate the skipped frames'
+    )
+    
+    parser.add_argument(
+        '--roi',
+        action='store_true',
+        help='Run pose inference on a crop around the climber instead of the whole frame'
+    )
+    
+    parser.add_argument(
+        '--multi-person',
+        action='store_true',
+        help='Follow every climber in frame as a separate track and analyze each of them'
+    )
+    
+    parser.add_argument(
+        '--render',
+        action='store_true',
+        help='Also write <video>.annotated.mp4 with the skeleton and phases drawn on the original video'
+    )
+    
+    parser.add_argument(
+        '--calibration',
+        type=str,
+        metavar='CLIP_OR_JSON',
+        help="The session's wall clip with the ArUco board (or its saved .calibration.json); "
+             "analyzes movement in wall coordinates"
+    )
+    
+    parser.add_argument(
+        '--model-complexity',
+        type=int,
+        choices=[0, 1, 2],
+        default=1,
+        help='MediaPipe Pose model size, 0 (lite) to 2 (heavy) (default: 1)'
+    )
+    
+    parser.add_argument(
+        '--min-detection-confidence',
+        type=float,
+        default=0.5,
+        help='MediaPipe Pose detection threshold (default: 0.5)'
+    )
+    
+    parser.add_argument(
+        '--min-tracking-confidence',
+        type=float,
+        default=0.5,
+        help='MediaPipe Pose tracking threshold (default: 0.5)'
+    )
+    
+    parser.add_argument(
+        '--smoothing-method',
+        choices=['savgol', 'none'],
+        default='savgol',
+        help='Position smoothing before velocities are computed (default: savgol)'
+    )
+    
+    parser.add_argument(
+        '--smoothing-strength',
+        type=smoothing_strength,
+        default='aggressive',
+        help='Strength of the position smoothing: light, medium, aggressive or an odd Savitzky-Golay window '
+             'length (default: aggressive)'
+    )
+    
+    parser.add_argument(
+        '--threshold-ratio',
+        type=float,
+        default=SEGMENTATION['threshold_ratio'],
+        help=f"A landmark is moving above this fraction of its max speed z-score "
+             f"(default: {SEGMENTATION['threshold_ratio']})"
+    )
+    
+    parser.add_argument(
+        '--min-duration',
+        type=int,
+        default=SEGMENTATION['min_duration'],
+        help=f"Shortest movement interval kept, in frames (default: {SEGMENTATION['min_duration']})"
+    )
+    
+    parser.add_argument(
+        '--cache',
+        choices=['info', 'clear'],
+        help='Inspect or empty the stage result cache and exit'
+    )
+    
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help='Recompute every stage and leave the cache untouched'
+    )
+    
+    parser.add_argument(
+        '--cache-dir',
+        type=str,
+        default=DEFAULT_CACHE_DIR,
+        help=f'Where cached stage results live (default: {DEFAULT_CACHE_DIR})'
+    )
+    
+    parser.add_argument(
+        '--cache-max-mb',
+        type=int,
+        default=DEFAULT_MAX_BYTES // 1024**2,
+        help='Size cap for the cache, least recently used results are evicted past it (default: 5120)'
+    )
+    
+    parser.add_argument(
+        '--profile',
+        type=str,
+        metavar='PATH',
+        help='Record per-stage and per-frame timings, counters and memory high-water marks to PATH'
+    )
+    
+    parser.add_argument(
+        '--profile-format',
+        choices=['json', 'chrome'],
+        default='json',
+        help='json summary, or a Chrome trace for chrome://tracing / Perfetto (default: json)'
+    )
+    
     parser.add_argument(
         '--verbose',
         action='store_true',
@@ -62,15 +247,313 @@ Examples:
     
     return parser
 
+def run_pipeline(video_path, output_dir, workers=1, resume=False, cache=None, pose_settings=None,
+                 smoothing_method='savgol', smoothing_strength='aggressive', verbose=False, adaptive=False,
+                 roi=False, calibration=None, threshold_ratio=None, min_duration=None, render=False,
+                 multi_person=False):
+    """
+    Run extraction, widening and segmentation for one video.
+
+    With a cache each stage is looked up by the video's content hash, its own parameters and the stage it
+    reads from, so only the first stage whose inputs changed (and everything after it) is recomputed.
+
+    calibration is the session's ArUco wall clip (or a saved .calibration.json). With it the landmarks are 
+    reconstructed in the wall frame before velocities and segmentation.
+
+    render adds Step 5, an annotated copy of the video (skeleton and phases) drawn from the stored landmarks;
+    extraction then also keeps the landmarks' image positions.
+
+    multi_person follows every climber in frame as a separate track; the velocities, windows and criteria
+    then cover each track, keyed track<id>/<landmark> (criteria by track<id>).
+
+    Returns a dict with the output paths, the movement windows and the criteria summary.
+    """
+    from pose_extract import ADAPTIVE_SAMPLING, MULTI_PERSON, ROI_TRACKING, extract_landmarks
+    from widen_data import widen_pose, get_data_output_path
+
+    video_path = Path(video_path)
+    output_dir = Path(output_dir)
+    pose_settings = pose_settings or {}
+
+    print("🚀 Starting full climbing analysis pipeline...")
+
+    wall = None
+    calibration_key = None
+    if calibration is not None:
+        print("📐 Step 0: Calibrating the wall...")
+        wall, calibration_key = load_calibration(calibration, output_dir, cache)
+
+    extract_key = widen_key = segment_key = None
+    if cache is not None:
+        video_hash = cache.video_hash(video_path)
+        extract_settings = dict(pose_settings)
+        if adaptive:
+            extract_settings['sampling'] = ADAPTIVE_SAMPLING
+        if roi:
+            extract_settings['roi'] = ROI_TRACKING
+        if wall is not None or render:
+            extract_settings['image_coords'] = True
+        if multi_person:
+            extract_settings['multi_person'] = MULTI_PERSON
+        extract_key = cache.stage_key('extract', video_hash, extract_settings)
+        widen_key = cache.stage_key('widen', extract_key)
+        segment_key = cache.stage_key('segment', extract_key, {
+            'smoothing_method': smoothing_method,
+            'smoothing_strength': smoothing_strength,
+            'threshold_ratio': threshold_ratio,
+            'min_duration': min_duration,
+            'cleaning': CLEANING,
+            'calibration': calibration_key,
+        })
+    
+    # Step 1: Extract poses
+    print("📊 Step 1: Extracting pose landmarks...")
+    pose_store = output_dir / f"{video_path.stem}.pose.bin"
+    if cache is not None and cache.fetch(extract_key, [pose_store]):
+        print(f"♻️  Reusing cached poses: {pose_store}")
+        profiler.count('cache_hits')
+    else:
+        extract_landmarks(str(video_path), str(pose_store), preview=False, workers=workers, resume=resume,
+                          adaptive=adaptive, roi=roi, image_coords=wall is not None or render,
+                          multi_person=multi_person, **pose_settings)
+        if cache is not None:
+            cache.store(extract_key, 'extract', [pose_store])
+        print(f"✅ Poses saved to: {pose_store}")
+    
+    # Step 2: Convert to wide format
+    print("📈 Step 2: Converting to wide format...")
+    wide_csv = output_dir / f"{video_path.stem}.pose.wide.csv"
+    wide_out = Path(get_data_output_path(str(wide_csv)))
+    if cache is not None and cache.fetch(widen_key, [wide_out]):
+        print(f"♻️  Reusing cached wide format: {wide_out}")
+        profiler.count('cache_hits')
+    else:
+        with profiler.stage('widen_pose'):
+            widen_pose(str(pose_store), str(wide_csv))
+        if cache is not None:
+            cache.store(widen_key, 'widen', [wide_out])
+        print(f"✅ Wide format saved to: {wide_csv}")
+    
+    # Step 3: Calculate velocities (placeholder for now)
+    print("🏃 Step 3: Calculating movement velocities...")
+    windows_json = output_dir / f"{video_path.stem}.windows.json"
+    if cache is not None and cache.fetch(segment_key, [windows_json]):
+        with open(windows_json) as f:
+            windows = json.load(f)
+        print(f"♻️  Reusing cached movement windows: {windows}")
+        profiler.count('cache_hits')
+    else:
+        # reads the memory-mapped pose store directly, no csv parse
+        windows = segment_poses(pose_store, windows_json, smoothing_method, smoothing_strength, verbose, wall,
+                                threshold_ratio, min_duration)
+        if cache is not None:
+            cache.store(segment_key, 'segment', [windows_json])
+    print("⚠️  Velocity analysis coming soon!")
+    
+    # Step 4: Label the phases and judge them against the six criteria
+    print("🎯 Step 4: Evaluating the technique criteria...")
+    criteria_json = output_dir / f"{video_path.stem}.criteria.json"
+    criteria = evaluate_criteria(pose_store, windows, criteria_json, wall)
+    
+    outputs = {'pose_store': pose_store, 'wide_csv': wide_out, 'windows_json': windows_json, 'windows': windows,
+               'criteria_json': criteria_json, 'criteria': criteria}
+    
+    # Step 5: Draw the skeleton and phases onto the original video
+    if render:
+        print("🎞️  Step 5: Rendering the annotated video...")
+        from reporting.visualizations import render_video
+        outputs['annotated_video'] = output_dir / f"{video_path.stem}.annotated.mp4"
+        render_video(video_path, pose_store, outputs['annotated_video'], windows=windows, calibration=wall)
+    
+    print("🎉 Analysis complete!")
+    return outputs
+
+def load_calibration(calibration, output_dir, cache=None):
+    """
+    The session's WallCalibration, from a saved .calibration.json or by calibrating on the wall clip.
+    A clip's calibration is cached by its content hash and the board layout, so each session is solved once.
+    One with a reprojection error above MAX_REPROJECTION_ERROR is still used, with a warning.
+
+    Returns (WallCalibration, key identifying it for the downstream cache keys)
+    """
+    from analysis.calibration import WallCalibration
+    from core.constants import ARUCO_BOARD
+
+    calibration = Path(calibration)
+    if calibration.suffix == '.json':
+        wall = WallCalibration.load(calibration)
+        wall.warn_if_inaccurate(calibration)
+        return wall, wall.to_dict()
+
+    calibration_json = Path(output_dir) / f"{calibration.stem}.calibration.json"
+    key = None
+    if cache is not None:
+        key = cache.stage_key('calibrate', cache.video_hash(calibration), ARUCO_BOARD)
+        if cache.fetch(key, [calibration_json]):
+            print(f"♻️  Reusing cached wall calibration: {calibration_json}")
+            profiler.count('cache_hits')
+            wall = WallCalibration.load(calibration_json)
+            wall.warn_if_inaccurate(calibration_json)
+            return wall, key
+
+    from analysis.calibration import calibrate_session
+    with profiler.stage('calibrate_session'):
+        wall = calibrate_session(calibration)
+    wall.save(calibration_json)
+    if cache is not None:
+        cache.store(key, 'calibrate', [calibration_json])
+    print(f"✅ Wall calibration saved to: {calibration_json} (reprojection error {wall.reprojection_error:.2f} px)")
+    return wall, key or wall.to_dict()
+
+def segment_poses(pose_path, windows_json, smoothing_method='savgol', smoothing_strength='aggressive', verbose=False,
+                  calibration=None, threshold_ratio=None, min_duration=None):
+    """
+    Find the movement windows in a pose store or wide csv and save them to windows_json.
+    threshold_ratio and min_duration default to SEGMENTATION.
+    """
+    from analysis.movementphasedetector import MovementPhaseDetector
+
+    movementfinder = MovementPhaseDetector(smoothing_method=smoothing_method, smoothing_strength=smoothing_strength,
+                                           verbose=verbose, calibration=calibration)
+    if threshold_ratio is not None:
+        movementfinder.threshold_ratio = threshold_ratio
+    if min_duration is not None:
+        movementfinder.min_duration = min_duration
+    with profiler.stage('segment_motions'):
+        windows = movementfinder.segment_motions(csv_path=pose_path)
+    with open(windows_json, 'w') as f:
+        json.dump(windows, f)
+    return windows
+
+def evaluate_criteria(pose_path, windows, criteria_json, calibration=None, thresholds=None):
+    """
+    Label every frame's phase from the movement windows, judge each phase against the six criteria and save
+    the per-criterion summary to criteria_json. Cheap enough (milliseconds) that it is never cached.
+    Multi-person windows are judged per climber and saved as {"track<id>": summary}.
+    """
+    from analysis.criteriaevaluator import CriteriaEvaluator, load_session, summarize
+    from analysis.movementphasedetector import MovementPhaseDetector
+    from pose_store import split_tracks
+
+    summaries = {}
+    with profiler.stage('criteria'):
+        for track, track_windows in split_tracks(windows).items():
+            positions, visibility, fps, hip = load_session(pose_path, calibration, track=track)
+            labels = MovementPhaseDetector().label_phases(track_windows, len(positions))
+            evaluator = CriteriaEvaluator(fps=fps, thresholds=thresholds)
+            summaries[track] = summarize(evaluator.evaluate(evaluator.features(positions, visibility, hip), labels))
+    summary = summaries[None] if None in summaries else {f"track{track}": s for track, s in summaries.items()}
+
+    with open(criteria_json, 'w') as f:
+        json.dump(summary, f, indent=2)
+    for track, track_summary in summaries.items():
+        if track is not None:
+            print(f"   🧗 track {track}")
+        for criterion, result in track_summary.items():
+            print(f"   {criterion:<18} {result['passed']}/{result['phases']} {result['phase']} phases passed")
+    return summary
+
+def run_analysis(pose_path, output_dir, smoothing_method='savgol', smoothing_strength='aggressive', verbose=False,
+                 calibration=None, threshold_ratio=None, min_duration=None):
+    """
+    Analyze poses that were already extracted: an existing .pose.bin store or .pose.wide.csv.
+
+    Only numpy, scipy (and pandas for a csv) are imported, never mediapipe or OpenCV, so this is the
+    cheap entry point for re-running the analysis with new settings. A saved .calibration.json keeps it 
+    that way; a wall clip has to be calibrated first, which needs OpenCV.
+
+    Returns a dict with the windows and criteria json paths, the movement windows and the criteria summary.
+    """
+    pose_path = Path(pose_path)
+    output_dir = Path(output_dir)
+    stem = pose_path.name.split('.')[0]
+
+    wall = load_calibration(calibration, output_dir)[0] if calibration is not None else None
+
+    print(f"🏃 Analyzing existing poses: {pose_path}")
+    windows_json = output_dir / f"{stem}.windows.json"
+    windows = segment_poses(pose_path, windows_json, smoothing_method, smoothing_strength, verbose, wall,
+                            threshold_ratio, min_duration)
+    criteria_json = output_dir / f"{stem}.criteria.json"
+    criteria = evaluate_criteria(pose_path, windows, criteria_json, wall)
+    print(f"🎉 Analysis complete! Movement windows saved to: {windows_json}, criteria to: {criteria_json}")
+    return {'windows_json': windows_json, 'windows': windows, 'criteria_json': criteria_json, 'criteria': criteria}
+
+def show_cache(cache, action):
+    """Handle --cache info / --cache clear"""
+    if action == 'clear':
+        entries, total = cache.info()
+        cache.clear()
+        print(f"🧹 Cleared {len(entries)} cached results ({total / 1024**2:.1f} MB) from {cache.root}")
+        return
+
+    entries, total = cache.info()
+    print(f"📦 Cache {cache.root}: {len(entries)} results, {total / 1024**2:.1f} MB "
+          f"of {cache.max_bytes / 1024**2:.0f} MB")
+    for key, entry in entries:
+        print(f"  {key[:12]}  {entry['stage']:<8} {entry['bytes'] / 1024**2:8.2f} MB  {', '.join(entry['files'])}")
+
+def export_profile(args):
+    """Write the --profile output, worker processes' profiles included"""
+    if args.profile:
+        profiler.export(args.profile, args.profile_format)
+        print(f"⏱️  Profile written to: {args.profile}")
+
 def main():
     """Main application entry point"""
     parser = create_parser()
     args = parser.parse_args()
+
+    cache = None
+    if args.cache or not args.no_cache:
+        cache = PipelineCache(args.cache_dir, max_bytes=args.cache_max_mb * 1024**2)
+
+    if args.cache:
+        show_cache(cache, args.cache)
+        return
+
+    if args.video_path is None:
+        parser.error('video_path is required unless --cache is given')
+
+    if args.profile:
+        profiler.enable()
+
+    pose_settings = {
+        'model_complexity': args.model_complexity,
+        'min_detection_confidence': args.min_detection_confidence,
+        'min_tracking_confidence': args.min_tracking_confidence,
+    }
+
+    if args.batch:
+        from core.batch import collect_videos, run_batch
+        videos = collect_videos(args.video_path)
+        if not videos:
+            print(f"Error: no videos found in '{args.video_path}'!")
+            sys.exit(1)
+        try:
+            manifest = run_batch(
+                videos, args.output, workers=args.workers,
+                cache_dir=None if args.no_cache else args.cache_dir,
+                cache_max_bytes=args.cache_max_mb * 1024**2,
+                pose_settings=pose_settings,
+                smoothing_method=args.smoothing_method,
+                smoothing_strength=args.smoothing_strength,
+                threshold_ratio=args.threshold_ratio,
+                min_duration=args.min_duration,
+                adaptive=args.adaptive,
+                roi=args.roi,
+                calibration=args.calibration,
+                render=args.render,
+                multi_person=args.multi_person,
+            )
+        finally:
+            export_profile(args)
+        sys.exit(1 if manifest['failed'] else 0)
     
     # Validate video file exists
     video_path = Path(args.video_path)
     if not video_path.exists():
-        print(f"Error: Video file '{video_path}' not found!")
+        print(f"Error: {'Pose file' if args.analyze_only or args.sweep else 'Video file'} '{video_path}' not found!")
         sys.exit(1)
     
     # Create output directory if it doesn't exist
@@ -86,36 +569,50 @@ def main():
         if args.preview:
             print("🎬 Running pose detection preview...")
             # Run pose extraction with preview (needs dummy output path)
-            temp_csv = output_dir / f"temp_{video_path.stem}.pose.csv"
-            extract_landmarks(str(video_path), str(temp_csv), preview=True)
+            from pose_extract import extract_landmarks
+            temp_store = output_dir / f"temp_{video_path.stem}.pose.bin"
+            extract_landmarks(str(video_path), str(temp_store), preview=True, roi=args.roi)
             print("Preview complete! Check the video window.")
             
-        else:
-            print("🚀 Starting full climbing analysis pipeline...")
-            
-            # Step 1: Extract poses
-            print("📊 Step 1: Extracting pose landmarks...")
-            pose_csv = output_dir / f"{video_path.stem}.pose.csv"
-            extract_landmarks(str(video_path), str(pose_csv), preview=False)
-            print(f"✅ Poses saved to: {pose_csv}")
-            
-            # Step 2: Convert to wide format
-            print("📈 Step 2: Converting to wide format...")
-            wide_csv = output_dir / f"{video_path.stem}.pose.wide.csv"
-            widen_pose(str(pose_csv), str(wide_csv))
-            print(f"✅ Wide format saved to: {wide_csv}")
+        elif args.sweep:
+            from core.sweep import run_sweep
+            wall = load_calibration(args.calibration, output_dir)[0] if args.calibration else None
+            run_sweep(
+                video_path, output_dir / f"{video_path.name.split('.')[0]}.sweep.csv",
+                windows=args.sweep_windows,
+                polyorders=args.sweep_polyorders,
+                threshold_ratios=args.sweep_thresholds,
+                min_durations=args.sweep_min_durations,
+                workers=args.workers,
+                calibration=wall,
+            )
             
-            # Step 3: Calculate velocities (placeholder for now)
-            print("🏃 Step 3: Calculating movement velocities...")
-            movementfinder = MovementPhaseDetector()
-            movementfinder.segment_motions(csv_path=wide_csv)
-            print("⚠️  Velocity analysis coming soon!")
+        elif args.analyze_only:
+            run_analysis(
+                video_path, output_dir,
+                smoothing_method=args.smoothing_method,
+                smoothing_strength=args.smoothing_strength,
+                verbose=args.verbose,
+                calibration=args.calibration,
+                threshold_ratio=args.threshold_ratio,
+                min_duration=args.min_duration,
+            )
             
-            # Step 4: Detect movement phases (placeholder for now)
-            print("🎯 Step 4: Detecting movement phases...")
-            print("⚠️  Phase detection coming soon!")
-            
-            print("🎉 Analysis complete!")
+        else:
+            run_pipeline(
+                video_path, output_dir, workers=args.workers, resume=args.resume, cache=cache,
+                pose_settings=pose_settings,
+                smoothing_method=args.smoothing_method,
+                smoothing_strength=args.smoothing_strength,
+                threshold_ratio=args.threshold_ratio,
+                min_duration=args.min_duration,
+                verbose=args.verbose,
+                adaptive=args.adaptive,
+                roi=args.roi,
+                calibration=args.calibration,
+                render=args.render,
+                multi_person=args.multi_person,
+            )
             
     except KeyboardInterrupt:
         print("\n❌ Analysis interrupted by user")
@@ -126,4 +623,6 @@ def main():
             import traceback
             traceback.print_exc()
         sys.exit(1)
+    finally:
+        export_profile(args)
 
@@ -0,0 +1,177 @@
+"""
+Lightweight instrumentation for the pipeline stages
+
+Everything goes through the module-level `profiler`, which is disabled by default: stage() and timing()
+then cost a flag check and nothing is stored. The engine's --profile flag enables it and exports the
+result as a JSON summary or a Chrome trace (load it in chrome://tracing or https://ui.perfetto.dev).
+
+Worker processes have a profiler of their own: the code that spawns them enables it in the worker when the
+parent's is enabled, has the worker send back its summary() and folds that in with merge().
+"""
+
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+class Profiler:
+    '''
+    Collects four kinds of data:
+      - stages: named spans (nested is fine) with wall time and the process RSS high-water mark at exit
+      - timings: per-frame durations of a named step (decode, inference, ...), aggregated, with the raw
+        samples kept for the trace up to max_samples
+      - counters: plain integer counts (frames with no detection, suspicious speeds, ...)
+      - gauges: sampled levels (queue depths, ...), aggregated to count / min / max / mean
+    '''
+    def __init__(self, max_samples=200_000):
+        self.enabled = False
+        self.max_samples = max_samples
+        self.reset()
+
+    def reset(self):
+        self._origin = time.perf_counter()
+        self.stages = []
+        self.timings = {}
+        self.samples = []
+        self.counters = {}
+        self.gauges = {}
+
+    def enable(self):
+        self.reset()
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    @contextmanager
+    def stage(self, name, **meta):
+        """Time a block of work as one named stage"""
+        if not self.enabled:
+            yield
+            return
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            self.stages.append({
+                'name': name,
+                'start': start - self._origin,
+                'seconds': end - start,
+                'rss_high_water_mb': _rss_high_water_mb(),
+                **meta,
+            })
+
+    def timing(self, name, start, end):
+        """Record one per-frame step that ran from perf_counter() start to end"""
+        if not self.enabled:
+            return
+
+        seconds = end - start
+        stats = self.timings.get(name)
+        if stats is None:
+            stats = self.timings[name] = {'count': 0, 'total': 0.0, 'min': seconds, 'max': seconds}
+        stats['count'] += 1
+        stats['total'] += seconds
+        stats['min'] = min(stats['min'], seconds)
+        stats['max'] = max(stats['max'], seconds)
+
+        if len(self.samples) < self.max_samples:
+            self.samples.append((name, start - self._origin, seconds))
+
+    def count(self, name, n=1):
+        if not self.enabled:
+            return
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def gauge(self, name, value):
+        """Record one sample of a level that goes up and down, e.g. how many frames are queued"""
+        if not self.enabled:
+            return
+        stats = self.gauges.get(name)
+        if stats is None:
+            stats = self.gauges[name] = {'count': 0, 'total': 0.0, 'min': value, 'max': value}
+        stats['count'] += 1
+        stats['total'] += value
+        stats['min'] = min(stats['min'], value)
+        stats['max'] = max(stats['max'], value)
+
+    def merge(self, summary, pid=None):
+        """
+        Fold a worker process's summary() into this profiler: its stages are added (tagged with the worker's
+        pid, their start times are relative to the worker's own start), timings and gauges are combined and
+        counters added up. Per-frame samples stay in the worker, so they are missing from the Chrome trace.
+        """
+        if not self.enabled or not summary:
+            return
+        self.stages.extend({**stage, 'pid': pid} for stage in summary['stages'])
+        for mine, theirs in ((self.timings, summary['timings']), (self.gauges, summary['gauges'])):
+            for name, stats in theirs.items():
+                own = mine.get(name)
+                if own is None:
+                    mine[name] = {key: stats[key] for key in ('count', 'total', 'min', 'max')}
+                    continue
+                own['count'] += stats['count']
+                own['total'] += stats['total']
+                own['min'] = min(own['min'], stats['min'])
+                own['max'] = max(own['max'], stats['max'])
+        for name, n in summary['counters'].items():
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def summary(self):
+        return {
+            'stages': self.stages,
+            'timings': {
+                name: {**stats, 'mean': stats['total'] / stats['count']}
+                for name, stats in self.timings.items()
+            },
+            'counters': self.counters,
+            'gauges': {
+                name: {**stats, 'mean': stats['total'] / stats['count']}
+                for name, stats in self.gauges.items()
+            },
+            'rss_high_water_mb': _rss_high_water_mb(),
+        }
+
+    def chrome_trace(self):
+        """Trace Event Format: stages on one row, per-frame steps on another, counters and gauges as metadata"""
+        pid = os.getpid()
+        events = [
+            {'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': name}}
+            for tid, name in ((1, 'stages'), (2, 'frames'))
+        ]
+        events += [
+            {'name': s['name'], 'ph': 'X', 'pid': s.get('pid') or pid, 'tid': 1, 'ts': s['start'] * 1e6,
+             'dur': s['seconds'] * 1e6, 'args': {'rss_high_water_mb': s['rss_high_water_mb']}}
+            for s in self.stages
+        ]
+        events += [
+            {'name': name, 'ph': 'X', 'pid': pid, 'tid': 2, 'ts': start * 1e6, 'dur': seconds * 1e6}
+            for name, start, seconds in self.samples
+        ]
+        return {'traceEvents': events, 'displayTimeUnit': 'ms',
+                'otherData': {'counters': self.counters, 'gauges': self.gauges}}
+
+    def export(self, path, fmt='json'):
+        data = self.chrome_trace() if fmt == 'chrome' else self.summary()
+        with open(path, 'w') as f:
+            json.dump(data, f, indent=None if fmt == 'chrome' else 2)
+
+
+def _rss_high_water_mb():
+    if resource is None:
+        return None
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    scale = 1024**2 if sys.platform == 'darwin' else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+
+profiler = Profiler()
@@ -0,0 +1,160 @@
+"""
+Sweep mode: segment one session over a grid of smoothing and interval-detection settings
+
+Kinematics only depend on the smoothing (window, polyorder), so each smoothing setting is computed once and
+every threshold_ratio / min_duration pair runs on its speeds. Smoothing settings are spread over a process
+pool; the pose data is read once and handed to the workers.
+"""
+
+import csv
+import itertools
+import multiprocessing
+import os
+
+import numpy as np
+
+from core.profiling import profiler
+
+SWEEP_COLUMNS = ['window', 'polyorder', 'threshold_ratio', 'min_duration', 'intervals', 'mean_duration_s',
+                 'moving_fraction', 'stability_iou', 'count_delta']
+
+
+def run_sweep(pose_path, output_csv, windows=(9, 15, 21), polyorders=(2,), threshold_ratios=(0.3, 0.5, 0.7),
+              min_durations=(5, 7, 10), workers=1, calibration=None):
+    """
+    Segment a pose store or wide csv at every point of the grid and write a table of the results.
+
+    Per grid point: the number of movement intervals, their mean duration, the fraction of (frame, landmark)
+    cells that are moving, and two stability measures against the neighbouring grid points (one step along
+    any one axis). stability_iou is the mean overlap (intersection over union) of the moving cells with the
+    neighbours' and count_delta the largest change in the interval count. Settings where a small change
+    gives much the same intervals have stability_iou near 1 and a small count_delta.
+
+    Args:
+        pose_path (str): .pose.bin store or .pose.wide.csv
+        output_csv (str): where the table goes
+        windows (tuple, optional): Savitzky-Golay windows (odd). Defaults to (9, 15, 21).
+        polyorders (tuple, optional): Savitzky-Golay polynomial orders. Defaults to (2,).
+        threshold_ratios (tuple, optional): fractions of the max z-score. Defaults to (0.3, 0.5, 0.7).
+        min_durations (tuple, optional): shortest interval kept, in frames. Defaults to (5, 7, 10).
+        workers (int, optional): processes for the smoothing settings, 1 runs in this one. Defaults to 1.
+        calibration (WallCalibration, optional): segment in the wall frame. Defaults to None.
+
+    Returns:
+        list of dicts, one row per grid point in grid order
+    """
+    from analysis.velocitycalculator import VelocityCalculator
+
+    with profiler.stage('sweep.load'):
+        pose_data, fps = VelocityCalculator(calibration=calibration).load_positions(pose_path)
+    n_frames = len(next(iter(pose_data.values()))['x'])
+
+    smoothings = [(window, polyorder) for window, polyorder in itertools.product(windows, polyorders)]
+    usable = [(w, p) for w, p in smoothings if w % 2 == 1 and w >= 3 and p < w <= n_frames]
+    for window, polyorder in sorted(set(smoothings) - set(usable)):
+        print(f"⚠️  Skipping window={window}, polyorder={polyorder}: needs an odd window of at least 3, above the "
+              f"polyorder and at most {n_frames} frames")
+
+    jobs = [(pose_data, fps, window, polyorder, threshold_ratios, min_durations) for window, polyorder in usable]
+    print(f"🔬 Sweep: {len(usable)} smoothing settings x {len(threshold_ratios) * len(min_durations)} "
+          f"interval settings over {n_frames} frames, {workers} workers")
+
+    with profiler.stage('sweep.segment'):
+        if workers > 1 and len(jobs) > 1:
+            ctx = multiprocessing.get_context('spawn')
+            with ctx.Pool(processes=min(workers, len(jobs))) as pool:
+                segmented = []
+                for points, profile, pid in pool.map(_sweep_worker, [job + (profiler.enabled,) for job in jobs]):
+                    profiler.merge(profile, pid)
+                    segmented.append(points)
+        else:
+            segmented = [_sweep_smoothing(job) for job in jobs]
+
+    with profiler.stage('sweep.metrics'):
+        rows = _grid_metrics([point for points in segmented for point in points], n_frames, fps,
+                             [windows, polyorders, threshold_ratios, min_durations])
+
+    with open(output_csv, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=SWEEP_COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+
+    print_table(rows)
+    print(f"✅ Sweep table saved to: {output_csv}")
+    return rows
+
+
+def _sweep_worker(job):
+    """Pool entry point: _sweep_smoothing() with the worker's profile summary (None unless profiling) and pid"""
+    *job, profile = job
+    if profile:
+        profiler.enable()
+    with profiler.stage('sweep.smoothing', window=job[2], polyorder=job[3]):
+        points = _sweep_smoothing(tuple(job))
+    return points, profiler.summary() if profile else None, os.getpid()
+
+
+def _sweep_smoothing(job):
+    """One smoothing setting: kinematics once, then every interval setting on the same z-scores"""
+    pose_data, fps, window, polyorder, threshold_ratios, min_durations = job
+    from analysis.movementphasedetector import MovementPhaseDetector
+    from analysis.velocitycalculator import VelocityCalculator
+
+    velocity = VelocityCalculator(smoothing_strength=window, polyorder=polyorder).calculate_velocities(pose_data, fps)
+    detector = MovementPhaseDetector()
+    z_scores = detector.z_scores(np.column_stack([data['speed_3d'] for data in velocity.values()]))
+
+    points = []
+    for threshold_ratio, min_duration in itertools.product(threshold_ratios, min_durations):
+        columns, starts, ends = detector.find_intervals(z_scores, threshold_ratio, min_duration)
+        points.append(((window, polyorder, threshold_ratio, min_duration), (columns, starts, ends), z_scores.shape[1]))
+    return points
+
+
+def _moving_mask(intervals, n_frames, n_landmarks):
+    """(frames, landmarks) bool array, True inside an interval"""
+    columns, starts, ends = intervals
+    marks = np.zeros((n_frames + 1, n_landmarks), dtype=np.int32)
+    np.add.at(marks, (starts, columns), 1)
+    np.add.at(marks, (ends, columns), -1)
+    return np.cumsum(marks[:-1], axis=0) > 0
+
+
+def _grid_metrics(points, n_frames, fps, axes):
+    """Table rows for every segmented grid point, with the stability measures against its neighbours"""
+    masks, counts, durations, by_index = {}, {}, {}, {}
+    for settings, (columns, starts, ends), n_landmarks in points:
+        masks[settings] = _moving_mask((columns, starts, ends), n_frames, n_landmarks)
+        counts[settings] = len(starts)
+        durations[settings] = float((ends - starts).mean() / fps) if len(starts) else 0.0
+        by_index[tuple(list(axis).index(value) for axis, value in zip(axes, settings))] = settings
+
+    rows = []
+    for index, settings in sorted(by_index.items()):
+        neighbours = [
+            by_index[neighbour] for axis in range(len(index)) for step in (-1, 1)
+            if (neighbour := index[:axis] + (index[axis] + step,) + index[axis + 1:]) in by_index
+        ]
+        mask = masks[settings]
+        rows.append(dict(zip(SWEEP_COLUMNS, (*settings,
+            counts[settings],
+            round(durations[settings], 3),
+            round(float(mask.mean()), 4),
+            round(float(np.mean([_iou(mask, masks[n]) for n in neighbours])), 4) if neighbours else 1.0,
+            max((abs(counts[settings] - counts[n]) for n in neighbours), default=0),
+        ))))
+    return rows
+
+
+def _iou(a, b):
+    union = np.count_nonzero(a | b)
+    return np.count_nonzero(a & b) / union if union else 1.0
+
+
+def print_table(rows):
+    print(f"{'window':>6} {'poly':>4} {'ratio':>5} {'min':>4} {'intervals':>9} {'mean s':>6} {'moving':>6} "
+          f"{'iou':>6} {'Δcount':>6}")
+    for row in rows:
+        print(f"{row['window']:>6} {row['polyorder']:>4} {row['threshold_ratio']:>5} {row['min_duration']:>4} "
+              f"{row['intervals']:>9} {row['mean_duration_s']:>6.2f} {row['moving_fraction']:>6.3f} "
+              f"{row['stability_iou']:>6.3f} {row['count_delta']:>6}")
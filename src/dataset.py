@@ -0,0 +1,394 @@
+"""
+Session dataset: the pipeline outputs of many climbs in one indexed store, queried without loading every file
+
+A dataset directory holds:
+    index.json                  one entry per session: its source file (size, mtime), fps, frames and settings
+    phases.csv                  one row per phase of every session, with its summary features
+    sessions/<session>.kin.bin  the session's partition: its cleaned, smoothed key landmark kinematics as a
+                                pose store with channels x, y, z, speed
+
+A query filters phases.csv first and only then memory-maps the partitions of the matching sessions, so the
+only frames read are those of the matching phases.
+
+A multi-person pose file (see pose_store) becomes one session per climber, <session>_track<id>, each with its
+own phases and plain landmark names, so the same queries work on them.
+
+Sessions are named after their pose file. A file named like a session from another directory gets that
+directory's name appended instead of replacing it.
+
+    python src/dataset.py ingest data/ --root dataset/
+    python src/dataset.py query dataset/ "phase == 'Reaching' and left_wrist_speed_max > 1.5"
+"""
+
+import glob
+import itertools
+import json
+import sys
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from core.constants import CLEANING, PHASES, SEGMENTATION
+from core.profiling import profiler
+from pose_store import is_pose_store, read_pose_store, split_tracks, store_tracks, write_pose_store
+
+KINEMATIC_CHANNELS = ['x', 'y', 'z', 'speed']
+POSE_SUFFIXES = ['.pose.bin', '.pose.wide.csv']
+PHASE_COLUMNS = ['session', 'phase', 'start', 'end', 'frame_start', 'frame_end', 't_start', 'duration']
+
+
+class SessionDataset:
+    '''
+    An indexed store of climbing sessions.
+
+    Every phase of every session (a run of frames with one label from MovementPhaseDetector.label_phases) is a
+    row of `phases`: the session, the phase, where it is in the session's partition (start, end exclusive),
+    its real frame numbers, start time and duration in seconds, and the max and mean speed of every key
+    landmark over it (<landmark>_speed_max, <landmark>_speed_mean, m/s). query() filters these rows and
+    load() reads just their frames.
+    '''
+    def __init__(self, root):
+        self.root = Path(root)
+        self.index_path = self.root / 'index.json'
+        self.phases_path = self.root / 'phases.csv'
+        self.index = {'sessions': {}}
+        if self.index_path.exists():
+            with open(self.index_path) as f:
+                self.index = json.load(f)
+        self._phases = None
+        self._partitions = {}
+
+    @property
+    def sessions(self):
+        return sorted(self.index['sessions'])
+
+    @property
+    def phases(self):
+        """Summary rows of every phase of every session, a DataFrame read once"""
+        if self._phases is None:
+            if self.phases_path.exists():
+                self._phases = pd.read_csv(self.phases_path)
+            else:
+                self._phases = pd.DataFrame(columns=PHASE_COLUMNS)
+        return self._phases
+
+    def partition_path(self, session):
+        return self.root / 'sessions' / f'{session}.kin.bin'
+
+    def clips(self, session):
+        """The clips (see clip_of) the sessions under this name were ingested from, its tracks' included"""
+        return {clip_of(entry['source']['path']) for name, entry in self.index['sessions'].items()
+                if name == session or name == f"{session}_track{entry.get('track')}"}
+
+    def session_for(self, pose_path):
+        """
+        The name a pose file is ingested under: its file name without the suffix, unless a file of that name
+        from another directory is already in the dataset. Then the directory's name is appended, and a
+        number after that if it is taken too.
+        """
+        clip = clip_of(pose_path)
+        base = session_name(pose_path)
+        names = itertools.chain([base, f'{base}_{Path(clip).parent.name}'], (f'{base}_{i}' for i in itertools.count(2)))
+        for name in names:
+            owners = self.clips(name)
+            if owners <= {clip}:
+                if name != base and not owners:
+                    print(f"⚠️  {base} is already another clip's session, adding {pose_path} as {name}")
+                return name
+
+    def ingest(self, pose_path, session=None, calibration=None, smoothing_strength='aggressive', force=False,
+               save=True):
+        """
+        Add a session from a .pose.bin store or .pose.wide.csv, or refresh it if it is already in the dataset.
+
+        A session whose source file (size and mtime) and settings haven't changed since it was ingested is
+        skipped unless force=True. Every climber of a multi-person file is added as its own session,
+        <session>_track<id>, all from one kinematics pass.
+
+        Args:
+            pose_path (str): pipeline output to ingest
+            session (str, optional): name in the dataset. Defaults to session_for(pose_path): the file name
+                without .pose.bin/.pose.wide.csv, made unique if another clip has it.
+            calibration (WallCalibration, optional): analyze in the wall frame. Defaults to None.
+            smoothing_strength (str, optional): see VelocityCalculator. Defaults to 'aggressive'.
+            force (bool, optional): ingest even if unchanged. Defaults to False.
+            save (bool, optional): write index.json and phases.csv afterwards; ingest_dir saves once at the end
+                instead. Defaults to True.
+
+        Returns:
+            int: phase rows added (over all tracks), or None if the session was up to date
+
+        Raises:
+            ValueError: if `session` is given and already holds a different clip
+        """
+        from analysis.movementphasedetector import MovementPhaseDetector
+        from analysis.velocitycalculator import VelocityCalculator
+
+        pose_path = Path(pose_path)
+        if session is None:
+            session = self.session_for(pose_path)
+        elif not self.clips(session) <= {clip_of(pose_path)}:
+            raise ValueError(f"Session {session} already holds {', '.join(sorted(self.clips(session)))}: "
+                             f"remove() it or ingest {pose_path} under another name")
+        stat = pose_path.stat()
+        source = {'path': str(pose_path.resolve()), 'size': stat.st_size, 'mtime': stat.st_mtime}
+        settings = {
+            'smoothing_strength': smoothing_strength,
+            'segmentation': SEGMENTATION,
+            'cleaning': CLEANING,
+            'calibration': calibration.to_dict() if calibration is not None else None,
+        }
+        tracks = pose_tracks(pose_path)
+        names = {track: session if track is None else f'{session}_track{track}' for track in tracks}
+        entries = [self.index['sessions'].get(name) for name in names.values()]
+        if not force and all(entry and entry['source'] == source and entry['settings'] == settings
+                             for entry in entries):
+            return None
+
+        with profiler.stage('dataset.kinematics'):
+            calc = VelocityCalculator(smoothing_strength=smoothing_strength, calibration=calibration)
+            pose_data, fps = calc.load_positions(str(pose_path))
+            velocity = calc.calculate_velocities(pose_data, fps)
+            detector = MovementPhaseDetector(smoothing_strength=smoothing_strength, calibration=calibration)
+            windows = detector.segment_velocities(velocity)
+
+        frames = calc.frames
+        width = height = 0
+        if is_pose_store(pose_path):
+            _, header = read_pose_store(pose_path)
+            width, height = header['width'], header['height']
+
+        added = 0
+        track_velocity = split_tracks(velocity)
+        for track, labels in detector.label_track_phases(windows, len(frames)).items():
+            name = names[track]
+            landmarks = list(track_velocity[track])
+            block = np.stack([
+                np.column_stack([track_velocity[track][landmark][c] for c in ('x', 'y', 'z', 'speed_3d')])
+                for landmark in landmarks
+            ], axis=1)
+
+            partition = self.partition_path(name)
+            partition.parent.mkdir(parents=True, exist_ok=True)
+            self._partitions.pop(name, None)
+            write_pose_store(partition, block, fps, width, height, channels=KINEMATIC_CHANNELS,
+                             names=[landmark.upper() for landmark in landmarks], session=name,
+                             first_frame=int(frames[0]) if len(frames) else 0)
+
+            with profiler.stage('dataset.summaries'):
+                rows = phase_summaries(name, labels, frames, fps, landmarks,
+                                       block[..., KINEMATIC_CHANNELS.index('speed')])
+            self._phases = pd.concat([self.phases[self.phases['session'] != name], rows], ignore_index=True)
+            self.index['sessions'][name] = {
+                'source': source,
+                'settings': settings,
+                'fps': fps,
+                'frames': len(frames),
+                'first_frame': int(frames[0]) if len(frames) else 0,
+                'landmarks': landmarks,
+                'cleaning': calc.cleaning,
+                'track': track,
+            }
+            added += len(rows)
+        if save:
+            self.save()
+        return added
+
+    def ingest_dir(self, pattern, **kwargs):
+        """
+        Ingest every pipeline output in a directory (or matching a glob): .pose.bin stores, and the
+        .pose.wide.csv of sessions without one. Preview leftovers (temp_*) are skipped.
+
+        Returns:
+            dict: session -> phase rows added, or None for sessions that were up to date
+        """
+        path = Path(pattern)
+        candidates = path.iterdir() if path.is_dir() else (Path(p) for p in glob.glob(pattern, recursive=True))
+
+        sources = {}
+        for candidate in sorted(candidates):
+            name = candidate.name
+            if name.startswith('temp_') or not any(name.endswith(suffix) for suffix in POSE_SUFFIXES):
+                continue
+            clip = clip_of(candidate)
+            if clip not in sources or is_pose_store(candidate):
+                sources[clip] = candidate
+
+        added = {}
+        for source in sources.values():
+            session = self.session_for(source)
+            added[session] = self.ingest(source, session=session, save=False, **kwargs)
+        self.save()
+        return added
+
+    def save(self):
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.phases.to_csv(self.phases_path, index=False)
+        with open(self.index_path, 'w') as f:
+            json.dump(self.index, f, indent=2)
+
+    def remove(self, session):
+        self.index['sessions'].pop(session, None)
+        self._partitions.pop(session, None)
+        self._phases = self.phases[self.phases['session'] != session].reset_index(drop=True)
+        self.partition_path(session).unlink(missing_ok=True)
+        self.save()
+
+    def query(self, expr=None, phase=None, sessions=None):
+        """
+        Phases matching a pandas query expression over the summary columns, e.g.
+        "phase == 'Reaching' and left_wrist_speed_max > 1.5". phase and sessions are shortcuts for the
+        common filters. Nothing but the summary table is read.
+
+        Returns:
+            pd.DataFrame: the matching rows of `phases`
+        """
+        rows = self.phases
+        if phase is not None:
+            rows = rows[rows['phase'] == phase]
+        if sessions is not None:
+            rows = rows[rows['session'].isin(sessions)]
+        if expr:
+            rows = rows.query(expr)
+        return rows
+
+    def load(self, rows, landmarks=None, channels=None):
+        """
+        The kinematics of the frames of every row (e.g. from query()), read out of the memory-mapped partitions.
+
+        Args:
+            rows (pd.DataFrame): phase rows
+            landmarks (list, optional): key landmark names (lowercase) to keep. Defaults to all.
+            channels (list, optional): of KINEMATIC_CHANNELS to keep. Defaults to all.
+
+        Returns:
+            list of (row as a dict, (frames, landmarks, channels) float32 array) pairs
+        """
+        loaded = []
+        with profiler.stage('dataset.load'):
+            for row in rows.to_dict('records'):
+                block, header = self._partition(row['session'])
+                landmark_idx = slice(None) if landmarks is None else [header['landmarks'].index(l.upper()) for l in landmarks]
+                channel_idx = slice(None) if channels is None else [header['channels'].index(c) for c in channels]
+                loaded.append((row, np.array(block[row['start']:row['end']][:, landmark_idx][..., channel_idx])))
+        return loaded
+
+    def _partition(self, session):
+        if session not in self._partitions:
+            self._partitions[session] = read_pose_store(self.partition_path(session))
+        return self._partitions[session]
+
+
+def session_name(pose_path):
+    """A pose file's name without its .pose.bin / .pose.wide.csv suffix (clip names can have dots of their own)"""
+    name = Path(pose_path).name
+    for suffix in POSE_SUFFIXES:
+        if name.endswith(suffix):
+            return name[:-len(suffix)]
+    return name.split('.')[0]
+
+
+def clip_of(pose_path):
+    """The clip a pose file belongs to, its directory and session name, the same for its .pose.bin and .pose.wide.csv"""
+    pose_path = Path(pose_path).resolve()
+    return str(pose_path.parent / session_name(pose_path))
+
+
+def pose_tracks(pose_path):
+    """Track ids of a multi-person pose file, [None] for a single-person one. Reads the header / track column only."""
+    if is_pose_store(pose_path):
+        _, header = read_pose_store(pose_path)
+        tracks = store_tracks(header)
+    else:
+        columns = pd.read_csv(pose_path, nrows=0).columns
+        tracks = pd.read_csv(pose_path, usecols=['track'])['track'].unique().tolist() if 'track' in columns else []
+    return [int(track) for track in tracks] or [None]
+
+
+def phase_summaries(session, labels, frames, fps, landmarks, speeds):
+    """
+    One summary row per run of equal phase labels, every landmark reduced with reduceat at once.
+
+    Args:
+        session (str): session name for the rows
+        labels (np.ndarray): (frames,) phase index per frame
+        frames (np.ndarray): (frames,) real frame numbers
+        fps (float): frame rate
+        landmarks (list): names of the speed columns
+        speeds (np.ndarray): (frames, landmarks) speeds in m/s, NaN in unfilled gaps
+
+    Returns:
+        pd.DataFrame with PHASE_COLUMNS and <landmark>_speed_max / <landmark>_speed_mean
+    """
+    from analysis.criteriaevaluator import segment_mean
+
+    columns = PHASE_COLUMNS + [f'{l}_speed_{stat}' for l in landmarks for stat in ('max', 'mean')]
+    if len(labels) == 0:
+        return pd.DataFrame(columns=columns)
+
+    starts = np.flatnonzero(np.diff(labels, prepend=labels[0] - 1))
+    ends = np.append(starts[1:], len(labels))
+    speeds = np.asarray(speeds, dtype=np.float64)
+    #fmax skips the NaN frames, and gives NaN only for a phase that is all gap
+    speed_max = np.fmax.reduceat(speeds, starts, axis=0)
+    speed_mean = segment_mean(speeds, starts)
+
+    rows = pd.DataFrame({
+        'session': session,
+        'phase': np.array(PHASES)[labels[starts]],
+        'start': starts,
+        'end': ends,
+        'frame_start': frames[starts],
+        'frame_end': frames[ends - 1] + 1,
+        't_start': frames[starts] / fps,
+        'duration': (ends - starts) / fps,
+    })
+    for i, landmark in enumerate(landmarks):
+        rows[f'{landmark}_speed_max'] = speed_max[:, i]
+        rows[f'{landmark}_speed_mean'] = speed_mean[:, i]
+    return rows[columns]
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Build and query a ClimbLab session dataset')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    ingest = commands.add_parser('ingest', help='Add pipeline outputs (.pose.bin / .pose.wide.csv) to a dataset')
+    ingest.add_argument('inputs', nargs='+', help='Pose files, directories or globs')
+    ingest.add_argument('--root', default='dataset', help='Dataset directory (default: dataset)')
+    ingest.add_argument('--smoothing-strength', default='aggressive', help='See main.py (default: aggressive)')
+    ingest.add_argument('--force', action='store_true', help='Re-ingest sessions that have not changed')
+
+    query = commands.add_parser('query', help='List the phases matching a query')
+    query.add_argument('root', help='Dataset directory')
+    query.add_argument('expr', nargs='?', help="pandas query, e.g. \"phase == 'Reaching' and left_wrist_speed_max > 1.5\"")
+
+    args = parser.parse_args()
+    if args.command == 'ingest':
+        dataset = SessionDataset(args.root)
+        added = {}
+        for source in args.inputs:
+            if Path(source).is_file():
+                session = dataset.session_for(source)
+                added[session] = dataset.ingest(source, session=session, smoothing_strength=args.smoothing_strength,
+                                                force=args.force)
+            else:
+                added.update(dataset.ingest_dir(source, smoothing_strength=args.smoothing_strength, force=args.force))
+        for session, rows in added.items():
+            print(f"  {session:<40} {'up to date' if rows is None else f'{rows} phases'}")
+        print(f"✅ {len(dataset.sessions)} sessions, {len(dataset.phases)} phases in {args.root}")
+    else:
+        rows = SessionDataset(args.root).query(args.expr)
+        with pd.option_context('display.max_rows', None, 'display.max_columns', None, 'display.width', 200):
+            print(rows[PHASE_COLUMNS])
+        print(f"{len(rows)} phases")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+import argparse
+import json
+import time
+import numpy as np
+import mediapipe as mp
+import cv2
+
+from core.constants import KEY_LANDMARKS, POSE_LANDMARKS
+from analysis.livephasedetector import LivePhaseDetector, LatencyHistogram
+
+def run_live(source, fps=None, realtime=False, model_complexity=1, max_frames=None):
+    """
+    Run pose + online phase detection on a live source and print phase transitions as they happen.
+
+    Args:
+        source (int | str): webcam index, stream URL (rtsp://...) or a video file
+        fps (float, optional): frame rate to assume when the source doesn't report one. Defaults to None.
+        realtime (bool, optional): replay a file at its native frame rate, dropping frames when processing
+            falls behind, the way a camera would. Defaults to False.
+        model_complexity (int, optional): mediapipe Pose model size. Defaults to 1.
+        max_frames (int, optional): stop after this many frames. Defaults to None (run until the source ends).
+
+    Returns:
+        dict: transitions, latency summaries (detector only, and full frame incl. inference) and dropped frames
+    """
+    cap = cv2.VideoCapture(source)
+    if not cap.isOpened():
+        raise FileNotFoundError(f'Could not open source: {source}')
+
+    fps = cap.get(cv2.CAP_PROP_FPS) or fps or 30.0
+    key_idx = [POSE_LANDMARKS.index(landmark) for landmark in KEY_LANDMARKS]
+
+    detector = LivePhaseDetector(fps=fps)
+    frame_latency = LatencyHistogram(budget_ms=1000.0 / fps)
+    transitions = []
+    dropped = 0
+
+    print(f"🎥 Live phase detection on {source} at {fps:.1f} fps "
+          f"(decision latency {detector.latency_frames} frames, budget {1000.0 / fps:.1f} ms/frame)")
+
+    with mp.solutions.pose.Pose(
+        static_image_mode=False,
+        model_complexity=model_complexity,
+        enable_segmentation=False,
+        min_detection_confidence=0.5,
+        min_tracking_confidence=0.5,
+    ) as pose:
+        t0 = None  # replay clock, started once the first frame (and model load) is done
+        frame_idx = 0
+        while max_frames is None or frame_idx < max_frames:
+            if realtime and t0 is not None:
+                # a camera doesn't wait: skip whatever frames went by while we were busy
+                due = int((time.perf_counter() - t0) * fps)
+                while frame_idx < due:
+                    if not cap.grab():
+                        break
+                    frame_idx += 1
+                    dropped += 1
+                wait = t0 + frame_idx / fps - time.perf_counter()
+                if wait > 0:
+                    time.sleep(wait)
+
+            ok, frame_bgr = cap.read()
+            if not ok:
+                break
+            captured = time.perf_counter()
+
+            result = pose.process(cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2RGB))
+
+            positions = None
+            if result.pose_world_landmarks:
+                world = result.pose_world_landmarks.landmark
+                positions = np.array([(world[i].x, world[i].y, world[i].z) for i in key_idx])
+
+            transition = detector.update(frame_idx, positions)
+            frame_latency.record(time.perf_counter() - captured)
+            if t0 is None:
+                t0 = time.perf_counter() - (frame_idx + 1) / fps
+
+            if transition:
+                transitions.append(transition)
+                at, old, new = transition
+                print(f"  ⏱️  frame {at} ({at / fps:.2f}s): {old} -> {new}")
+
+            frame_idx += 1
+
+    cap.release()
+
+    report = {
+        'transitions': transitions,
+        'dropped_frames': dropped,
+        'detector_latency': detector.latency.summary(),
+        'frame_latency': frame_latency.summary(),
+    }
+    summary = report['frame_latency']
+    print(f"📊 {summary['frames']} frames, p50 {summary['p50_ms']:.0f} ms, p95 {summary['p95_ms']:.0f} ms, "
+          f"p99 {summary['p99_ms']:.0f} ms, {summary['over_budget']} over the {summary['budget_ms']:.1f} ms budget, "
+          f"{dropped} dropped")
+    return report
+
+def main():
+    p = argparse.ArgumentParser(description="Online climbing phase detection from a webcam, stream or replayed video.")
+    p.add_argument("source", type=str, help="Webcam index (e.g. 0), stream URL or video file")
+    p.add_argument("--realtime", action="store_true", help="Replay a video file at its native frame rate")
+    p.add_argument("--fps", type=float, default=None, help="Frame rate to assume if the source doesn't report one")
+    p.add_argument("--model-complexity", type=int, choices=[0, 1, 2], default=1, help="MediaPipe Pose model size (default: 1)")
+    p.add_argument("--max-frames", type=int, default=None, help="Stop after this many frames")
+    p.add_argument("--report", type=str, default=None, help="Write transitions and latency histograms to this JSON file")
+    args = p.parse_args()
+
+    source = int(args.source) if args.source.isdigit() else args.source
+    report = run_live(source, fps=args.fps, realtime=args.realtime,
+                      model_complexity=args.model_complexity, max_frames=args.max_frames)
+
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,117 @@
 import argparse
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 import numpy as np
 import mediapipe as mp
 import pathlib
 import cv2
 import pandas as pd
 
-def extract_landmarks(video_path: str, out_csv: str, preview: bool = False ) -> None:
+from core.constants import KEY_LANDMARKS, POSE_LANDMARKS
+from core.profiling import profiler
+from pose_store import (IMAGE_CHANNELS, INFERRED_CHANNEL, STORE_CHANNELS, PoseStoreWriter, is_pose_store,
+                        write_pose_store)
+
+#one frame with no detected pose, stored as NaN so frame index == row index
+_NO_POSE = np.full((len(POSE_LANDMARKS), len(STORE_CHANNELS)), np.nan, dtype=np.float32)
+_NO_POSE_IMAGE = np.full((len(POSE_LANDMARKS), len(STORE_CHANNELS) + len(IMAGE_CHANNELS)), np.nan, dtype=np.float32)
+
+#longest frame range handed to one parallel worker (about a minute of 30fps video)
+CHUNK_FRAMES = 1800
+
+#Pose models kept alive between videos, keyed by settings; None unless keep_pose_models() was called
+_KEPT_MODELS = None
+
+#adaptive sampling (see _sample_adaptive): how far apart inferences may be while the climber is still,
+#and what counts as motion that brings the model back to every frame
+ADAPTIVE_SAMPLING = {
+    "max_stride": 4,          #at most this many frames between two inferences
+    "move_threshold": 0.06,   #key landmark displacement (m) between two inferences that counts as motion
+    "diff_threshold": 0.02,   #fraction of pixels whose grey level changed since the last inference
+    "diff_level": 25,         #grey-level change (0-255) that counts a pixel as changed
+    "hold_frames": 4,         #frames kept at full rate after motion was seen
+    "diff_width": 64,         #width the frames are shrunk to for the difference
+}
+
+#ROI tracking (see _RoiTracker): how the crop around the climber is placed and how small it is made
+ROI_TRACKING = {
+    "padding": 0.25,          #space around the landmarks, as a fraction of their box's longer side
+    "margin": 0.05,           #re-centre once a landmark comes this close to the crop edge (fraction of the crop)
+    "max_side": 384,          #crops are shrunk so their longer side is at most this many pixels (0 = never)
+}
+
+#multi-person extraction (see _extract_multi): people detection, how detections are linked into tracks and
+#the crop each track's pose runs on
+MULTI_PERSON = {
+    "detect_side": 480,       #frames are shrunk so their longer side is this before people detection
+    "min_score": 0.3,         #HOG detections scoring less than this are dropped
+    "detect_every": 5,        #while every track has its pose, people are only detected on every n-th frame
+    "min_iou": 0.3,           #a detection continues a track when their boxes overlap at least this much
+    "max_misses": 15,         #frames a track may go without a detection or a pose before it is ended
+    "max_tracks": 4,          #most people followed at once
+    "min_frames": 15,         #tracks with a pose on fewer frames than this are dropped from the output
+    "padding": 0.15,          #a detection box is grown by this fraction of its longer side for the pose crop
+}
+
+#frames the background reader may decode ahead of inference (see _FrameReader)
+READER_BUFFERS = 8
+
+_KEY_IDX = [POSE_LANDMARKS.index(landmark) for landmark in KEY_LANDMARKS]
+
+def extract_landmarks(video_path: str, out_path: str, preview: bool = False, workers: int = 1, warmup: int = 15,
+                      batch_size: int = 256, resume: bool = False, model_complexity: int = 1,
+                      min_detection_confidence: float = 0.5, min_tracking_confidence: float = 0.5,
+                      adaptive: bool = False, roi: bool = False, image_coords: bool = False,
+                      multi_person: bool = False) -> None:
     """
-    Read the video, run mediapipe on each frame, and write a csv of landmarks. 
+    Read the video, run mediapipe on each frame, and write the landmarks. 
+    Output is a binary pose store when out_path ends in .bin, otherwise a long-form csv.
     Optionally provide preview by drawing skeleton on poses. 
 
+    Pose stores are streamed to disk `batch_size` frames at a time, so memory does not grow with the 
+    video length, and each batch is a checkpoint: with resume=True an interrupted run picks up after 
+    the last batch that made it to disk. The csv output is still built in memory and written at the end.
+
+    With adaptive=True the model skips frames while the climber is still and the skipped frames are 
+    interpolated, see _sample_adaptive. The output gets an extra "inferred" channel (1 = model ran, 
+    0 = interpolated) so every frame is still there and the timeline stays uniform. Not used with preview.
+
+    With roi=True each frame is cropped to the area around the climber on the previous frame, and shrunk, 
+    before it goes to the model, see _RoiTracker. The landmarks are mapped back to the full frame and the 
+    output gets their image position as two extra channels, x_img and y_img (0-1 of the frame width/height).
+
+    With multi_person=True every climber in frame is followed as a separate track, see _extract_multi. The
+    output gets a track dimension: the store lists the track ids in its header and holds every track's
+    landmarks (see pose_store), the csv gets a track column. It always runs sequentially, from the first
+    frame, and is written at the end rather than streamed; adaptive, roi, preview and resume don't apply.
+
     Args:
         video_path (str): _description_
-        out_csv (str): _description_
+        out_path (str): .pose.bin store or .pose.csv file to write
         preview (bool, optional): _description_. Defaults to False.
+        workers (int, optional): number of processes to split the video across. Defaults to 1 (sequential).
+        warmup (int, optional): frames decoded before a chunk or resume point so tracking settles. Defaults to 15.
+        batch_size (int, optional): frames per flush to the pose store. Defaults to 256.
+        resume (bool, optional): continue an interrupted pose store instead of starting over. Defaults to False.
+        model_complexity (int, optional): mediapipe Pose model size, 0 (lite) to 2 (heavy). Defaults to 1.
+        min_detection_confidence (float, optional): _description_. Defaults to 0.5.
+        min_tracking_confidence (float, optional): _description_. Defaults to 0.5.
+        adaptive (bool, optional): run the model on a reduced cadence during still periods. Defaults to False.
+        roi (bool, optional): run the model on a crop around the climber instead of the whole frame. Defaults to False.
+        image_coords (bool, optional): also store x_img/y_img without ROI tracking, e.g. for wall calibration. 
+            Defaults to False.
+        multi_person (bool, optional): follow every person in frame as a separate track. Defaults to False.
     """
+    pose_settings = {
+        "model_complexity": model_complexity,
+        "min_detection_confidence": min_detection_confidence,
+        "min_tracking_confidence": min_tracking_confidence,
+    }
 
     #code to open video file:
     cap = cv2.VideoCapture(video_path)
@@ -26,55 +123,64 @@ def extract_landmarks(video_path: str, out_csv: str, preview: bool = False ) ->
     width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
     height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
 
+    if multi_person:
+        _extract_multi_to(cap, out_path, video_path, fps, width, height, pose_settings)
+        return
+
+    adaptive = adaptive and not preview
+    image_coords = image_coords or roi
+    channels = STORE_CHANNELS + (IMAGE_CHANNELS if image_coords else []) + ([INFERRED_CHANNEL] if adaptive else [])
+    #the sampling and crop settings go in the header so a resume can't mix frames made different ways
+    extra = {}
+    if adaptive:
+        extra["sampling"] = ADAPTIVE_SAMPLING
+    if roi:
+        extra["roi"] = ROI_TRACKING
+
+    if is_pose_store(out_path):
+        sink = PoseStoreWriter(out_path, fps, width, height, batch_size=batch_size, resume=resume, channels=channels,
+                               source=pathlib.Path(video_path).name, pose_settings=pose_settings, **extra)
+    else:
+        sink = _CsvCollector(out_path, fps, width, height, channels)
+
+    start_frame = sink.frames_written
+    if start_frame:
+        print(f'Resuming {out_path} from frame {start_frame}')
+
+    with sink, profiler.stage('extract_landmarks', video=str(video_path), workers=workers):
+        #the live preview needs frames in order on one window, so it always runs sequentially
+        if workers > 1 and not preview:
+            total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+            cap.release()
+            _extract_parallel(video_path, start_frame, total_frames, workers, warmup, pose_settings, adaptive, roi,
+                              image_coords, sink)
+        elif adaptive:
+            with _pose_model(pose_settings) as pose:
+                tracker = _RoiTracker() if roi else None
+                for _, frame_landmarks in _sample_adaptive(cap, pose, start_frame, None, warmup, tracker, image_coords):
+                    sink.append(frame_landmarks)
+            cap.release()
+        else:
+            _extract_sequential(cap, start_frame, warmup, preview, pose_settings, roi, image_coords, sink)
+            cap.release()
+
+    print(f'Saved {sink.frames_written} frames to {pathlib.Path(out_path).resolve()}')
+
+def _extract_sequential(cap, start_frame, warmup, preview, pose_settings, roi, image_coords, sink):
     #helper funtions from mediapipe: pose model and drawing tools for skeleton
     mp_pose = mp.solutions.pose
     mp_drawing = mp.solutions.drawing_utils
     mp_styles = mp.solutions.drawing_styles
 
-    with mp_pose.Pose(
-        static_image_mode=False,
-        model_complexity=1,
-        enable_segmentation=False,
-        min_detection_confidence=0.5,
-        min_tracking_confidence=0.5, 
-    ) as pose:
-        
-        rows = []   #append one row per (frame, landmark)
-
-        frame_idx = 0
-        while True:
-            ok, frame_bgr = cap.read()
-            if not ok:
-                break
-
-            frame_rgb = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2RGB)
-
-            result = pose.process(frame_rgb)
-
-            if result.pose_landmarks and result.pose_world_landmarks:
-
-                for i, lm_world in enumerate(result.pose_world_landmarks.landmark):
-                    name = mp_pose.PoseLandmark(i).name
-
-
-                    x_world = lm_world.x #in meters
-                    y_world = lm_world.y #in meters
-                    z_world = lm_world.z #in meters
-                    vis_world = lm_world.visibility
-
-
-                    rows.append({
-                        "frame": frame_idx,
-                        "t_sec": frame_idx / fps,
-                        "landmark": name,
-                        "x_world": x_world,
-                        "y_world": y_world,
-                        "z_world": z_world,
-                        "visibility": vis_world,
-                        "width": width,
-                        "height": height,
-                        "fps": fps,
-                    })
+    with _pose_model(pose_settings) as pose:
+        tracker = _RoiTracker() if roi else None
+
+        for frame_idx, frame_bgr, result in _process_frames(cap, pose, start_frame, None, warmup, tracker):
+            t_rows = time.perf_counter()
+            sink.append(_frame_landmarks(result, image_coords))
+            profiler.timing('row_building', t_rows, time.perf_counter())
+            if not result.pose_world_landmarks:
+                profiler.count('frames_no_detection')
             
             if preview:
                 draw_frame = frame_bgr.copy()
@@ -90,26 +196,700 @@ def extract_landmarks(video_path: str, out_csv: str, preview: bool = False ) ->
                 if cv2.waitKey(1) & 0xFF == ord('q'):
                     break
 
-            frame_idx += 1
-
-    cap.release()
     if preview:
         cv2.destroyAllWindows()
 
-    out_path = pathlib.Path(out_csv)
-    pd.DataFrame(rows).to_csv(out_path, index=False)
-    print(f'Saved {len(rows)} rows to {out_path.resolve()}')
+def keep_pose_models(pose_settings=None):
+    """
+    Keep Pose models loaded between extract_landmarks calls in this process instead of building a new graph 
+    per video. Meant for long-lived batch workers; pass the settings to load the model up front.
+    """
+    global _KEPT_MODELS
+    if _KEPT_MODELS is None:
+        _KEPT_MODELS = {}
+    if pose_settings is not None:
+        with _pose_model(pose_settings):
+            pass
+
+@contextmanager
+def _pose_model(pose_settings):
+    def build():
+        return mp.solutions.pose.Pose(
+            static_image_mode=False,
+            enable_segmentation=False,
+            **pose_settings,
+        )
+
+    if _KEPT_MODELS is None:
+        with build() as pose:
+            yield pose
+        return
+
+    key = tuple(sorted(pose_settings.items()))
+    if key not in _KEPT_MODELS:
+        _KEPT_MODELS[key] = build()
+    pose = _KEPT_MODELS[key]
+    #forget whatever the tracker locked onto in the previous video
+    pose.reset()
+    yield pose
+
+def _process_frames(cap, pose, start, stop, warmup, roi=None):
+    """
+    Run pose over frames [start, stop) of an open capture, yielding (frame_idx, frame_bgr, result).
+    When starting mid-video, seek to `warmup` frames before `start` and run the model over them without 
+    yielding, so tracking has locked on by the time the first frame of the range is reached.
+    With a _RoiTracker the model sees crops, but the result's image landmarks are full-frame.
+    Frames are decoded (and, without ROI, colour-converted) ahead on a _FrameReader thread, so the yielded
+    frame_bgr is only valid until the next one is asked for.
+    """
+    #the crop of a frame depends on the result of the one before, so with ROI only decoding runs ahead
+    reader = _FrameReader(cap, max(0, start - warmup), stop, convert=roi is None)
+    for frame_idx, frame_bgr, frame_rgb in reader:
+        result = _infer(pose, frame_bgr, roi, frame_rgb)
+
+        #warm-up frames only prime the tracker, they are owned by an earlier chunk or run
+        if frame_idx >= start:
+            yield frame_idx, frame_bgr, result
+
+def _infer(pose, frame_bgr, roi=None, frame_rgb=None):
+    """Colour-convert one frame (or its crop) and run the model on it. frame_rgb skips the conversion."""
+    t_crop = time.perf_counter()
+    frame_in = roi.crop(frame_bgr) if roi is not None else frame_bgr
+
+    t_convert = time.perf_counter()
+    if frame_rgb is None:
+        frame_rgb = cv2.cvtColor(frame_in, cv2.COLOR_BGR2RGB)
+        profiler.timing('cvtColor', t_convert, time.perf_counter())
+
+    t_infer = time.perf_counter()
+    result = pose.process(frame_rgb)
+    t_done = time.perf_counter()
+
+    if roi is not None:
+        if roi.update(result):
+            #mediapipe tracks in image coordinates, which the new crop just changed: re-detect next frame
+            pose.reset()
+        profiler.timing('roi', t_crop, t_convert)
+    profiler.timing('inference', t_infer, t_done)
+    profiler.count('frames_processed')
+    return result
+
+class _FrameReader:
+    """
+    Decodes frames [start, stop) of an open capture on a background thread, so the next frames are decoded
+    while the model runs on this one (OpenCV lets go of the GIL while it decodes and converts).
+
+    Frames are read straight into a ring of `buffers` preallocated BGR arrays, and with convert=True also
+    colour-converted on the reader thread into a matching ring of RGB arrays. A slot goes back to the reader
+    when the next frame is asked for, so a yielded frame must be copied to be kept any longer. The ring is
+    the bound: the reader stalls once every slot holds a frame that hasn't been used yet.
+
+    Iterating yields (frame_idx, frame_bgr, frame_rgb or None). Afterwards `stats` has the frames read, the
+    seconds the consumer stalled waiting for a frame (decode-bound) and the reader stalled waiting for a free
+    slot (inference-bound), and the mean / max number of frames waiting when one was taken.
+    """
+
+    def __init__(self, cap, start, stop=None, convert=True, buffers=READER_BUFFERS):
+        self.cap = cap
+        self.start, self.stop = start, stop
+        self.convert = convert
+        self.buffers = max(2, buffers)
+        self.stats = {"frames": 0, "consumer_stall_s": 0.0, "reader_stall_s": 0.0, "mean_depth": 0.0, "max_depth": 0}
+        self._free, self._ready = queue.Queue(), queue.Queue()
+        self._closing = threading.Event()
+        self._error = None
+        self._bgr, self._rgb = [], []
+
+    def __iter__(self):
+        if self.start:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, self.start)
+        thread = threading.Thread(target=self._read, daemon=True)
+        thread.start()
+
+        slot = None
+        depth_total = 0
+        try:
+            while True:
+                if slot is not None:
+                    self._free.put(slot)
+                depth = self._ready.qsize()
+                t_wait = time.perf_counter()
+                item = self._ready.get()
+                t_got = time.perf_counter()
+                if item is None:
+                    break
+                frame_idx, slot = item
+
+                self.stats["consumer_stall_s"] += t_got - t_wait
+                self.stats["frames"] += 1
+                self.stats["max_depth"] = max(self.stats["max_depth"], depth)
+                depth_total += depth
+                profiler.timing('reader_wait', t_wait, t_got)
+                profiler.gauge('reader_depth', depth)
+                yield frame_idx, self._bgr[slot], self._rgb[slot] if self.convert else None
+        finally:
+            #unblock a reader waiting for a free slot, then wait for it to notice
+            self._closing.set()
+            self._free.put(None)
+            thread.join()
+            self.stats["mean_depth"] = depth_total / max(self.stats["frames"], 1)
+        if self._error is not None:
+            raise self._error
+
+    def _read(self):
+        try:
+            frame_idx = self.start
+            for slot in range(self.buffers):
+                self._free.put(slot)
+            while not self._closing.is_set() and (self.stop is None or frame_idx < self.stop):
+                t_wait = time.perf_counter()
+                slot = self._free.get()
+                t_decode = time.perf_counter()
+                self.stats["reader_stall_s"] += t_decode - t_wait
+                if slot is None or self._closing.is_set():
+                    break
+
+                #the ring is allocated from the first frame, whose shape it takes
+                ok, frame_bgr = self.cap.read(self._bgr[slot] if slot < len(self._bgr) else None)
+                if not ok:
+                    break
+                if slot == len(self._bgr):
+                    self._bgr.append(frame_bgr)
+                    if self.convert:
+                        self._rgb.append(np.empty_like(frame_bgr))
+                elif frame_bgr is not self._bgr[slot]:
+                    #only decoded in place when the buffer matches the frame
+                    self._bgr[slot] = frame_bgr
+                t_convert = time.perf_counter()
+                profiler.timing('decode', t_decode, t_convert)
+
+                if self.convert:
+                    if self._rgb[slot].shape != frame_bgr.shape:
+                        self._rgb[slot] = np.empty_like(frame_bgr)
+                    cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2RGB, dst=self._rgb[slot])
+                    profiler.timing('cvtColor', t_convert, time.perf_counter())
+
+                self._ready.put((frame_idx, slot))
+                frame_idx += 1
+        except Exception as e:
+            self._error = e
+        finally:
+            self._ready.put(None)
+
+class _RoiTracker:
+    """
+    Keeps a crop box around the climber so the model sees a small image instead of the whole wall shot.
+
+    The box for the next frame comes from this frame's landmarks, padded. It stays put while the 
+    landmarks stay clear of its edges (and it isn't far larger than they need), because every move shifts 
+    the image under mediapipe's own tracker, which then has to re-detect. Once no pose is found the next 
+    frame goes in whole again. 
+    Crops are shrunk to max_side before colour conversion, which is where the time saving comes from.
+    """
+
+    def __init__(self, settings=ROI_TRACKING):
+        self.padding = settings["padding"]
+        self.margin = settings["margin"]
+        self.max_side = settings["max_side"]
+        self.box = None  #(x0, y0, x1, y1) in pixels for the next frame, None for the whole frame
+        self._used = None
+        self._frame_size = None
+
+    def crop(self, frame_bgr):
+        height, width = frame_bgr.shape[:2]
+        self._frame_size = (width, height)
+        x0, y0, x1, y1 = self._used = self.box or (0, 0, width, height)
+
+        region = frame_bgr[y0:y1, x0:x1]
+        longest = max(x1 - x0, y1 - y0)
+        if self.max_side and longest > self.max_side:
+            scale = self.max_side / longest
+            size = (max(1, round((x1 - x0) * scale)), max(1, round((y1 - y0) * scale)))
+            region = cv2.resize(region, size, interpolation=cv2.INTER_AREA)
+        return region
+
+    def update(self, result):
+        """
+        Map the result's image landmarks from the crop to the full frame and place the next box.
+        Returns True when the box changed, i.e. the next frame is cropped differently.
+        """
+        if not result.pose_landmarks:
+            if self.box is None:
+                return False
+            profiler.count('roi_lost')
+            self.box = None
+            return True
+
+        width, height = self._frame_size
+        x0, y0, x1, y1 = self._used
+        points = result.pose_landmarks.landmark
+        for lm in points:
+            lm.x = (x0 + lm.x * (x1 - x0)) / width
+            lm.y = (y0 + lm.y * (y1 - y0)) / height
+
+        xy = np.array([(lm.x * width, lm.y * height) for lm in points])
+        lo, hi = xy.min(axis=0), xy.max(axis=0)
+        pad = self.padding * (hi - lo).max()
+
+        if self.box is not None:
+            bx0, by0, bx1, by1 = self.box
+            mx, my = self.margin * (bx1 - bx0), self.margin * (by1 - by0)
+            #a side already on the frame border can't move out any further, so it never needs re-centring
+            inside = ((bx0 == 0 or lo[0] >= bx0 + mx) and (by0 == 0 or lo[1] >= by0 + my)
+                      and (bx1 == width or hi[0] <= bx1 - mx) and (by1 == height or hi[1] <= by1 - my))
+            needed = (hi - lo + 2 * pad).prod()
+            if inside and (bx1 - bx0) * (by1 - by0) <= 4 * needed:
+                return False
+
+        lo = np.maximum(np.floor(lo - pad), 0).astype(int)
+        hi = np.minimum(np.ceil(hi + pad), (width, height)).astype(int)
+        self.box = (lo[0], lo[1], hi[0], hi[1]) if (hi - lo).min() > 1 else None
+        profiler.count('roi_moves')
+        return True
+
+def _frame_landmarks(result, image_coords=False):
+    """
+    Pull the world landmarks (x, y, z in meters + visibility) of one processed frame into an array.
+    With image_coords their position in the frame (x_img, y_img, 0-1) is added after them.
+    """
+    if not (result.pose_landmarks and result.pose_world_landmarks):
+        return _NO_POSE_IMAGE if image_coords else _NO_POSE
+
+    world = np.array(
+        [(lm.x, lm.y, lm.z, lm.visibility) for lm in result.pose_world_landmarks.landmark],
+        dtype=np.float32,
+    )
+    if not image_coords:
+        return world
+    image = np.array([(lm.x, lm.y) for lm in result.pose_landmarks.landmark], dtype=np.float32)
+    return np.concatenate([world, image], axis=1)
+
+def _sample_adaptive(cap, pose, start, stop, warmup, roi=None, image_coords=False, sampling=ADAPTIVE_SAMPLING):
+    """
+    Like _process_frames, but the model only runs on every frame while something is moving. Yields 
+    (frame_idx, landmarks) for every frame in [start, stop), landmarks carrying the extra inferred channel.
+
+    A frame goes through the model when any of these hold, otherwise it is skipped:
+      - max_stride frames have passed since the last inference
+      - more than diff_threshold of its pixels changed against the last inferred frame (on small 
+        greyscale copies, so this costs next to nothing next to inference)
+      - a key landmark moved more than move_threshold between the last two inferences, or did so within 
+        the last hold_frames frames. Displacement rather than speed, so the model's frame-to-frame 
+        jitter at full rate doesn't count as motion
+      - the last inference found no pose, so the tracker is re-acquiring
+    Skipped frames are held back until the next inference and then linearly interpolated between the two 
+    inferred frames on either side (NaN if either side had no pose), so they come out in order. If the 
+    range ends on skipped frames the last of them is inferred to close the gap.
+    With a _RoiTracker the inferred frames go through it; with image_coords the landmarks carry x_img, y_img.
+    Frames are decoded ahead on a _FrameReader thread; most are never inferred, so they are converted here.
+    """
+    def infer(frame_bgr):
+        result = _infer(pose, frame_bgr, roi)
+        landmarks = _frame_landmarks(result, image_coords)
+        if not result.pose_world_landmarks:
+            profiler.count('frames_no_detection')
+        return np.concatenate([landmarks, np.ones((len(landmarks), 1), dtype=np.float32)], axis=1)
+
+    def interpolated(idx_a, a, idx_b, b, skipped):
+        weights = (np.array(skipped, dtype=np.float32) - idx_a) / (idx_b - idx_a)
+        block = a + weights[:, None, None] * (b - a)
+        block[:, :, -1] = 0.0
+        profiler.count('frames_interpolated', len(skipped))
+        return zip(skipped, block)
+
+    last_idx = last = last_small = None
+    skipped, skipped_bgr = [], None
+    full_rate_until = -1
+
+    for frame_idx, frame_bgr, _ in _FrameReader(cap, max(0, start - warmup), stop, convert=False):
+        t_diff = time.perf_counter()
+        height, width = frame_bgr.shape[:2]
+        small = cv2.cvtColor(cv2.resize(frame_bgr, (sampling["diff_width"], max(1, height * sampling["diff_width"] // width)),
+                                        interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2GRAY)
+        run_model = (
+            frame_idx < start                                   #warm-up primes the tracker on every frame
+            or last is None
+            or np.isnan(last[0, 0])
+            or frame_idx <= full_rate_until
+            or frame_idx - last_idx >= sampling["max_stride"]
+            or (cv2.absdiff(small, last_small) > sampling["diff_level"]).mean() > sampling["diff_threshold"]
+        )
+        profiler.timing('frame_diff', t_diff, time.perf_counter())
+
+        if not run_model:
+            skipped.append(frame_idx)
+            #the reader reuses frame_bgr's buffer, and the last skipped frame may be needed after the loop
+            if skipped_bgr is None or skipped_bgr.shape != frame_bgr.shape:
+                skipped_bgr = np.empty_like(frame_bgr)
+            np.copyto(skipped_bgr, frame_bgr)
+            continue
+
+        landmarks = infer(frame_bgr)
+        if frame_idx >= start:
+            if last is not None:
+                moved = np.linalg.norm(landmarks[_KEY_IDX, :3] - last[_KEY_IDX, :3], axis=1)
+                if (moved > sampling["move_threshold"]).any():
+                    full_rate_until = frame_idx + sampling["hold_frames"]
+                if skipped:
+                    yield from interpolated(last_idx, last, frame_idx, landmarks, skipped)
+            yield frame_idx, landmarks
+            last_idx, last, last_small = frame_idx, landmarks, small
+        skipped = []
+
+    if skipped:
+        #nothing after the gap to interpolate towards: infer its last frame instead
+        end_idx = skipped.pop()
+        landmarks = infer(skipped_bgr)
+        if skipped:
+            yield from interpolated(last_idx, last, end_idx, landmarks, skipped)
+        yield end_idx, landmarks
+
+def _extract_multi_to(cap, out_path, video_path, fps, width, height, pose_settings):
+    """Run _extract_multi over a whole video and write the tracks to a pose store or long-form csv"""
+    with profiler.stage('extract_landmarks', video=str(video_path), multi_person=True):
+        track_ids, landmarks = _extract_multi(cap, pose_settings)
+    cap.release()
+
+    channels = STORE_CHANNELS + IMAGE_CHANNELS
+    if is_pose_store(out_path):
+        write_pose_store(out_path, landmarks, fps, width, height, channels=channels,
+                         names=POSE_LANDMARKS * len(track_ids), tracks=track_ids,
+                         source=pathlib.Path(video_path).name, pose_settings=pose_settings, multi_person=MULTI_PERSON)
+    else:
+        _long_form(landmarks, fps, width, height, channels, tracks=track_ids).to_csv(out_path, index=False)
+    print(f'Saved {len(landmarks)} frames of {len(track_ids)} tracks {track_ids} to {pathlib.Path(out_path).resolve()}')
+
+def _extract_multi(cap, pose_settings, settings=MULTI_PERSON):
+    """
+    Follow every climber in frame: people are detected (on every frame while a track is missing its pose,
+    every detect_every frames otherwise), detections are linked into tracks by box overlap (_IouTracker),
+    and each track runs its own Pose model on a crop around its person, the tracks of a frame in parallel
+    on a thread pool.
+
+    A track's crop follows its pose like a _RoiTracker while the pose is found, so the model keeps tracking
+    within it, and falls back to the matched detection when it isn't. The pose-derived box is also what the
+    next frame's detections are matched against, which keeps a track on its climber through the frames the
+    people detector misses.
+
+    Returns:
+        (track ids ordered by frames with a pose, most first, (frames, tracks * landmarks, channels) array
+        with world, visibility and image channels, NaN where a track had no pose)
+    """
+    detector = _PersonDetector(settings)
+    tracker = _IouTracker(pose_settings, settings)
+    n_channels = len(STORE_CHANNELS) + len(IMAGE_CHANNELS)
+    frames = []
+
+    with ThreadPoolExecutor(max_workers=settings["max_tracks"]) as pool:
+        for frame_idx, frame_bgr, _ in _FrameReader(cap, 0, convert=False):
+            #a new person is picked up within detect_every frames; a lost one is searched for on every frame
+            detections = np.zeros((0, 4))
+            if (frame_idx % settings["detect_every"] == 0 or not tracker.tracks
+                    or not all(track.found for track in tracker.tracks)):
+                t_detect = time.perf_counter()
+                detections = detector.detect(frame_bgr)
+                profiler.timing('person_detection', t_detect, time.perf_counter())
+
+            tracks = tracker.update(detections, frame_bgr.shape)
+            results = pool.map(lambda track: track.infer(frame_bgr), tracks)
+            frames.append({track.id: landmarks for track, landmarks in zip(tracks, results) if landmarks is not None})
+            tracker.end_lost()
+            profiler.gauge('active_tracks', len(tracks))
+
+    for track in tracker.ended + tracker.tracks:
+        track.close()
+
+    counts = {}
+    for frame in frames:
+        for track_id in frame:
+            counts[track_id] = counts.get(track_id, 0) + 1
+    track_ids = sorted((t for t, n in counts.items() if n >= settings["min_frames"]), key=lambda t: (-counts[t], t))
+    profiler.count('tracks', len(track_ids))
+
+    landmarks = np.full((len(frames), len(track_ids) * len(POSE_LANDMARKS), n_channels), np.nan, dtype=np.float32)
+    for frame_idx, frame in enumerate(frames):
+        for k, track_id in enumerate(track_ids):
+            if track_id in frame:
+                landmarks[frame_idx, k * len(POSE_LANDMARKS):(k + 1) * len(POSE_LANDMARKS)] = frame[track_id]
+    return track_ids, landmarks
+
+class _PersonDetector:
+    """OpenCV's HOG people detector run on a shrunk copy of the frame, boxes in full-frame pixels."""
+
+    def __init__(self, settings=MULTI_PERSON):
+        self.hog = cv2.HOGDescriptor()
+        self.hog.setSVMDetector(cv2.HOGDescriptor_getDefaultPeopleDetector())
+        self.detect_side = settings["detect_side"]
+        self.min_score = settings["min_score"]
+
+    def detect(self, frame_bgr):
+        """(detections, 4) x0, y0, x1, y1 boxes, overlapping ones merged"""
+        height, width = frame_bgr.shape[:2]
+        scale = min(1.0, self.detect_side / max(height, width))
+        small = cv2.resize(frame_bgr, (round(width * scale), round(height * scale)), interpolation=cv2.INTER_AREA)
+        rects, weights = self.hog.detectMultiScale(small, winStride=(8, 8), padding=(8, 8), scale=1.05)
+        if len(rects) == 0:
+            return np.zeros((0, 4))
+
+        keep = np.asarray(cv2.dnn.NMSBoxes(rects.tolist(), np.ravel(weights).tolist(), self.min_score, 0.4)).ravel()
+        rects = rects[keep].astype(np.float64) / scale
+        return np.column_stack([rects[:, :2], rects[:, :2] + rects[:, 2:]])
+
+class _PersonTrack:
+    """One followed person: an id, their own Pose model, and the crop it runs on."""
+
+    def __init__(self, track_id, box, pose_settings, settings=MULTI_PERSON):
+        self.id = track_id
+        self.padding = settings["padding"]
+        self.pose = mp.solutions.pose.Pose(static_image_mode=False, enable_segmentation=False, **pose_settings)
+        self.roi = _RoiTracker()
+        self.box = None
+        self.misses = 0
+        self.found = False
+        self.place(box)
+
+    def place(self, box):
+        """Crop around a detection box on the next frame unless the pose is already being followed"""
+        if self.roi.box is None and box is not None:
+            self.box = box
+            self.roi.box = tuple(int(v) for v in self._padded(box))
+
+    def infer(self, frame_bgr):
+        """(landmarks, channels) world, visibility and full-frame image landmarks, None without a pose"""
+        if self.roi.box is None:
+            self.found = False
+            return None
+        height, width = frame_bgr.shape[:2]
+        x0, y0, x1, y1 = self.roi.box
+        self.roi.box = (max(x0, 0), max(y0, 0), min(x1, width), min(y1, height))
+        result = _infer(self.pose, frame_bgr, self.roi)
+        self.found = bool(result.pose_landmarks and result.pose_world_landmarks)
+        if not self.found:
+            return None
+
+        landmarks = _frame_landmarks(result, image_coords=True)
+        xy = landmarks[:, len(STORE_CHANNELS):] * (width, height)
+        self.box = np.concatenate([xy.min(axis=0), xy.max(axis=0)])
+        self.misses = 0
+        return landmarks
+
+    def close(self):
+        self.pose.close()
+
+    def _padded(self, box):
+        pad = self.padding * (box[2:] - box[:2]).max()
+        return np.concatenate([box[:2] - pad, box[2:] + pad])
+
+class _IouTracker:
+    """
+    Links each frame's people detections to tracks, greedily by box overlap (intersection over union),
+    best pairs first. A detection left over opens a new track unless it mostly covers a tracked person
+    already; a track with neither a detection nor a pose for max_misses frames is ended.
+    """
+
+    def __init__(self, pose_settings, settings=MULTI_PERSON):
+        self.pose_settings = pose_settings
+        self.settings = settings
+        self.tracks = []
+        self.ended = []
+        self._next_id = 1
+
+    def update(self, detections, frame_shape):
+        """Match this frame's detections and return the tracks to run pose on"""
+        height, width = frame_shape[:2]
+        detections = np.clip(detections, 0, [width, height, width, height])
+        matched_tracks, matched_detections = set(), set()
+
+        if len(self.tracks) and len(detections):
+            overlap = _iou(np.array([track.box for track in self.tracks]), detections)
+            for t, d in zip(*np.unravel_index(np.argsort(-overlap, axis=None), overlap.shape)):
+                if overlap[t, d] < self.settings["min_iou"]:
+                    break
+                if t in matched_tracks or d in matched_detections:
+                    continue
+                matched_tracks.add(t)
+                matched_detections.add(d)
+                self.tracks[t].place(detections[d])
+                self.tracks[t].misses = 0
+
+        for t, track in enumerate(self.tracks):
+            if t not in matched_tracks and not track.found:
+                track.misses += 1
+
+        for d, box in enumerate(detections):
+            if d in matched_detections or len(self.tracks) >= self.settings["max_tracks"]:
+                continue
+            if self.tracks and _coverage(box, np.array([track.box for track in self.tracks])).max() > 0.5:
+                continue
+            self.tracks.append(_PersonTrack(self._next_id, box, self.pose_settings, self.settings))
+            profiler.count('tracks_started')
+            self._next_id += 1
+        return list(self.tracks)
+
+    def end_lost(self):
+        """End the tracks that have gone too long without a detection or a pose, and duplicates of others"""
+        keep = []
+        for track in self.tracks:
+            duplicate = any(
+                other.found and track.found and _iou(track.box[None], other.box[None])[0, 0] > 0.7
+                for other in keep
+            )
+            if track.misses > self.settings["max_misses"] or duplicate:
+                self.ended.append(track)
+            else:
+                keep.append(track)
+        self.tracks = keep
+
+def _iou(a, b):
+    """(len(a), len(b)) intersection over union of x0, y0, x1, y1 boxes"""
+    lo = np.maximum(a[:, None, :2], b[None, :, :2])
+    hi = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.clip(hi - lo, 0, None).prod(axis=2)
+    area_a = (a[:, 2:] - a[:, :2]).prod(axis=1)
+    area_b = (b[:, 2:] - b[:, :2]).prod(axis=1)
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-9)
+
+def _coverage(box, others):
+    """Fraction of box's area inside each of others"""
+    lo = np.maximum(box[:2], others[:, :2])
+    hi = np.minimum(box[2:], others[:, 2:])
+    return np.clip(hi - lo, 0, None).prod(axis=1) / max((box[2:] - box[:2]).prod(), 1e-9)
+
+class _CsvCollector:
+    """Keeps frames in memory and writes the long-form csv on close, mirroring PoseStoreWriter's interface."""
+
+    def __init__(self, out_path, fps, width, height, channels=STORE_CHANNELS):
+        self.out_path = pathlib.Path(out_path)
+        self.fps, self.width, self.height = fps, width, height
+        self.channels = channels
+        self.frames = []
+        self.frames_written = 0
+
+    def append(self, frame_landmarks):
+        self.frames.append(frame_landmarks)
+        self.frames_written += 1
+
+    def extend(self, landmarks):
+        for frame_landmarks in landmarks:
+            self.append(frame_landmarks)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        #an interrupted or failed extraction writes nothing rather than a truncated csv that looks complete
+        if exc_type is not None:
+            return
+        shape = (0, len(POSE_LANDMARKS), len(self.channels))
+        landmarks = np.stack(self.frames) if self.frames else np.empty(shape, dtype=np.float32)
+        _long_form(landmarks, self.fps, self.width, self.height, self.channels).to_csv(self.out_path, index=False)
+
+def _long_form(landmarks, fps, width, height, channels=STORE_CHANNELS, tracks=None):
+    """
+    Flatten the frame array into the long-form table: one row per (detected frame, landmark).
+    With the tracks of a multi-person array every track's rows follow the last's, with a track column.
+    """
+    if tracks:
+        per_track = landmarks.shape[1] // len(tracks)
+        parts = []
+        for k, track in enumerate(tracks):
+            part = _long_form(landmarks[:, k * per_track:(k + 1) * per_track], fps, width, height, channels)
+            part.insert(1, "track", track)
+            parts.append(part)
+        return pd.concat(parts, ignore_index=True)
+
+    n_frames, n_landmarks, _ = landmarks.shape
+    detected = ~np.isnan(landmarks[:, :, 0]).all(axis=1)
+    frame = np.repeat(np.arange(n_frames)[detected], n_landmarks)
+    values = landmarks[detected].reshape(-1, landmarks.shape[2]).astype(np.float64)
+
+    rows = pd.DataFrame({
+        "frame": frame,
+        "t_sec": frame / fps,
+        "landmark": np.tile(POSE_LANDMARKS[:n_landmarks], int(detected.sum())),
+    })
+    for i, channel in enumerate(channels):
+        rows[channel] = values[:, i]
+    rows["width"] = width
+    rows["height"] = height
+    rows["fps"] = fps
+    return rows
+
+def _extract_parallel(video_path, start_frame, total_frames, workers, warmup, pose_settings, adaptive, roi,
+                      image_coords, sink):
+    """
+    Split the video into contiguous frame ranges and extract them in separate processes. 
+    Each worker seeks to `warmup` frames before its range and runs its own pose model, see _process_frames.
+
+    Chunks are capped at CHUNK_FRAMES so a long session never holds more than a few chunks in memory, 
+    and they are handed to the sink in frame order, same as the sequential path.
+    """
+    remaining = max(0, total_frames - start_frame)
+    n_chunks = max(1, workers, -(-remaining // CHUNK_FRAMES))
+    bounds = np.linspace(start_frame, total_frames, n_chunks + 1).astype(int)
+
+    jobs = []
+    for k in range(n_chunks):
+        #frame counts from the container can be off by a few frames, so the last chunk reads to the end of the stream
+        stop = int(bounds[k + 1]) if k < n_chunks - 1 else None
+        jobs.append((video_path, int(bounds[k]), stop, warmup, pose_settings, adaptive, roi, image_coords,
+                     profiler.enabled))
+
+    #spawn so each worker builds its own mediapipe graph instead of inheriting the parent's state
+    ctx = multiprocessing.get_context("spawn")
+    with ctx.Pool(processes=min(workers, n_chunks)) as pool:
+        #imap keeps chunk order, so writing in sequence gives frame-ordered output
+        for chunk, profile, pid in pool.imap(_extract_chunk, jobs):
+            profiler.merge(profile, pid)
+            sink.extend(chunk)
+
+def _extract_chunk(job):
+    """
+    Worker entry point: run pose over frames [start, stop) of the video and return their landmarks, with the
+    worker's profile summary (None unless the parent is profiling) and pid.
+    """
+    video_path, start, stop, warmup, pose_settings, adaptive, roi, image_coords, profile = job
+    if profile:
+        #a fresh summary per chunk, pool workers are reused
+        profiler.enable()
+
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise FileNotFoundError(f'Could not open video: {video_path}')
+
+    frames = []
+    with profiler.stage('extract_chunk', start=start, stop=stop), _pose_model(pose_settings) as pose:
+        tracker = _RoiTracker() if roi else None
+        if adaptive:
+            frames = [landmarks for _, landmarks in _sample_adaptive(cap, pose, start, stop, warmup, tracker, image_coords)]
+        else:
+            for _, _, result in _process_frames(cap, pose, start, stop, warmup, tracker):
+                frames.append(_frame_landmarks(result, image_coords))
+
+    cap.release()
+    n_channels = len(STORE_CHANNELS) + (len(IMAGE_CHANNELS) if image_coords else 0) + (1 if adaptive else 0)
+    chunk = np.stack(frames) if frames else np.empty((0, len(POSE_LANDMARKS), n_channels), dtype=np.float32)
+    return chunk, profiler.summary() if profile else None, os.getpid()
 
 def main():
-    p = argparse.ArgumentParser(description="Extract MediaPipe Pose Landmarks to CSV.")
+    p = argparse.ArgumentParser(description="Extract MediaPipe Pose Landmarks to a pose store or CSV.")
     p.add_argument("video", type=str, help="Path to an input video file")
-    p.add_argument("--out", type=str, default=None, help="Output CSV path (optional)")
+    p.add_argument("--out", type=str, default=None, help="Output path, .bin for a pose store or .csv for long form (optional)")
     p.add_argument("--preview", action="store_true", help="Show live skeleton overlay while extracting")
+    p.add_argument("--workers", type=int, default=1, help="Number of processes to split extraction across (default: 1)")
+    p.add_argument("--batch-size", type=int, default=256, help="Frames per flush to the pose store (default: 256)")
+    p.add_argument("--resume", action="store_true", help="Continue an interrupted pose store from its last checkpoint")
+    p.add_argument("--adaptive", action="store_true", help="Skip and interpolate frames while the climber is still")
+    p.add_argument("--roi", action="store_true", help="Run pose on a crop around the climber instead of the whole frame")
+    p.add_argument("--multi-person", action="store_true", help="Follow every person in frame as a separate track")
+    p.add_argument("--model-complexity", type=int, choices=[0, 1, 2], default=1, help="MediaPipe Pose model size (default: 1)")
     args = p.parse_args()
 
     video_path = pathlib.Path(args.video)
-    out_csv = args.out or str(pathlib.Path("data") / (video_path.stem + ".pose.csv"))  
-    extract_landmarks(str(video_path), out_csv, preview=args.preview)
+    out_path = args.out or str(pathlib.Path("data") / (video_path.stem + ".pose.bin"))  
+    extract_landmarks(str(video_path), out_path, preview=args.preview, workers=args.workers,
+                      batch_size=args.batch_size, resume=args.resume, adaptive=args.adaptive,
+                      roi=args.roi, model_complexity=args.model_complexity, multi_person=args.multi_person)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,284 @@
+"""
+Compact binary storage for pose landmarks.
+
+A .pose.bin file holds every frame of a video as one float32 block of shape
+(frames, 33, channels) plus a single JSON metadata header, so later stages can
+memory-map it instead of parsing a long-form CSV.
+
+Layout:
+    8 bytes     magic b"CLPOSE01"
+    8 bytes     uint64 number of frames (little endian)
+    4 bytes     uint32 length of the JSON header
+    N bytes     JSON header (fps, width, height, landmarks, channels, ...)
+    padding     zero bytes up to a 64 byte boundary
+    data        float32 array (frames, landmarks, channels), C order
+
+Frames where mediapipe found no pose are stored as NaN, so row i is always frame i.
+The frame count in the prefix is only advanced once the frames it covers are on
+disk, so an interrupted write can be resumed from it (see PoseStoreWriter).
+
+Multi-person stores (extract_landmarks(multi_person=True)) list their track ids under "tracks" in the header
+and lay the landmark axis out track by track: landmarks [k * 33, (k + 1) * 33) are track tracks[k]. Tracks
+are ordered by how many frames they cover, so a reader that only knows single-person stores and looks a
+landmark up by name gets the main climber.
+"""
+
+import os
+import json
+import struct
+import pathlib
+import numpy as np
+
+from core.constants import POSE_LANDMARKS
+
+STORE_SUFFIX = ".bin"
+STORE_MAGIC = b"CLPOSE01"
+STORE_CHANNELS = ["x_world", "y_world", "z_world", "visibility"]
+
+#optional channels written by ROI tracking: each landmark's position in the full frame, 0-1 of width/height
+IMAGE_CHANNELS = ["x_img", "y_img"]
+
+#optional per-frame channel written by adaptive sampling: 1.0 where the model ran, 0.0 where the frame was
+#interpolated from its neighbours. The value is repeated for every landmark of the frame.
+INFERRED_CHANNEL = "inferred"
+
+_PREFIX = struct.Struct("<8sQI")
+_ALIGN = 64
+
+
+def is_pose_store(path):
+    """True if the path points at a binary pose store rather than a CSV."""
+    return pathlib.Path(path).suffix == STORE_SUFFIX
+
+
+def write_pose_store(path, landmarks, fps, width, height, channels=None, names=None, **extra):
+    """
+    Write a (frames x landmarks x channels) array and its metadata to a pose store.
+
+    Args:
+        path (str): output .pose.bin path
+        landmarks (np.ndarray): float array, NaN rows for frames without a detection
+        fps (float): frame rate of the source video
+        width (int): frame width in pixels
+        height (int): frame height in pixels
+        channels (list, optional): names of the last axis. Defaults to the first STORE_CHANNELS.
+        names (list, optional): names of the landmark axis. Defaults to the first POSE_LANDMARKS.
+        **extra: any other JSON-serialisable metadata to keep in the header
+    """
+    landmarks = np.ascontiguousarray(landmarks, dtype=np.float32)
+
+    header = {
+        "fps": float(fps),
+        "width": int(width),
+        "height": int(height),
+        "landmarks": list(names) if names is not None else POSE_LANDMARKS[:landmarks.shape[1]],
+        "channels": list(channels) if channels is not None else STORE_CHANNELS[:landmarks.shape[2]],
+        **extra,
+    }
+    header_bytes = json.dumps(header).encode("utf-8")
+    offset = _data_offset(len(header_bytes))
+
+    with open(path, "wb") as f:
+        f.write(_PREFIX.pack(STORE_MAGIC, landmarks.shape[0], len(header_bytes)))
+        f.write(header_bytes)
+        f.write(b"\0" * (offset - _PREFIX.size - len(header_bytes)))
+        f.write(landmarks.tobytes())
+
+
+def read_pose_store(path, mmap=True):
+    """
+    Open a pose store.
+
+    Returns:
+        (np.ndarray, dict): the (frames x landmarks x channels) float32 array, memory-mapped
+        read-only unless mmap=False, and the metadata header.
+    """
+    with open(path, "rb") as f:
+        magic, n_frames, header_len = _PREFIX.unpack(f.read(_PREFIX.size))
+        if magic != STORE_MAGIC:
+            raise ValueError(f"{path} is not a ClimbLab pose store")
+        header = json.loads(f.read(header_len).decode("utf-8"))
+
+    shape = (n_frames, len(header["landmarks"]), len(header["channels"]))
+    offset = _data_offset(header_len)
+
+    if n_frames == 0:
+        return np.empty(shape, dtype=np.float32), header
+    if mmap:
+        return np.memmap(path, dtype=np.float32, mode="r", offset=offset, shape=shape), header
+    return np.fromfile(path, dtype=np.float32, offset=offset).reshape(shape), header
+
+
+class PoseStoreWriter:
+    """
+    Streams frames into a pose store in fixed-size batches so memory stays flat however long the video is.
+
+    After every batch the data is fsynced and only then is the frame count in the prefix bumped, so the
+    count is a checkpoint: with resume=True an existing store is reopened, anything past the last
+    committed batch is cut off, and `frames_written` says which frame to carry on from.
+    """
+
+    def __init__(self, path, fps, width, height, batch_size=256, resume=False, channels=STORE_CHANNELS, **extra):
+        self.path = pathlib.Path(path)
+        self.batch_size = batch_size
+        self.header = {
+            "fps": float(fps),
+            "width": int(width),
+            "height": int(height),
+            "landmarks": POSE_LANDMARKS,
+            "channels": list(channels),
+            **extra,
+        }
+        self.frame_shape = (len(self.header["landmarks"]), len(self.header["channels"]))
+        self._batch = np.empty((batch_size,) + self.frame_shape, dtype=np.float32)
+        self._pending = 0
+
+        if resume and self.path.exists():
+            self._reopen()
+        else:
+            self._create()
+
+    def _create(self):
+        header_bytes = json.dumps(self.header).encode("utf-8")
+        self._header_len = len(header_bytes)
+        self._offset = _data_offset(self._header_len)
+        self.frames_written = 0
+
+        self._file = open(self.path, "wb")
+        self._file.write(_PREFIX.pack(STORE_MAGIC, 0, len(header_bytes)))
+        self._file.write(header_bytes)
+        self._file.write(b"\0" * (self._offset - _PREFIX.size - len(header_bytes)))
+        self._sync()
+
+    def _reopen(self):
+        self._file = open(self.path, "r+b")
+        magic, n_frames, header_len = _PREFIX.unpack(self._file.read(_PREFIX.size))
+        if magic != STORE_MAGIC:
+            raise ValueError(f"{self.path} is not a ClimbLab pose store")
+
+        existing = json.loads(self._file.read(header_len).decode("utf-8"))
+        if existing != self.header:
+            raise ValueError(f"Cannot resume {self.path}: it was written from a different video or settings")
+
+        self._header_len = header_len
+        self._offset = _data_offset(header_len)
+        self.frames_written = n_frames
+
+        #drop any partial batch written after the last checkpoint
+        self._file.truncate(self._offset + n_frames * self._frame_bytes())
+        self._file.seek(0, os.SEEK_END)
+
+    def append(self, frame_landmarks):
+        """Queue one frame; the batch is written out once it is full."""
+        self._batch[self._pending] = frame_landmarks
+        self._pending += 1
+        if self._pending == self.batch_size:
+            self.flush()
+
+    def extend(self, landmarks):
+        """Queue a block of frames (frames x landmarks x channels)."""
+        for frame_landmarks in landmarks:
+            self.append(frame_landmarks)
+
+    def flush(self):
+        """Write the pending frames and advance the checkpoint past them."""
+        if self._pending == 0:
+            return
+
+        self._file.write(self._batch[:self._pending].tobytes())
+        self._sync()
+        self.frames_written += self._pending
+        self._pending = 0
+
+        self._file.seek(0)
+        self._file.write(_PREFIX.pack(STORE_MAGIC, self.frames_written, self._header_len))
+        self._sync()
+        self._file.seek(0, os.SEEK_END)
+
+    def close(self):
+        if self._file.closed:
+            return
+        self.flush()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        #frames already processed are valid even if extraction died, keep them for the resume
+        self.close()
+
+    def _frame_bytes(self):
+        return int(np.prod(self.frame_shape)) * 4
+
+    def _sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+
+def detected_frames(landmarks):
+    """Indices of the frames where a pose was detected (i.e. not all NaN)."""
+    return np.flatnonzero(~np.isnan(landmarks[:, :, 0]).all(axis=1))
+
+
+def inferred_frames(landmarks, header):
+    """
+    Boolean mask of the frames the pose model actually ran on. Every frame counts as inferred in stores
+    written without adaptive sampling.
+    """
+    if INFERRED_CHANNEL not in header["channels"]:
+        return np.ones(len(landmarks), dtype=bool)
+    return np.asarray(landmarks[:, 0, header["channels"].index(INFERRED_CHANNEL)]) > 0.5
+
+
+def _data_offset(header_len):
+    end = _PREFIX.size + header_len
+    return -(-end // _ALIGN) * _ALIGN
+
+
+def store_tracks(header):
+    """Track ids of a multi-person store, [] for a single-person one."""
+    return list(header.get("tracks", []))
+
+
+def track_slices(header):
+    """Landmark-axis slice of every track, one slice over everything for a single-person store."""
+    tracks = store_tracks(header)
+    if not tracks:
+        return [slice(None)]
+    per_track = len(header["landmarks"]) // len(tracks)
+    return [slice(k * per_track, (k + 1) * per_track) for k in range(len(tracks))]
+
+
+def track_columns(header, names):
+    """
+    Landmark-axis indices of the named landmarks in every track, and a label for each: the name itself in a
+    single-person store, track<id>/<name> in a multi-person one.
+    """
+    tracks = store_tracks(header)
+    per_track = len(header["landmarks"]) // max(len(tracks), 1)
+    index = [header["landmarks"].index(name) for name in names]
+    if not tracks:
+        return index, list(names)
+    columns = [k * per_track + i for k in range(len(tracks)) for i in index]
+    return columns, [track_label(track, name) for track in tracks for name in names]
+
+
+def track_label(track, name):
+    """Key of a landmark of one track in the analysis outputs, e.g. track2/LEFT_WRIST."""
+    return f"track{track}/{name}"
+
+
+def split_tracks(keyed):
+    """
+    Split a dict keyed by landmark (velocities, windows, ...) into {track: {landmark: value}}. Keys without a
+    track<id>/ prefix, i.e. a single-person pose, all go under track None.
+    """
+    tracks = {}
+    for key, value in keyed.items():
+        track, name = None, key
+        if key.startswith("track") and "/" in key:
+            prefix, name = key.split("/", 1)
+            track = int(prefix[len("track"):])
+        tracks.setdefault(track, {})[name] = value
+    return tracks
@@ -0,0 +1,287 @@
+"""
+Annotated video rendering: the original clip with the stored skeleton, the current phase and a phase timeline
+
+Nothing is re-inferred. The skeleton comes from the image positions (x_img, y_img) in the pose store and the
+phases from the movement windows, so a store extracted with image coordinates (--render, --roi or wall
+calibration turn them on) is all that is needed.
+
+Decoding, drawing and encoding run in a pipeline: a decoder thread reads each frame straight into one of a
+fixed ring of preallocated buffers, the calling thread draws on it in place and an encoder thread writes it
+out and hands the buffer back. The queues between them are bounded by the ring, so memory stays flat
+however long the clip is and a slow stage holds the others back instead of piling up frames.
+
+    python src/reporting/visualizations.py video.mp4 results/video.pose.bin results/video.annotated.mp4
+"""
+
+import os
+import queue
+import sys
+import threading
+import time
+
+import cv2
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.constants import PHASES, POSE_CONNECTIONS, POSE_LANDMARKS
+from core.profiling import profiler
+from pose_store import IMAGE_CHANNELS, read_pose_store, split_tracks
+
+# BGR colors of PHASES, and of frames without a phase (before the first / after the last detection)
+PHASE_COLORS = {'Preparation': (0, 165, 255), 'Reaching': (60, 60, 230), 'Stabilization': (80, 180, 60)}
+NO_PHASE_COLOR = (90, 90, 90)
+
+_BONES = np.array([(POSE_LANDMARKS.index(a), POSE_LANDMARKS.index(b)) for a, b in POSE_CONNECTIONS])
+#joints drawn as dots: the body from the shoulders down, the face only gets its bones
+_JOINTS = np.arange(POSE_LANDMARKS.index('LEFT_SHOULDER'), len(POSE_LANDMARKS))
+_TIMELINE_HEIGHT = 14
+_END = None
+
+
+def render_video(video_path, pose_path, output_path, windows=None, calibration=None, buffers=8, codec='mp4v',
+                 visibility_threshold=0.5):
+    """
+    Write an annotated copy of a video: skeleton, phase banner and a phase timeline with a cursor.
+
+    Args:
+        video_path (str): the original video
+        pose_path (str): its .pose.bin store; skeletons need the x_img/y_img channels
+        output_path (str): annotated .mp4 to write
+        windows (dict, optional): movement windows from segment_motions. Defaults to segmenting the store.
+        calibration (WallCalibration, optional): the session's calibration, for the frame numbering of
+            windows found in the wall frame. Defaults to None.
+        buffers (int, optional): frames in flight between the three stages. Defaults to 8.
+        codec (str, optional): fourcc of the output. Defaults to 'mp4v'.
+        visibility_threshold (float, optional): landmarks less visible than this aren't drawn. Defaults to 0.5.
+
+    Returns:
+        dict: frames written, wall time, frames per second and how long each stage waited on the others
+    """
+    landmarks, header = read_pose_store(pose_path)
+    points, drawn = _image_points(landmarks, header, visibility_threshold)
+    if points is None:
+        print(f"⚠️  {pose_path} has no image coordinates (extract with --render), drawing the phases only")
+
+    cap = cv2.VideoCapture(str(video_path))
+    if not cap.isOpened():
+        raise ValueError(f"Could not open video: {video_path}")
+    fps = cap.get(cv2.CAP_PROP_FPS) or header['fps']
+    width, height = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    n_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) or len(landmarks)
+
+    with profiler.stage('render.phases'):
+        phases = phase_timeline(pose_path, windows, calibration, max(n_frames, len(landmarks)))
+    timeline = _timeline_strip(phases, width)
+
+    writer = cv2.VideoWriter(str(output_path), cv2.VideoWriter_fourcc(*codec), fps, (width, height))
+    if not writer.isOpened():
+        cap.release()
+        raise ValueError(f"Could not open a {codec} writer for {output_path}")
+
+    pool = [np.empty((height, width, 3), dtype=np.uint8) for _ in range(buffers)]
+    free, decoded, encoded = queue.Queue(), queue.Queue(maxsize=buffers), queue.Queue(maxsize=buffers)
+    for slot in range(buffers):
+        free.put(slot)
+    waits = {'decode': 0.0, 'draw': 0.0, 'encode': 0.0}
+    errors = []
+    stop = threading.Event()
+
+    def decode():
+        try:
+            frame_idx = 0
+            while not stop.is_set():
+                t_wait = time.perf_counter()
+                slot = free.get()
+                waits['decode'] += time.perf_counter() - t_wait
+                if stop.is_set():
+                    break
+                ok, image = cap.read(pool[slot])
+                if not ok:
+                    break
+                if image is not pool[slot]:
+                    #the decoder only writes in place when the buffer already has the frame's shape
+                    pool[slot] = image
+                decoded.put((frame_idx, slot))
+                frame_idx += 1
+        except Exception as e:
+            errors.append(e)
+        finally:
+            decoded.put(_END)
+
+    def encode():
+        while True:
+            t_wait = time.perf_counter()
+            item = encoded.get()
+            waits['encode'] += time.perf_counter() - t_wait
+            if item is _END:
+                return
+            frame_idx, slot = item
+            if not errors:
+                try:
+                    writer.write(pool[slot])
+                except Exception as e:
+                    errors.append(e)
+            free.put(slot)
+
+    threads = [threading.Thread(target=decode, daemon=True), threading.Thread(target=encode, daemon=True)]
+    start = time.perf_counter()
+    written = 0
+    decoded_all = False
+    with profiler.stage('render.video'):
+        for thread in threads:
+            thread.start()
+        try:
+            while True:
+                t_wait = time.perf_counter()
+                item = decoded.get()
+                waits['draw'] += time.perf_counter() - t_wait
+                if item is _END:
+                    decoded_all = True
+                    break
+                frame_idx, slot = item
+                t_draw = time.perf_counter()
+                if not errors:
+                    phase = phases[frame_idx] if frame_idx < len(phases) else -1
+                    draw_frame(pool[slot], frame_idx, fps, phase, timeline, len(phases),
+                               points[frame_idx] if points is not None and frame_idx < len(points) else None,
+                               drawn[frame_idx] if points is not None and frame_idx < len(points) else None)
+                profiler.timing('render_draw', t_draw, time.perf_counter())
+                encoded.put(item)
+                written += 1
+        finally:
+            #on an error (or Ctrl-C) here the decoder may be blocked on a full queue: stop it, and keep taking
+            #its frames, handing their buffers back, until it has finished
+            stop.set()
+            encoded.put(_END)
+            while not decoded_all:
+                item = decoded.get()
+                if item is _END:
+                    decoded_all = True
+                else:
+                    free.put(item[1])
+            for thread in threads:
+                thread.join()
+            cap.release()
+            writer.release()
+    elapsed = time.perf_counter() - start
+
+    if errors:
+        raise errors[0]
+    profiler.count('render_frames', written)
+    stats = {
+        'frames': written,
+        'seconds': round(elapsed, 3),
+        'fps': round(written / elapsed, 1) if elapsed else 0.0,
+        'waits': {stage: round(seconds, 3) for stage, seconds in waits.items()},
+    }
+    print(f"🎞️  Annotated video saved to: {output_path} ({written} frames at {stats['fps']} fps, "
+          f"{stats['fps'] / fps:.1f}x real time)")
+    return stats
+
+
+def phase_timeline(pose_path, windows, calibration, n_frames):
+    """
+    Phase index (into PHASES) of every video frame, -1 where there is none. Windows count rows of the cleaned
+    landmark timeline, which starts at frame 0; uncleaned it skips undetected frames, so rows are put back on
+    video frame numbers.
+    With several climbers the phases are the first (main) track's.
+    """
+    from analysis.movementphasedetector import MovementPhaseDetector
+    from analysis.velocitycalculator import VelocityCalculator
+
+    calc = VelocityCalculator(calibration=calibration)
+    if windows is None:
+        pose_data, fps = calc.load_positions(str(pose_path))
+        velocity = calc.calculate_velocities(pose_data, fps)
+        windows = MovementPhaseDetector(calibration=calibration).segment_velocities(velocity)
+    else:
+        calc.load_positions(str(pose_path))
+
+    frames = calc.frames
+    labels = MovementPhaseDetector().label_phases(next(iter(split_tracks(windows).values()), {}), len(frames))
+    timeline = np.full(n_frames, -1, dtype=np.int8)
+    inside = frames < n_frames
+    timeline[frames[inside]] = labels[inside]
+    return timeline
+
+
+def draw_frame(image, frame_idx, fps, phase, timeline, n_frames, points=None, drawn=None):
+    """
+    Annotate one BGR frame in place.
+
+    Args:
+        image (np.ndarray): (height, width, 3) frame, drawn on
+        frame_idx (int): its frame number
+        fps (float): video frame rate, for the time stamp
+        phase (int): index into PHASES, -1 for none
+        timeline (np.ndarray): (_TIMELINE_HEIGHT, width, 3) phase strip from _timeline_strip
+        n_frames (int): frames the timeline spans
+        points (np.ndarray, optional): (landmarks, 2) int32 pixel positions, every track's in turn for a
+            multi-person store. Defaults to no skeleton.
+        drawn (np.ndarray, optional): (landmarks,) bool, which of them to draw
+    """
+    height, width = image.shape[:2]
+    name = PHASES[phase] if phase >= 0 else None
+    color = PHASE_COLORS[name] if name else NO_PHASE_COLOR
+
+    if points is not None:
+        for first in range(0, len(points), len(POSE_LANDMARKS)):
+            skeleton, visible = points[first:first + len(POSE_LANDMARKS)], drawn[first:first + len(POSE_LANDMARKS)]
+            bones = _BONES[visible[_BONES].all(axis=1)]
+            if len(bones):
+                cv2.polylines(image, skeleton[bones], False, color, 3, cv2.LINE_AA)
+            for joint in _JOINTS[visible[_JOINTS]]:
+                cv2.circle(image, (int(skeleton[joint, 0]), int(skeleton[joint, 1])), 4, (255, 255, 255), -1,
+                           cv2.LINE_AA)
+
+    cv2.rectangle(image, (0, 0), (width, 36), color, -1)
+    cv2.putText(image, f"{name or '-'}  {frame_idx / fps:6.2f} s", (10, 26), cv2.FONT_HERSHEY_SIMPLEX, 0.8,
+                (255, 255, 255), 2, cv2.LINE_AA)
+
+    image[height - _TIMELINE_HEIGHT:] = timeline
+    cursor = min(width - 1, frame_idx * width // max(n_frames, 1))
+    image[height - _TIMELINE_HEIGHT:, max(cursor - 1, 0):cursor + 2] = 255
+
+
+def _image_points(landmarks, header, visibility_threshold):
+    """(frames, landmarks, 2) int32 pixel positions and the (frames, landmarks) mask of drawable ones"""
+    channels = header['channels']
+    if not all(c in channels for c in IMAGE_CHANNELS):
+        return None, None
+    xy = np.asarray(landmarks[..., [channels.index(c) for c in IMAGE_CHANNELS]], dtype=np.float32)
+    visibility = np.asarray(landmarks[..., channels.index('visibility')])
+    drawn = np.isfinite(xy).all(axis=2) & (visibility >= visibility_threshold)
+    scale = np.array([header['width'], header['height']], dtype=np.float32)
+    points = np.nan_to_num(xy * scale).round().astype(np.int32)
+    return points, drawn
+
+
+def _timeline_strip(phases, width):
+    """The phase of every video frame as a colored strip the width of the frame"""
+    colors = np.array([PHASE_COLORS[phase] for phase in PHASES] + [NO_PHASE_COLOR], dtype=np.uint8)
+    columns = colors[phases[np.arange(width) * len(phases) // width]] if len(phases) else colors[[-1] * width]
+    return np.repeat(columns[None], _TIMELINE_HEIGHT, axis=0)
+
+
+def main():
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description='Render a video annotated with its stored poses and phases')
+    parser.add_argument('video', help='Original video')
+    parser.add_argument('pose_store', help='Its .pose.bin (extracted with image coordinates)')
+    parser.add_argument('output', help='Annotated .mp4 to write')
+    parser.add_argument('--windows', help='Movement windows json (default: segment the store)')
+    parser.add_argument('--buffers', type=int, default=8, help='Frames in flight (default: 8)')
+    args = parser.parse_args()
+
+    windows = None
+    if args.windows:
+        with open(args.windows) as f:
+            windows = json.load(f)
+    print(render_video(args.video, args.pose_store, args.output, windows=windows, buffers=args.buffers))
+
+
+if __name__ == '__main__':
+    main()
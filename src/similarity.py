@@ -0,0 +1,323 @@
+"""
+Movement similarity search: the intervals of a session dataset that move most like a given one
+
+Every phase of a SessionDataset is embedded as a fixed-length vector: its key landmark trajectories, moved to
+start at the origin, scaled by shoulder width and resampled to SIMILARITY['embedding_length'] frames. A search
+takes the shortlist nearest embeddings (one vectorized distance over the whole index) and re-ranks only those with
+DTW on the full trajectories, resampled to the query's length:
+
+    1. LB_Keogh, the distance from a candidate to the envelope of the query over the band, is a lower bound of
+       the banded DTW, so the candidates are tried in LB order and the ones whose bound is already above the
+       k-th best DTW found so far are skipped.
+    2. The banded DTW itself is filled one anti-diagonal at a time and abandoned as soon as it can't beat
+       the k-th best.
+
+The embeddings are kept next to the dataset (similarity/embeddings.npy, similarity/intervals.csv) and rebuilt
+only for the sessions re-ingested since.
+
+    python src/similarity.py dataset/ cleantestvid2_17.11.15 120 -k 5
+"""
+
+import json
+import os
+import sys
+import warnings
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from core.constants import SIMILARITY
+from core.profiling import profiler
+from dataset import PHASE_COLUMNS, SessionDataset
+
+_POSITION_CHANNELS = ['x', 'y', 'z']
+
+
+class SimilarityIndex:
+    '''
+    Fixed-length embeddings of every phase of a SessionDataset, row i of `embeddings` for row i of `intervals`.
+
+    Usage:
+        index = SimilarityIndex(SessionDataset('dataset/'))
+        matches = index.search('cleantestvid2_17.11.15', start=120, k=5)
+    '''
+    def __init__(self, dataset, settings=SIMILARITY):
+        self.dataset = dataset if isinstance(dataset, SessionDataset) else SessionDataset(dataset)
+        self.settings = settings
+        self.directory = self.dataset.root / 'similarity'
+        self.intervals = pd.DataFrame(columns=PHASE_COLUMNS)
+        self.embeddings = np.zeros((0, 0), dtype=np.float32)
+        self._built_from = {}
+        self.refresh()
+
+    def refresh(self):
+        """
+        Bring the index up to date with the dataset: embeddings of sessions whose source and settings are the
+        same as when they were embedded are kept, the others (and new sessions) are embedded and saved.
+
+        Returns:
+            int: intervals embedded
+        """
+        meta_path = self.directory / 'meta.json'
+        if meta_path.exists() and not len(self.intervals):
+            with open(meta_path) as f:
+                meta = json.load(f)
+            if meta['settings'] == self.settings:
+                self._built_from = meta['sessions']
+                self.intervals = pd.read_csv(self.directory / 'intervals.csv')
+                self.embeddings = np.load(self.directory / 'embeddings.npy')
+
+        current = {session: _fingerprint(entry) for session, entry in self.dataset.index['sessions'].items()}
+        fresh = [s for s in current if self._built_from.get(s) == current[s]]
+        stale = sorted(set(current) - set(fresh))
+        if not stale and set(self._built_from) == set(current):
+            return 0
+
+        keep = self.intervals['session'].isin(fresh).to_numpy()
+        rows = self.dataset.query(sessions=stale)
+        with profiler.stage('similarity.embed'):
+            embedded = self.embed_rows(rows)
+
+        phases = self.dataset.phases
+        self.intervals = pd.concat([self.intervals[keep], rows], ignore_index=True)[phases.columns]
+        self.embeddings = np.concatenate([self.embeddings[keep], embedded]) if keep.any() else embedded
+        self._built_from = current
+        self.save()
+        return len(rows)
+
+    def save(self):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.intervals.to_csv(self.directory / 'intervals.csv', index=False)
+        np.save(self.directory / 'embeddings.npy', self.embeddings)
+        with open(self.directory / 'meta.json', 'w') as f:
+            json.dump({'settings': self.settings, 'sessions': self._built_from}, f, indent=2)
+
+    def trajectories(self, rows):
+        """Normalized (frames, landmarks, 3) trajectories of phase rows, read from the dataset partitions"""
+        return [
+            normalize_trajectory(block, self._shoulders(row['session']))
+            for row, block in self.dataset.load(rows, channels=_POSITION_CHANNELS)
+        ]
+
+    def embed_rows(self, rows):
+        length = self.settings['embedding_length']
+        trajectories = self.trajectories(rows)
+        if not trajectories:
+            return np.zeros((0, self.embeddings.shape[1]), dtype=np.float32)
+        return np.stack([resample(t, length).ravel() for t in trajectories]).astype(np.float32)
+
+    def search(self, session, start, k=5, phase=None, shortlist=None, band=None, exclude_self=True):
+        """
+        The k intervals of the index that move most like the phase of `session` starting at partition frame
+        `start` (the `start` column of the dataset's phases).
+
+        Args:
+            session (str): session of the query interval
+            start (int): its start frame in the session's partition
+            k (int, optional): matches returned. Defaults to 5.
+            phase (str, optional): only match intervals of this phase. Defaults to any phase.
+            shortlist (int, optional): nearest embeddings re-ranked with DTW. Defaults to SIMILARITY['shortlist'].
+            band (float, optional): DTW band as a fraction of the query length. Defaults to SIMILARITY['band'].
+            exclude_self (bool, optional): leave the query interval out of the matches. Defaults to True.
+
+        Returns:
+            pd.DataFrame: the matching phase rows, best first, with embedding_distance and dtw_distance columns
+        """
+        rows = self.intervals[(self.intervals['session'] == session) & (self.intervals['start'] == start)]
+        if rows.empty:
+            raise ValueError(f"No interval of session {session!r} starts at frame {start}")
+        query = self.trajectories(rows.iloc[:1])[0]
+        candidates = np.ones(len(self.intervals), dtype=bool)
+        if exclude_self:
+            candidates[rows.index[0]] = False
+        return self.search_trajectory(query, k, phase, shortlist, band, candidates)
+
+    def search_trajectory(self, query, k=5, phase=None, shortlist=None, band=None, candidates=None):
+        """
+        Like search() for any normalized (frames, landmarks, 3) trajectory (see normalize_trajectory), e.g. a
+        reference beta that isn't in the dataset. candidates optionally masks the rows of `intervals` to search.
+        """
+        shortlist = shortlist or self.settings['shortlist']
+        band = self.settings['band'] if band is None else band
+        candidates = np.ones(len(self.intervals), dtype=bool) if candidates is None else candidates.copy()
+        if phase is not None:
+            candidates &= (self.intervals['phase'] == phase).to_numpy()
+
+        with profiler.stage('similarity.shortlist'):
+            embedding = resample(query, self.settings['embedding_length']).ravel()
+            distances = np.full(len(self.intervals), np.inf)
+            distances[candidates] = np.linalg.norm(self.embeddings[candidates] - embedding, axis=1)
+            n_short = min(shortlist, int(candidates.sum()))
+            short = np.argpartition(distances, n_short - 1)[:n_short] if n_short else np.zeros(0, dtype=int)
+
+        with profiler.stage('similarity.rerank'):
+            dtw_distances = rerank(query, self.trajectories(self.intervals.iloc[short]), k, band)
+        profiler.count('similarity.shortlisted', len(short))
+        profiler.count('similarity.dtw_computed', int(np.isfinite(dtw_distances).sum()))
+
+        order = np.argsort(dtw_distances, kind='stable')[:k]
+        order = order[np.isfinite(dtw_distances[order])]
+        matches = self.intervals.iloc[short[order]].copy()
+        matches['embedding_distance'] = distances[short[order]]
+        matches['dtw_distance'] = dtw_distances[order]
+        return matches.reset_index(drop=True)
+
+    def _shoulders(self, session):
+        landmarks = self.dataset.index['sessions'][session]['landmarks']
+        if 'left_shoulder' in landmarks and 'right_shoulder' in landmarks:
+            return landmarks.index('left_shoulder'), landmarks.index('right_shoulder')
+        return None
+
+
+def _fingerprint(entry):
+    return {'source': entry['source'], 'settings': entry['settings']}
+
+
+def normalize_trajectory(block, shoulders=None):
+    """
+    (frames, landmarks, 3) positions moved so the landmarks' centroid on the first frame is the origin and
+    scaled by the median shoulder width, so climbers of different size and start holds compare. Frames left
+    NaN by cleaning are held at the origin.
+
+    Args:
+        block (np.ndarray): (frames, landmarks, 3) positions in m
+        shoulders (tuple, optional): landmark indices of the two shoulders. Defaults to no scaling.
+    """
+    block = np.asarray(block, dtype=np.float64)
+    #all-NaN frames and sessions give NaN means here, handled below
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        origin = np.nanmean(block[0], axis=0)
+        if not np.isfinite(origin).all():
+            origin = np.nanmean(block.reshape(-1, 3), axis=0)
+        scale = 1.0
+        if shoulders is not None:
+            width = np.nanmedian(np.linalg.norm(block[:, shoulders[0]] - block[:, shoulders[1]], axis=1))
+            scale = width if np.isfinite(width) and width > 0 else 1.0
+    return np.nan_to_num((block - np.nan_to_num(origin)) / scale)
+
+
+def resample(trajectory, length):
+    """Linear resampling of a (frames, ...) array to `length` frames spread evenly over the same span"""
+    n = len(trajectory)
+    if n == length:
+        return trajectory
+    if n == 1:
+        return np.repeat(trajectory, length, axis=0)
+    t = np.linspace(0, n - 1, length)
+    i = np.minimum(t.astype(int), n - 2)
+    frac = (t - i).reshape((-1,) + (1,) * (trajectory.ndim - 1))
+    return trajectory[i] * (1 - frac) + trajectory[i + 1] * frac
+
+
+def rerank(query, trajectories, k, band):
+    """
+    DTW distances from the query to each trajectory, both as (frames, features), the trajectories resampled
+    to the query's length. Only what is needed for the k best is computed: trajectories are tried in LB_Keogh
+    order and the ones that can't make the k best are left at inf.
+
+    Returns:
+        np.ndarray: (trajectories,) DTW distance, inf where pruned or abandoned
+    """
+    distances = np.full(len(trajectories), np.inf)
+    if not trajectories:
+        return distances
+
+    n = len(query)
+    query = query.reshape(n, -1)
+    radius = max(1, int(np.ceil(band * n)))
+    candidates = np.stack([resample(t, n).reshape(n, -1) for t in trajectories])
+    upper, lower = envelope(query, radius)
+    bounds = lb_keogh(candidates, upper, lower)
+
+    best = []
+    order = np.argsort(bounds)
+    for tried, i in enumerate(order):
+        limit = best[k - 1] if len(best) >= k else np.inf
+        if bounds[i] >= limit:
+            #the rest have even larger bounds
+            profiler.count('similarity.lb_pruned', len(order) - tried)
+            break
+        distances[i] = dtw(query, candidates[i], radius, limit)
+        if np.isfinite(distances[i]):
+            best = sorted(best + [distances[i]])
+    return distances
+
+
+def envelope(query, radius):
+    """Upper and lower envelope of a (frames, features) query over +-radius frames, per feature"""
+    padded = np.pad(query, [(radius, radius), (0, 0)], mode='edge')
+    windows = sliding_window_view(padded, 2 * radius + 1, axis=0)
+    return windows.max(axis=-1), windows.min(axis=-1)
+
+
+def lb_keogh(candidates, upper, lower):
+    """
+    LB_Keogh of (candidates, frames, features) against a query's envelope: the distance from each candidate
+    to the envelope, a lower bound of the candidate's banded DTW distance to the query (same band).
+    """
+    above = np.clip(candidates - upper, 0, None)
+    below = np.clip(lower - candidates, 0, None)
+    return np.sqrt((above ** 2 + below ** 2).sum(axis=(1, 2)))
+
+
+def dtw(a, b, radius, limit=np.inf):
+    """
+    DTW distance between (n, features) and (m, features) sequences: the square root of the smallest sum of
+    squared frame distances along a warping path kept within radius frames of the diagonal.
+
+    The cost matrix is filled one anti-diagonal (cells with equal i + j) at a time, every cell of it at once.
+    Each warping path crosses every pair of consecutive anti-diagonals, so when both are above limit the
+    path can't finish below it and inf is returned.
+    """
+    n, m = len(a), len(b)
+    radius = max(radius, abs(n - m))
+    cost = ((a[:, None, :] - b[None, :, :]) ** 2).sum(axis=2)
+    limit = limit ** 2
+
+    D = np.full((n + 1, m + 1), np.inf)
+    D[0, 0] = 0.0
+    previous_min = 0.0
+    for s in range(2, n + m + 1):
+        #cells (i, j) with i + j = s, 1-based, inside the band
+        lo = max(1, s - m, (s - radius + 1) // 2)
+        hi = min(n, s - 1, (s + radius) // 2)
+        if lo > hi:
+            continue
+        i = np.arange(lo, hi + 1)
+        j = s - i
+        D[i, j] = cost[i - 1, j - 1] + np.minimum(np.minimum(D[i - 1, j], D[i, j - 1]), D[i - 1, j - 1])
+        current_min = D[i, j].min()
+        if min(current_min, previous_min) >= limit:
+            return np.inf
+        previous_min = current_min
+    return float(np.sqrt(D[n, m]))
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Find the climbs that move most like a given phase')
+    parser.add_argument('root', help='Session dataset directory (see dataset.py)')
+    parser.add_argument('session', help='Session of the query phase')
+    parser.add_argument('start', type=int, help="Query phase's start frame in the dataset (the start column)")
+    parser.add_argument('-k', type=int, default=5, help='Matches to show (default: 5)')
+    parser.add_argument('--phase', help='Only match phases of this kind, e.g. Reaching')
+    parser.add_argument('--shortlist', type=int, default=SIMILARITY['shortlist'],
+                        help=f"Embedding neighbours re-ranked with DTW (default: {SIMILARITY['shortlist']})")
+    parser.add_argument('--band', type=float, default=SIMILARITY['band'],
+                        help=f"DTW band, fraction of the query length (default: {SIMILARITY['band']})")
+    args = parser.parse_args()
+
+    index = SimilarityIndex(args.root)
+    matches = index.search(args.session, args.start, k=args.k, phase=args.phase, shortlist=args.shortlist,
+                           band=args.band)
+    with pd.option_context('display.max_rows', None, 'display.max_columns', None, 'display.width', 200):
+        print(matches[PHASE_COLUMNS + ['embedding_distance', 'dtw_distance']])
+
+
+if __name__ == '__main__':
+    main()
@@ -1,31 +1,122 @@
+import numpy as np
 import pandas as pds
 from pathlib import Path
 
+from core.constants import POSE_LANDMARKS
+from core.profiling import profiler
+from pose_store import (IMAGE_CHANNELS, INFERRED_CHANNEL, STORE_CHANNELS, detected_frames, is_pose_store, read_pose_store,
+                        store_tracks, track_slices)
+
 def widen_pose(long_csv, wide_csv):
     """
     Convert long form data into wide form data so we have every coordinate of every landmark at each frame in the video. 
 
 
     Args:
-        long_csv (_type_): _description_
+        long_csv (_type_): long-form pose csv, or a .pose.bin pose store
         wide_csv (_type_): _description_
     """
 
-    df = pds.read_csv(long_csv)
-
-    df_wide = df.pivot_table(       
-        index=["frame", "t_sec"],
-        columns="landmark",
-        values=["x_world", "y_world", "z_world", "visibility" ]
-    )
-
-    df_wide.columns = [f"{c1}_{c2}" for c1, c2 in df_wide.columns]
-    df_wide = df_wide.reset_index()
+    if is_pose_store(long_csv):
+        with profiler.stage('widen.read_store'):
+            landmarks, header = read_pose_store(long_csv)
+        with profiler.stage('widen.reshape'):
+            df_wide = wide_from_store(landmarks, header)
+    else:
+        with profiler.stage('widen.read_csv'):
+            df = pds.read_csv(long_csv)
+        with profiler.stage('widen.reshape'):
+            df_wide = wide_from_long(df)
 
-    df_wide.to_csv(get_data_output_path(wide_csv), index=False)
+    with profiler.stage('widen.write_csv'):
+        df_wide.to_csv(get_data_output_path(wide_csv), index=False)
     print(f"Wrote wide data -> {wide_csv} (shape={df_wide.shape})")
     # Modify output path to be ../data/<filename>.wide.csv
 
+def wide_from_long(df):
+    """The wide table of a long-form table; a multi-person one (with a track column) gets one row per track and frame"""
+    if "track" not in df.columns:
+        frames, t_sec, block, channels = long_to_block(df)
+        return wide_from_block(frames, t_sec, block, POSE_LANDMARKS, channels)
+
+    parts = []
+    for track, rows in df.groupby("track", sort=False):
+        frames, t_sec, block, channels = long_to_block(rows)
+        part = wide_from_block(frames, t_sec, block, POSE_LANDMARKS, channels)
+        part.insert(1, "track", track)
+        parts.append(part)
+    return pds.concat(parts, ignore_index=True)
+
+def long_to_block(df):
+    """
+    Scatter long-form rows straight into a (frames x landmarks x channels) array.
+    Every detected frame has its landmarks in a fixed order, so this is index arithmetic rather than 
+    the grouping and hashing pivot_table does. Frames with no detection simply have no rows and don't 
+    show up; a landmark missing from a frame is left as NaN.
+
+    Returns:
+        frames, t_sec, block, channels
+    """
+    channels = [c for c in STORE_CHANNELS + IMAGE_CHANNELS + [INFERRED_CHANNEL] if c in df.columns]
+
+    frames, first_row, frame_pos = np.unique(df["frame"].to_numpy(), return_index=True, return_inverse=True)
+    t_sec = df["t_sec"].to_numpy()[first_row]
+
+    landmark_index = {name: i for i, name in enumerate(POSE_LANDMARKS)}
+    landmark_pos = df["landmark"].map(landmark_index).to_numpy()
+
+    block = np.full((len(frames), len(POSE_LANDMARKS), len(channels)), np.nan)
+    block[frame_pos, landmark_pos] = df[channels].to_numpy(dtype=np.float64)
+
+    return frames, t_sec, block, channels
+
+def wide_from_store(landmarks, header):
+    """
+    Build the wide table straight from a pose store array, skipping frames with no detection.
+    A multi-person store gets one row per track and frame, the tracks one after the other, with a track column.
+    """
+    tracks = store_tracks(header)
+    if not tracks:
+        frames = detected_frames(landmarks)
+        block = np.asarray(landmarks[frames], dtype=np.float64)
+        return wide_from_block(frames, frames / header["fps"], block, header["landmarks"], header["channels"])
+
+    parts = []
+    for track, columns in zip(tracks, track_slices(header)):
+        frames = detected_frames(landmarks[:, columns])
+        block = np.asarray(landmarks[frames, columns], dtype=np.float64)
+        part = wide_from_block(frames, frames / header["fps"], block, header["landmarks"][columns], header["channels"])
+        part.insert(1, "track", track)
+        parts.append(part)
+    return pds.concat(parts, ignore_index=True)
+
+def wide_from_block(frames, t_sec, block, landmarks, channels):
+    """
+    Lay a (frames x landmarks x channels) array out as the wide table.
+    Columns come out in the same order pivot_table gives them: value name first, then landmark, both sorted.
+    The per-frame inferred flag of adaptive sampling becomes one column after t_sec instead of one per landmark.
+    """
+    inferred = None
+    if INFERRED_CHANNEL in channels:
+        c = list(channels).index(INFERRED_CHANNEL)
+        inferred = block[:, 0, c]
+        block = np.delete(block, c, axis=2)
+        channels = [name for name in channels if name != INFERRED_CHANNEL]
+
+    channel_order = np.argsort(channels)
+    landmark_order = np.argsort(landmarks)
+
+    # (frames, channels, landmarks) so flattening the last two axes walks landmarks inside each channel
+    values = block[:, landmark_order][:, :, channel_order].transpose(0, 2, 1).reshape(len(frames), -1)
+    names = [f"{channels[c]}_{landmarks[l]}" for c in channel_order for l in landmark_order]
+
+    df_wide = pds.DataFrame(values, columns=names)
+    if inferred is not None:
+        df_wide.insert(0, INFERRED_CHANNEL, inferred.astype(np.int8))
+    df_wide.insert(0, "t_sec", t_sec)
+    df_wide.insert(0, "frame", frames)
+    return df_wide
+
 def get_data_output_path(input_path):
     input_path = Path(input_path)
     # Go one directory up, then into 'data'
@@ -0,0 +1,120 @@
+"""
+WallCalibration on a synthetic camera: wall points are projected with a known K and wall pose, and the
+back-projection has to land on them again.
+"""
+
+import numpy as np
+import pytest
+
+from analysis.calibration import WallCalibration
+from core.constants import CONTACT_LANDMARKS, MAX_REPROJECTION_ERROR, POSE_LANDMARKS
+from pose_store import IMAGE_CHANNELS, STORE_CHANNELS
+
+WIDTH, HEIGHT = 1280, 720
+K = np.array([[1000.0, 0.0, WIDTH / 2], [0.0, 1000.0, HEIGHT / 2], [0.0, 0.0, 1.0]])
+
+
+def _camera(yaw_degrees=15.0, distance=3.0):
+    """Rotation and translation of a camera `distance` in front of the wall, turned yaw_degrees about Y"""
+    yaw = np.radians(yaw_degrees)
+    turn = np.array([[np.cos(yaw), 0.0, np.sin(yaw)], [0.0, 1.0, 0.0], [-np.sin(yaw), 0.0, np.cos(yaw)]])
+    #wall X right, Y up, Z out of the wall -> camera x right, y down, z away from the camera
+    rotation = turn @ np.diag([1.0, -1.0, -1.0])
+    return rotation, np.array([-0.5, 0.5, distance])
+
+
+@pytest.fixture
+def wall():
+    rotation, translation = _camera()
+    return WallCalibration(K, np.zeros(5), rotation, translation, (WIDTH, HEIGHT), reprojection_error=0.3)
+
+
+def project(wall, points):
+    """Pixels of (..., 3) wall-frame points"""
+    cam = points @ wall.rotation.T + wall.translation
+    return (cam @ K.T)[..., :2] / cam[..., 2:]
+
+
+def wall_points(n=50, seed=0):
+    rng = np.random.default_rng(seed)
+    return np.column_stack([rng.uniform(0.0, 1.0, n), rng.uniform(-1.0, 0.0, n), np.zeros(n)])
+
+
+def test_rays_point_at_the_projected_points(wall):
+    points = wall_points()
+    cam = points @ wall.rotation.T + wall.translation
+    rays = wall.rays(project(wall, points))
+    np.testing.assert_allclose(rays / rays[:, 2:], cam / cam[:, 2:], atol=1e-12)
+
+
+def test_intersect_recovers_wall_points(wall):
+    points = wall_points().reshape(5, 10, 3)
+    np.testing.assert_allclose(wall.intersect(project(wall, points)), points, atol=1e-9)
+
+
+def test_intersect_masks_invalid_pixels(wall):
+    points = wall_points(4)
+    valid = np.array([True, False, True, False])
+    on_wall = wall.intersect(project(wall, points), valid)
+    assert np.isnan(on_wall[~valid]).all()
+    np.testing.assert_allclose(on_wall[valid], points[valid], atol=1e-9)
+
+
+def test_wall_behind_the_camera_is_nan(wall):
+    #the same pixels, but with the wall plane moved behind the camera every ray meets it at t <= 0
+    pixels = project(wall, wall_points())
+    behind = WallCalibration(K, np.zeros(5), wall.rotation, -wall.translation, (WIDTH, HEIGHT))
+    assert np.isnan(behind.intersect(pixels)).all()
+
+
+def test_ray_parallel_to_the_wall_is_nan():
+    #camera looking straight up the wall: the ray through the image centre never reaches it
+    rotation = np.array([[1.0, 0.0, 0.0], [0.0, 0.0, -1.0], [0.0, 1.0, 0.0]])
+    wall = WallCalibration(K, np.zeros(5), rotation, np.array([0.0, 0.5, 1.0]), (WIDTH, HEIGHT))
+    assert np.isnan(wall.intersect(np.array([WIDTH / 2, HEIGHT / 2]))).all()
+
+
+def test_reconstruct_places_the_skeleton_on_the_wall(wall):
+    #a climber with hands and feet on the wall and everything else 0.3 m out from it
+    n_frames = 4
+    rng = np.random.default_rng(1)
+    skeleton = np.column_stack([rng.uniform(0.2, 0.8, len(POSE_LANDMARKS)),
+                                rng.uniform(-0.9, -0.1, len(POSE_LANDMARKS)),
+                                np.full(len(POSE_LANDMARKS), 0.3)])
+    contacts = [POSE_LANDMARKS.index(name) for name in CONTACT_LANDMARKS]
+    skeleton[contacts, 2] = 0.0
+    points = skeleton + np.linspace(0.0, 0.1, n_frames)[:, None, None] * [1.0, 0.0, 0.0]
+
+    #MediaPipe's world landmarks: camera axes, centred on the hips
+    hips = points[:, [POSE_LANDMARKS.index('LEFT_HIP'), POSE_LANDMARKS.index('RIGHT_HIP')]].mean(axis=1)
+    world = (points - hips[:, None]) @ wall.rotation.T
+    image = project(wall, points) / (WIDTH, HEIGHT)
+
+    channels = STORE_CHANNELS + IMAGE_CHANNELS
+    landmarks = np.concatenate([world, np.ones(world.shape[:2] + (1,)), image], axis=2)
+    header = {'channels': channels, 'landmarks': POSE_LANDMARKS, 'width': WIDTH, 'height': HEIGHT}
+    np.testing.assert_allclose(wall.reconstruct(landmarks, header), points, atol=1e-9)
+
+
+def test_reconstruct_without_visible_contacts_is_nan(wall):
+    channels = STORE_CHANNELS + IMAGE_CHANNELS
+    landmarks = np.zeros((2, len(POSE_LANDMARKS), len(channels)))
+    landmarks[..., channels.index('x_img')] = 0.5
+    landmarks[..., channels.index('y_img')] = 0.5
+    header = {'channels': channels, 'landmarks': POSE_LANDMARKS, 'width': WIDTH, 'height': HEIGHT}
+    assert np.isnan(wall.reconstruct(landmarks, header)).all()
+
+
+@pytest.mark.parametrize('error, accurate', [(None, True), (MAX_REPROJECTION_ERROR, True),
+                                             (MAX_REPROJECTION_ERROR + 0.01, False)])
+def test_reprojection_error_above_the_limit_warns(wall, capsys, error, accurate):
+    wall.reprojection_error = error
+    assert wall.accurate == accurate
+    wall.warn_if_inaccurate('wall.mp4')
+    assert ('⚠️' in capsys.readouterr().out) != accurate
+
+
+def test_round_trip_keeps_the_calibration(wall, tmp_path):
+    wall.save(tmp_path / 'wall.calibration.json')
+    loaded = WallCalibration.load(tmp_path / 'wall.calibration.json')
+    np.testing.assert_allclose(loaded.intersect(project(wall, wall_points())), wall_points(), atol=1e-9)
@@ -0,0 +1,180 @@
+"""
+CriteriaEvaluator on synthetic climbers: known angles and distances go in as wide frames, known run lengths as
+per-frame features, and every criterion is checked right at its CRITERIA_THRESHOLDS boundary.
+
+At 10 fps every time limit is a whole number of frames (0.2 s is 2 frames), so a run of exactly that many
+frames sits right on the boundary.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from analysis.criteriaevaluator import CriteriaEvaluator, positions_from_wide
+from core.constants import CRITERIA_THRESHOLDS, PHASES, POSE_LANDMARKS
+
+FPS = 10.0
+N_FRAMES = 20
+ARM = 0.3
+T = CRITERIA_THRESHOLDS
+
+
+def frames_of(seconds):
+    return int(round(seconds * FPS))
+
+
+def _arm(shoulder, shoulder_angle, elbow_angle):
+    """Elbow and wrist of an arm in the x-y plane, hanging off a shoulder above its hip"""
+    phi, theta = np.radians(shoulder_angle), np.radians(elbow_angle)
+    elbow = shoulder + ARM * np.array([np.sin(phi), -np.cos(phi), 0.0])
+    back = (shoulder - elbow) / ARM
+    turned = np.array([back[0] * np.cos(theta) - back[1] * np.sin(theta),
+                       back[0] * np.sin(theta) + back[1] * np.cos(theta), 0.0])
+    return elbow, elbow + ARM * turned
+
+
+def wide_frames(shoulder_angles, elbow_angles, toe_offset=0.0):
+    """
+    A still climber as a wide table, one row per entry of the angle arrays: hips and knees at x = 0, both toes
+    toe_offset further along x, and both arms at the given shoulder (hip-shoulder-elbow) and elbow angles.
+    """
+    rows = []
+    for frame, (shoulder_angle, elbow_angle) in enumerate(zip(shoulder_angles, elbow_angles)):
+        row = {'frame': frame, 't_sec': frame / FPS}
+        points = dict.fromkeys(POSE_LANDMARKS, np.zeros(3))
+        for side, z in (('LEFT', -0.2), ('RIGHT', 0.2)):
+            shoulder = np.array([0.0, 0.5, z])
+            points[f'{side}_HIP'] = np.array([0.0, 0.0, z])
+            points[f'{side}_SHOULDER'] = shoulder
+            points[f'{side}_ELBOW'], points[f'{side}_WRIST'] = _arm(shoulder, shoulder_angle, elbow_angle)
+            points[f'{side}_KNEE'] = np.array([0.0, -0.5, z])
+            points[f'{side}_FOOT_INDEX'] = np.array([toe_offset, -1.0, z])
+        for landmark, point in points.items():
+            row.update({f'{axis}_world_{landmark}': value for axis, value in zip('xyz', point)})
+            row[f'visibility_{landmark}'] = 1.0
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def features_of(df, hip_to_wall=None):
+    positions, visibility = positions_from_wide(df)
+    return CriteriaEvaluator(fps=FPS).features(positions, visibility, hip_to_wall)
+
+
+def straight_features(**overrides):
+    """Features of a climber with straight arms and everything on holds, then the given arrays swapped in"""
+    features = features_of(wide_frames(np.full(N_FRAMES, 180.0), np.full(N_FRAMES, 180.0)))
+    return {**features, **overrides}
+
+
+def judge(criterion, features, phase, **thresholds):
+    """The one judged phase of a clip that is all `phase`: (value, passed)"""
+    labels = np.full(len(features['elbow']), PHASES.index(phase))
+    result = CriteriaEvaluator(fps=FPS).evaluate(features, labels, thresholds)[criterion]
+    assert len(result['value']) == 1
+    return result['value'][0], bool(result['passed'][0])
+
+
+def run(active_frames, on=1.0, off=0.0, sides=2):
+    """(N_FRAMES, sides) signal that is `on` for the first active_frames frames and `off` after"""
+    values = np.full((N_FRAMES, sides), off)
+    values[:active_frames] = on
+    return values
+
+
+def test_features_recover_known_angles_and_distance():
+    features = features_of(wide_frames(np.full(5, 120.0), np.full(5, 90.0), toe_offset=0.07))
+    np.testing.assert_allclose(features['shoulder'], 120.0)
+    np.testing.assert_allclose(features['elbow'], 90.0)
+    np.testing.assert_allclose(features['over_foot'], 0.07)
+    np.testing.assert_allclose(features['hand_speed'], 0.0, atol=1e-9)
+
+
+def test_features_mask_low_visibility():
+    df = wide_frames(np.full(5, 120.0), np.full(5, 90.0))
+    df['visibility_LEFT_ELBOW'] = 0.1
+    features = features_of(df)
+    assert np.isnan(features['elbow'][:, 0]).all() and np.isnan(features['shoulder'][:, 0]).all()
+    np.testing.assert_allclose(features['elbow'][:, 1], 90.0)
+
+
+@pytest.mark.parametrize('bent_frames, passed', [(frames_of(T['arm_bent_time']) - 1, True),
+                                                  (frames_of(T['arm_bent_time']), False)])
+def test_decoupling_fails_from_arm_bent_time(bent_frames, passed):
+    #arms bent (under arm_straight_angle at elbow and shoulder) for the first bent_frames frames
+    #the wrists jump between the two poses, so the hands are put back on their holds
+    angles = np.where(np.arange(N_FRAMES) < bent_frames, 140.0, 180.0)
+    features = {**features_of(wide_frames(angles, angles)), 'hand_speed': np.zeros((N_FRAMES, 2))}
+    value, ok = judge('decoupling', features, 'Preparation')
+    assert value == pytest.approx(bent_frames / FPS) and ok == passed
+
+
+@pytest.mark.parametrize('angle, bent', [(T['arm_straight_angle'] - 0.1, True), (T['arm_straight_angle'], False)])
+def test_arm_straight_angle_is_not_bent(angle, bent):
+    angles = run(N_FRAMES, on=angle)
+    value, _ = judge('decoupling', straight_features(elbow=angles, shoulder=angles), 'Preparation')
+    assert (value > 0) == bent
+
+
+@pytest.mark.parametrize('hold_frames, passed', [(frames_of(T['hand_support_time']) - 1, False),
+                                                  (frames_of(T['hand_support_time']), True)])
+def test_hand_support_passes_from_hand_support_time(hold_frames, passed):
+    #one hand on a hold for hold_frames frames, the other never
+    hand_speed = np.column_stack([run(hold_frames, on=0.0, off=1.0, sides=1), np.ones(N_FRAMES)])
+    value, ok = judge('hand_support', straight_features(hand_speed=hand_speed), 'Reaching')
+    assert value == pytest.approx(hold_frames / FPS) and ok == passed
+
+
+@pytest.mark.parametrize('speed, on_hold', [(T['contact_speed'] - 1e-4, True), (T['contact_speed'], False)])
+def test_contact_speed_boundary(speed, on_hold):
+    value, _ = judge('hand_support', straight_features(hand_speed=run(N_FRAMES, on=speed)), 'Reaching')
+    assert (value > 0) == on_hold
+
+
+@pytest.mark.parametrize('toe_offset, passed', [(T['weight_shift_distance'], True),
+                                                 (T['weight_shift_distance'] + 0.01, False)])
+def test_weight_shift_passes_within_weight_shift_distance(toe_offset, passed):
+    features = features_of(wide_frames(np.full(N_FRAMES, 180.0), np.full(N_FRAMES, 180.0), toe_offset))
+    value, ok = judge('weight_shift', features, 'Reaching')
+    assert value == pytest.approx(toe_offset) and ok == passed
+
+
+@pytest.mark.parametrize('off_frames, passed', [(frames_of(T['feet_off_time']), True),
+                                                 (frames_of(T['feet_off_time']) + 1, False)])
+def test_both_feet_set_fails_after_feet_off_time(off_frames, passed):
+    #one foot off the wall for the first off_frames frames
+    foot_speed = np.column_stack([run(off_frames, sides=1), np.zeros(N_FRAMES)])
+    value, ok = judge('both_feet_set', straight_features(foot_speed=foot_speed), 'Reaching')
+    assert value == pytest.approx(off_frames / FPS) and ok == passed
+
+
+@pytest.mark.parametrize('closed_frames, passed', [(frames_of(T['relax_time']), True),
+                                                    (frames_of(T['relax_time']) + 1, False)])
+def test_shoulder_relaxing_passes_within_relax_time(closed_frames, passed):
+    angles = np.where(np.arange(N_FRAMES) < closed_frames, 90.0, 180.0)
+    features = features_of(wide_frames(angles, angles))
+    value, ok = judge('shoulder_relaxing', features, 'Stabilization')
+    assert value == pytest.approx(closed_frames / FPS) and ok == passed
+
+
+def test_shoulder_relaxing_never_open_fails():
+    angles = np.full(N_FRAMES, 90.0)
+    value, ok = judge('shoulder_relaxing', features_of(wide_frames(angles, angles)), 'Stabilization')
+    assert value == np.inf and not ok
+
+
+def test_phase_without_arm_angles_is_not_judged():
+    nan = np.full((N_FRAMES, 2), np.nan)
+    for criterion, phase in (('shoulder_relaxing', 'Stabilization'), ('decoupling', 'Preparation')):
+        value, ok = judge(criterion, straight_features(elbow=nan, shoulder=nan), phase)
+        assert np.isnan(value) and not ok
+
+
+@pytest.mark.parametrize('far_frames, passed', [(frames_of(T['hip_far_time']) - 1, True),
+                                                 (frames_of(T['hip_far_time']), False)])
+def test_hip_to_wall_fails_from_hip_far_time(far_frames, passed):
+    #a hip exactly target + margin from the wall is still close enough
+    limit = 0.20 + T['hip_to_wall_margin']
+    hip = np.where(np.arange(N_FRAMES) < far_frames, limit + 0.01, limit)
+    value, ok = judge('hip_to_wall', straight_features(hip_to_wall=hip), 'Reaching', hip_to_wall_target=0.20)
+    assert value == pytest.approx(far_frames / FPS) and ok == passed